@@ -3,14 +3,201 @@ ADVANCED CODE ANALYZER
 Deep code analysis with AST parsing, complexity metrics, and security scanning
 """
 import ast
+import asyncio
+import hashlib
+import json
+import multiprocessing
 import re
 import os
-from typing import Dict, Any, List
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
 from pathlib import Path
 import logging
 
 logger = logging.getLogger(__name__)
 
+IGNORED_DIRS = {'.git', 'node_modules', '__pycache__', 'venv', 'dist', 'build'}
+# File extension -> analyzer method
+ANALYZERS = {
+    '.py': '_analyze_python_file',
+    '.java': '_analyze_java_file',
+    '.kt': '_analyze_java_file',
+    '.js': '_analyze_javascript_file',
+    '.ts': '_analyze_javascript_file',
+    '.jsx': '_analyze_javascript_file',
+    '.tsx': '_analyze_javascript_file',
+    '.go': '_analyze_go_file',
+    '.cs': '_analyze_csharp_file',
+}
+# Bump whenever the analyzers or their rules change, invalidating cached results
+ANALYZER_RULES_VERSION = 1
+# Files per task sent to a worker process; smaller projects are analyzed in a thread
+CHUNK_SIZE = 16
+
+_pool: Optional[ProcessPoolExecutor] = None
+_worker_analyzer: Optional["AdvancedCodeAnalyzer"] = None
+
+
+def get_analysis_pool() -> ProcessPoolExecutor:
+    """Shared worker processes for CPU-bound analysis"""
+    global _pool
+    if _pool is None:
+        workers = int(os.getenv("CODE_ANALYZER_WORKERS", "0")) or os.cpu_count() or 1
+        # Never fork the threaded server process itself
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            # Workers fork from a server that has already imported the analyzer
+            context.set_forkserver_preload([__name__])
+        else:
+            context = multiprocessing.get_context("spawn")
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    return _pool
+
+
+def _reset_analysis_pool(broken: ProcessPoolExecutor):
+    """Drop ``broken`` if it is still the shared pool; a replacement made meanwhile is left alone"""
+    global _pool
+    if _pool is broken:
+        _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _analyze_chunk(file_paths: List[str]) -> List[Dict[str, Any]]:
+    """Worker entry point: per-file results for a batch of files"""
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        _worker_analyzer = AdvancedCodeAnalyzer()
+    return [_worker_analyzer.analyze_file(file_path) for file_path in file_paths]
+
+
+# (content hash, mtime_ns, size) of a file as read for analysis
+FileKey = Tuple[str, int, int]
+
+
+class AnalysisCache:
+    """
+    Per-file analysis results in SQLite, valid while the file's content hash
+    and ANALYZER_RULES_VERSION match. A file whose mtime and size are unchanged
+    is trusted without rehashing, as git does for its index.
+    """
+
+    def __init__(self, db_path: str):
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS file_analysis (
+                    path TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    rules_version INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    result TEXT NOT NULL
+                )
+            """)
+        except sqlite3.Error as e:
+            logger.error(f"Code analysis cache unavailable, analyzing every file: {e}")
+            self._db = None
+
+    def lookup(
+        self,
+        project_path: str,
+        file_paths: List[str]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Optional[FileKey]]]:
+        """Split files into cached results and misses (with the key to store their result under)"""
+        rows = {}
+        prefix = os.path.join(project_path, "")
+        if self._db:
+            with self._lock:
+                try:
+                    for path, content_hash, mtime_ns, size, result in self._db.execute(
+                        "SELECT path, content_hash, mtime_ns, size, result FROM file_analysis"
+                        " WHERE rules_version = ? AND substr(path, 1, ?) = ?",
+                        (ANALYZER_RULES_VERSION, len(prefix), prefix)
+                    ):
+                        rows[path] = (content_hash, mtime_ns, size, result)
+                except sqlite3.Error as e:
+                    logger.error(f"Code analysis cache read failed: {e}")
+
+        hits: List[Dict[str, Any]] = []
+        misses: Dict[str, Optional[FileKey]] = {}
+        refreshed: List[Tuple[int, int, str]] = []
+        for path in file_paths:
+            row = rows.get(path)
+            try:
+                # Stat before reading: a write racing the analysis changes it again
+                stat = os.stat(path)
+                if row and row[1] == stat.st_mtime_ns and row[2] == stat.st_size:
+                    hits.append(json.loads(row[3]))
+                    continue
+                with open(path, 'rb') as f:
+                    content_hash = hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                misses[path] = None
+                continue
+            if row and row[0] == content_hash:
+                # Touched but identical
+                hits.append(json.loads(row[3]))
+                refreshed.append((stat.st_mtime_ns, stat.st_size, path))
+            else:
+                misses[path] = (content_hash, stat.st_mtime_ns, stat.st_size)
+        if refreshed:
+            self._write("UPDATE file_analysis SET mtime_ns = ?, size = ? WHERE path = ?", refreshed)
+        return hits, misses
+
+    def store(self, entries: List[Tuple[FileKey, Dict[str, Any]]]):
+        self._write(
+            "INSERT OR REPLACE INTO file_analysis (path, content_hash, rules_version, mtime_ns, size, result)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (result["file"], key[0], ANALYZER_RULES_VERSION, key[1], key[2], json.dumps(result))
+                for key, result in entries
+            ]
+        )
+
+    def prune(self, project_path: str, keep: List[str]):
+        """Drop rows for files under the project that no longer exist (or are now ignored)"""
+        if not self._db:
+            return
+        prefix = os.path.join(project_path, "")
+        with self._lock:
+            try:
+                stored = [
+                    path for (path,) in self._db.execute(
+                        "SELECT path FROM file_analysis WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+                    )
+                ]
+            except sqlite3.Error as e:
+                logger.error(f"Code analysis cache read failed: {e}")
+                return
+        kept = set(keep)
+        gone = [(path,) for path in stored if path not in kept]
+        if gone:
+            self._write("DELETE FROM file_analysis WHERE path = ?", gone)
+
+    def _write(self, sql: str, rows: List[Tuple]):
+        if not self._db or not rows:
+            return
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.executemany(sql, rows)
+            except sqlite3.Error as e:
+                logger.error(f"Code analysis cache write failed: {e}")
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
+
+
 class AdvancedCodeAnalyzer:
     """
     Advanced code analyzer with:
@@ -22,9 +209,12 @@ class AdvancedCodeAnalyzer:
     - Architecture pattern detection
     """
     
-    def __init__(self):
+    def __init__(self, cache_path: Optional[str] = "storage/code_analysis_cache.db"):
         self.security_patterns = self._load_security_patterns()
         self.code_smells = self._load_code_smell_patterns()
+        # Opened on first project analysis; worker processes only analyze files
+        self.cache_path = cache_path
+        self._cache: Optional[AnalysisCache] = None
     
     async def analyze_project(self, project_path: str) -> Dict[str, Any]:
         """Comprehensive project analysis"""
@@ -43,49 +233,176 @@ class AdvancedCodeAnalyzer:
         }
         
         # Scan all files
-        for root, dirs, files in os.walk(project_path):
-            # Skip common ignore directories
-            dirs[:] = [d for d in dirs if d not in ['.git', 'node_modules', '__pycache__', 'venv', 'dist', 'build']]
-            
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_ext = Path(file).suffix
-                
-                # Analyze based on file type
-                if file_ext == '.py':
-                    await self._analyze_python_file(file_path, results)
-                elif file_ext in ['.java', '.kt']:
-                    await self._analyze_java_file(file_path, results)
-                elif file_ext in ['.js', '.ts', '.jsx', '.tsx']:
-                    await self._analyze_javascript_file(file_path, results)
-                elif file_ext in ['.go']:
-                    await self._analyze_go_file(file_path, results)
-                elif file_ext in ['.cs']:
-                    await self._analyze_csharp_file(file_path, results)
-                
-                results["files_analyzed"] += 1
+        project_path = os.path.abspath(project_path)
+        code_files, other_files = await asyncio.to_thread(self._collect_files, project_path)
+        results["files_analyzed"] += other_files
+        
+        # Unchanged files come from the cache; only the rest are analyzed
+        cache = self._get_cache()
+        if cache:
+            cached, misses = await asyncio.to_thread(cache.lookup, project_path, code_files)
+        else:
+            cached, misses = [], dict.fromkeys(code_files)
+        for file_result in cached:
+            self._merge_file_result(results, file_result)
+        
+        fresh: List[Tuple[FileKey, Dict[str, Any]]] = []
+        try:
+            async for file_result in self.iter_file_results(list(misses)):
+                self._merge_file_result(results, file_result)
+                key = misses[file_result["file"]]
+                # Files that crashed a worker are retried on the next analysis
+                if key and "error" not in file_result:
+                    fresh.append((key, file_result))
+        finally:
+            # Keep what was computed even if the analysis is cancelled
+            if cache and fresh:
+                await asyncio.shield(asyncio.to_thread(cache.store, fresh))
+        if cache:
+            await asyncio.to_thread(cache.prune, project_path, code_files)
+        logger.info(f"Analyzed {len(misses)} changed file(s), {len(cached)} from cache")
         
         # Calculate quality score
         results["quality_score"] = self._calculate_quality_score(results)
         
         return results
     
-    async def _analyze_python_file(self, file_path: str, results: Dict[str, Any]):
+    def _get_cache(self) -> Optional[AnalysisCache]:
+        if self._cache is None and self.cache_path:
+            self._cache = AnalysisCache(self.cache_path)
+        return self._cache
+    
+    @staticmethod
+    def _collect_files(project_path: str) -> Tuple[List[str], int]:
+        """Files with an analyzer, and how many other files were seen"""
+        code_files = []
+        other_files = 0
+        for root, dirs, files in os.walk(project_path):
+            # Skip common ignore directories
+            dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+            
+            for file in files:
+                if os.path.splitext(file)[1] in ANALYZERS:
+                    code_files.append(os.path.join(root, file))
+                else:
+                    other_files += 1
+        return code_files, other_files
+    
+    async def iter_file_results(self, file_paths: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Analyze files on the worker processes, yielding each file's result as
+        its batch completes. Cancelling the consumer cancels the queued batches.
+        When a worker dies, every batch it took down is resubmitted to a fresh pool
+        one at a time; a batch that breaks the pool on its own is halved until the
+        file that crashes it is alone, and that file is reported with an ``error``
+        instead of being analyzed in this process.
+        """
+        if len(file_paths) <= CHUNK_SIZE:
+            for file_result in await asyncio.to_thread(lambda: [self.analyze_file(p) for p in file_paths]):
+                yield file_result
+            return
+        
+        chunks = [file_paths[i:i + CHUNK_SIZE] for i in range(0, len(file_paths), CHUNK_SIZE)]
+        chunks.reverse()
+        pool = get_analysis_pool()
+        # Keep every worker busy without queueing the whole project up front
+        max_in_flight = pool._max_workers * 2
+        # future -> (chunk, pool it was submitted to, whether it ran alone)
+        in_flight: Dict[asyncio.Future, Tuple[List[str], ProcessPoolExecutor, bool]] = {}
+        # Batches that were in flight when the pool broke, rerun alone to find the culprit
+        suspects: List[List[str]] = []
+        try:
+            while chunks or suspects or in_flight:
+                if suspects:
+                    if not in_flight:
+                        chunk = suspects.pop()
+                        in_flight[asyncio.wrap_future(pool.submit(_analyze_chunk, chunk))] = (chunk, pool, True)
+                else:
+                    while chunks and len(in_flight) < max_in_flight:
+                        chunk = chunks.pop()
+                        in_flight[asyncio.wrap_future(pool.submit(_analyze_chunk, chunk))] = (chunk, pool, False)
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    chunk, submitted_to, alone = in_flight.pop(future)
+                    try:
+                        file_results = future.result()
+                    except (BrokenProcessPool, asyncio.CancelledError):
+                        # A worker died (e.g. OOM), or a broken pool was shut down with this
+                        # batch still queued; any batch in flight may hold the culprit
+                        if submitted_to is pool:
+                            logger.error("Code analysis worker pool broke, recreating it")
+                            _reset_analysis_pool(submitted_to)
+                            pool = get_analysis_pool()
+                        if not alone:
+                            suspects.append(chunk)
+                            continue
+                        if len(chunk) > 1:
+                            middle = len(chunk) // 2
+                            suspects.extend([chunk[middle:], chunk[:middle]])
+                            continue
+                        logger.error(f"Code analysis worker crashed on {chunk[0]}, skipping it")
+                        file_results = [self._failed_result(chunk[0], "analysis worker crashed")]
+                    for file_result in file_results:
+                        yield file_result
+        finally:
+            for future in in_flight:
+                future.cancel()
+    
+    @staticmethod
+    def _failed_result(file_path: str, error: str) -> Dict[str, Any]:
+        return {
+            "file": file_path,
+            "language": None,
+            "lines": 0,
+            "complexity": None,
+            "security_issues": [],
+            "code_smells": [],
+            "error": error
+        }
+    
+    def analyze_file(self, file_path: str) -> Dict[str, Any]:
+        """Per-file result: lines, language, complexity, security issues and code smells"""
+        file_result = {
+            "file": file_path,
+            "language": None,
+            "lines": 0,
+            "complexity": None,
+            "security_issues": [],
+            "code_smells": []
+        }
+        analyzer = ANALYZERS.get(Path(file_path).suffix)
+        if analyzer:
+            getattr(self, analyzer)(file_path, file_result)
+        return file_result
+    
+    @staticmethod
+    def _merge_file_result(results: Dict[str, Any], file_result: Dict[str, Any]):
+        """Fold one file's result into the project aggregates"""
+        results["files_analyzed"] += 1
+        results["total_lines"] += file_result["lines"]
+        language = file_result["language"]
+        if language:
+            results["languages"][language] = results["languages"].get(language, 0) + 1
+        if file_result["complexity"] is not None:
+            results["complexity"][file_result["file"]] = file_result["complexity"]
+        results["security_issues"].extend(file_result["security_issues"])
+        results["code_smells"].extend(file_result["code_smells"])
+    
+    def _analyze_python_file(self, file_path: str, results: Dict[str, Any]):
         """Analyze Python file using AST"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 code = f.read()
-                results["total_lines"] += len(code.splitlines())
+                results["lines"] = len(code.splitlines())
             
             # Parse AST
             tree = ast.parse(code)
             
             # Count language usage
-            results["languages"]["python"] = results["languages"].get("python", 0) + 1
+            results["language"] = "python"
             
             # Analyze complexity
-            complexity = self._calculate_complexity_python(tree)
-            results["complexity"][file_path] = complexity
+            results["complexity"] = self._calculate_complexity_python(tree)
             
             # Detect security issues
             security_issues = self._detect_security_issues_python(code, file_path)
@@ -208,14 +525,14 @@ class AdvancedCodeAnalyzer:
         
         return smells
     
-    async def _analyze_java_file(self, file_path: str, results: Dict[str, Any]):
+    def _analyze_java_file(self, file_path: str, results: Dict[str, Any]):
         """Analyze Java file"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 code = f.read()
-                results["total_lines"] += len(code.splitlines())
+                results["lines"] = len(code.splitlines())
             
-            results["languages"]["java"] = results["languages"].get("java", 0) + 1
+            results["language"] = "java"
             
             # Basic security checks
             if re.search(r'Statement.*executeQuery.*\+', code):
@@ -230,14 +547,14 @@ class AdvancedCodeAnalyzer:
         except Exception as e:
             logger.error(f"Error analyzing {file_path}: {e}")
     
-    async def _analyze_javascript_file(self, file_path: str, results: Dict[str, Any]):
+    def _analyze_javascript_file(self, file_path: str, results: Dict[str, Any]):
         """Analyze JavaScript/TypeScript file"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 code = f.read()
-                results["total_lines"] += len(code.splitlines())
+                results["lines"] = len(code.splitlines())
             
-            results["languages"]["javascript"] = results["languages"].get("javascript", 0) + 1
+            results["language"] = "javascript"
             
             # Security checks
             if 'eval(' in code:
@@ -261,26 +578,26 @@ class AdvancedCodeAnalyzer:
         except Exception as e:
             logger.error(f"Error analyzing {file_path}: {e}")
     
-    async def _analyze_go_file(self, file_path: str, results: Dict[str, Any]):
+    def _analyze_go_file(self, file_path: str, results: Dict[str, Any]):
         """Analyze Go file"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 code = f.read()
-                results["total_lines"] += len(code.splitlines())
+                results["lines"] = len(code.splitlines())
             
-            results["languages"]["go"] = results["languages"].get("go", 0) + 1
+            results["language"] = "go"
             
         except Exception as e:
             logger.error(f"Error analyzing {file_path}: {e}")
     
-    async def _analyze_csharp_file(self, file_path: str, results: Dict[str, Any]):
+    def _analyze_csharp_file(self, file_path: str, results: Dict[str, Any]):
         """Analyze C# file"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 code = f.read()
-                results["total_lines"] += len(code.splitlines())
+                results["lines"] = len(code.splitlines())
             
-            results["languages"]["csharp"] = results["languages"].get("csharp", 0) + 1
+            results["language"] = "csharp"
             
         except Exception as e:
             logger.error(f"Error analyzing {file_path}: {e}")
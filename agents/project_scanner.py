@@ -3,7 +3,10 @@ Universal Project Scanner Agent
 The "X-Ray" - Manifest-based project analysis
 """
 import os
+import re
 import json
+import fnmatch
+import asyncio
 import logging
 from typing import Dict, Any, List, Optional
 from agents.base import BaseAgent
@@ -11,6 +14,41 @@ from core.workbench.blueprint import BlueprintRegistry
 
 logger = logging.getLogger(__name__)
 
+# Dependency, VCS, build-output and tool directories, pruned before descending
+IGNORED_DIRS = frozenset({
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv",
+    "target", ".gradle", ".tox", ".mypy_cache", ".pytest_cache", ".gemini"
+})
+# Any directory holding this is a virtualenv, whatever it is called
+VENV_MARKER = "pyvenv.cfg"
+
+MANIFEST_NAMES = frozenset({
+    "pom.xml", "build.gradle", "go.mod", "Cargo.toml", "package.json", "requirements.txt",
+    "pyproject.toml", "pubspec.yaml", "angular.json", "tauri.conf.json"
+})
+MANIFEST_GLOBS = re.compile("|".join(fnmatch.translate(glob) for glob in ("*.csproj", "*.sln")))
+
+ENTRY_POINT_NAMES = frozenset({
+    "main.py", "app.py", "index.js", "main.ts",
+    "Main.java", "Program.cs", "main.go", "main.dart"
+})
+# Common non-source/large files left out of the semantic index
+INDEX_SKIPPED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.pdf', '.zip', '.exe')
+
+
+class ProjectTree:
+    """Everything the scan steps need from the file system, gathered in one walk"""
+    
+    def __init__(self):
+        self.manifests: List[str] = []
+        self.entry_points: List[str] = []
+        self.index_files: List[str] = []
+        self.structure: Dict[str, Any] = {
+            "total_files": 0,
+            "directories": [],
+            "file_types": {}
+        }
+
 class UniversalProjectMap:
     """Structured representation of a project's architecture"""
     
@@ -56,6 +94,8 @@ class ProjectScannerAgent(BaseAgent):
         )
         self.orchestrator = orchestrator
         self.blueprint_registry = BlueprintRegistry()
+        # project path -> background semantic indexing, so scans don't wait on embeddings
+        self._index_tasks: Dict[str, asyncio.Task] = {}
     
     async def act(self, task: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Scan a project directory and generate Universal Project Map"""
@@ -76,8 +116,11 @@ class ProjectScannerAgent(BaseAgent):
         """Deep scan of project directory"""
         project_map = UniversalProjectMap()
         
+        # One pruned walk feeds every step below
+        tree = await asyncio.to_thread(self._walk_project, project_path)
+        
         # Step 1: Find all manifest files
-        manifests = self._find_manifests(project_path)
+        manifests = tree.manifests
         project_map.manifest_files = manifests
         
         # Step 2: Detect stack from manifests
@@ -89,38 +132,67 @@ class ProjectScannerAgent(BaseAgent):
             await self._parse_manifest_details(project_path, manifests, project_map)
         
         # Step 4: Analyze file structure
-        project_map.file_structure = self._analyze_structure(project_path)
+        project_map.file_structure = tree.structure
         
         # Step 5: Find entry points
-        project_map.entry_points = self._find_entry_points(project_path, detected_stack)
+        project_map.entry_points = tree.entry_points
         
         # Step 6: Estimate complexity
         project_map.migration_complexity = self._estimate_complexity(project_map)
         
-        # Step 7: Index files for Semantic RAG
-        await self._index_project_files(project_path)
+        # Step 7: Index files for Semantic RAG (in the background)
+        self._schedule_indexing(project_path, tree.index_files)
         
         return project_map
     
-    def _find_manifests(self, project_path: str) -> List[str]:
-        """Find all manifest files in project"""
-        manifests = []
-        manifest_patterns = [
-            "pom.xml", "build.gradle", "*.csproj", "*.sln",
-            "go.mod", "Cargo.toml", "package.json", "requirements.txt",
-            "pyproject.toml", "pubspec.yaml", "angular.json", "tauri.conf.json"
-        ]
+    def _walk_project(self, project_path: str) -> ProjectTree:
+        """
+        Depth-first os.scandir walk in os.walk's top-down order (the first
+        manifest found decides the stack), skipping ignored directories and
+        virtualenvs without listing their contents.
+        """
+        tree = ProjectTree()
+        structure = tree.structure
+        file_types = structure["file_types"]
+        pending = [project_path]
         
-        for root, dirs, files in os.walk(project_path):
-            for file in files:
-                for pattern in manifest_patterns:
-                    if pattern.startswith("*"):
-                        if file.endswith(pattern[1:]):
-                            manifests.append(os.path.join(root, file))
-                    elif file == pattern:
-                        manifests.append(os.path.join(root, file))
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            if directory != project_path and any(entry.name == VENV_MARKER for entry in entries):
+                continue
+            
+            subdirs = []
+            for entry in entries:
+                name = entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    structure["directories"].append(name)
+                    # Like os.walk, list symlinked directories but don't follow them
+                    if name not in IGNORED_DIRS and not entry.is_symlink():
+                        subdirs.append(entry.path)
+                    continue
+                
+                structure["total_files"] += 1
+                ext = os.path.splitext(name)[1]
+                file_types[ext] = file_types.get(ext, 0) + 1
+                if name in MANIFEST_NAMES or MANIFEST_GLOBS.match(name):
+                    tree.manifests.append(entry.path)
+                if name in ENTRY_POINT_NAMES:
+                    tree.entry_points.append(entry.path)
+                if not name.lower().endswith(INDEX_SKIPPED_EXTENSIONS):
+                    tree.index_files.append(entry.path)
+            
+            pending.extend(reversed(subdirs))
         
-        return manifests
+        return tree
     
     def _detect_stack(self, manifests: List[str]) -> Optional[str]:
         """Detect technology stack from manifest files"""
@@ -238,40 +310,6 @@ class ProjectScannerAgent(BaseAgent):
             if "flutter:" in content:
                 project_map.source_stack = "flutter-3.16"
     
-    def _analyze_structure(self, project_path: str) -> Dict[str, Any]:
-        """Analyze directory structure"""
-        structure = {
-            "total_files": 0,
-            "directories": [],
-            "file_types": {}
-        }
-        
-        for root, dirs, files in os.walk(project_path):
-            structure["total_files"] += len(files)
-            structure["directories"].extend(dirs)
-            
-            for file in files:
-                ext = os.path.splitext(file)[1]
-                structure["file_types"][ext] = structure["file_types"].get(ext, 0) + 1
-        
-        return structure
-    
-    def _find_entry_points(self, project_path: str, stack: Optional[str]) -> List[str]:
-        """Find main entry points based on stack"""
-        entry_points = []
-        
-        common_entries = [
-            "main.py", "app.py", "index.js", "main.ts",
-            "Main.java", "Program.cs", "main.go", "main.dart"
-        ]
-        
-        for root, dirs, files in os.walk(project_path):
-            for file in files:
-                if file in common_entries:
-                    entry_points.append(os.path.join(root, file))
-        
-        return entry_points
-    
     def _estimate_complexity(self, project_map: UniversalProjectMap) -> str:
         """Estimate migration complexity"""
         total_files = project_map.file_structure.get("total_files", 0)
@@ -283,27 +321,29 @@ class ProjectScannerAgent(BaseAgent):
             return "medium"
         else:
             return "high"
-    async def _index_project_files(self, project_path: str):
+    
+    def _schedule_indexing(self, project_path: str, files: List[str]):
+        """Start indexing a project, replacing a run still going for an earlier scan of it"""
+        if not self.orchestrator:
+            logger.debug(f"No orchestrator for embeddings, skipping index of {project_path}")
+            return
+        previous = self._index_tasks.get(project_path)
+        if previous and not previous.done():
+            previous.cancel()
+        task = asyncio.create_task(self._index_project_files(project_path, files))
+        self._index_tasks[project_path] = task
+        task.add_done_callback(
+            lambda done: self._index_tasks.pop(project_path, None) if self._index_tasks.get(project_path) is done else None
+        )
+    
+    async def _index_project_files(self, project_path: str, files: List[str]):
         """Index all source files for semantic search"""
         try:
             from core.memory.vector_store import VectorStoreService
             vector_store = VectorStoreService()
             
-            all_files = []
-            for root, _, files in os.walk(project_path):
-                # Ignore common junk and internal directories
-                if any(ignored in root for ignored in ['.git', '__pycache__', 'node_modules', '.venv', '.gemini']):
-                    continue
-                for file in files:
-                    # Ignore common non-source/large files
-                    if file.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.pdf', '.zip', '.exe')):
-                        continue
-                    all_files.append(os.path.join(root, file))
-            
-            logger.info(f"Indexing {len(all_files)} files for project at {project_path}")
-            # Run in a separate thread if needed, but for now we'll do it sequentially
-            # since indexing can be slow
-            vector_store.index_files(all_files)
+            logger.info(f"Indexing {len(files)} files for project at {project_path}")
+            await vector_store.index_files(files, self.orchestrator)
             logger.info(f"Successfully indexed project context for {project_path}")
         except Exception as e:
             logger.error(f"Failed to index project files: {e}")
@@ -135,12 +135,14 @@ You have deep knowledge of:
         
         # Use LLM to solve the task - respect recommended model
         target_model = context.get("model", self.model)
+        # Caller overrides from run_inference(parameters=...)
+        generation = context.get("generation", {})
         
         response = await self.llm.generate(
             prompt=prompt,
             model=target_model,
-            max_tokens=8000,
-            temperature=0.3
+            max_tokens=generation.get("max_tokens", 8000),
+            temperature=generation.get("temperature", 0.3)
         )
         
         # Special logic for infrastructure/Docker
@@ -108,7 +108,7 @@ async def run_inference(
                 prompt=request.prompt,
                 task_type=request.task_type,
                 model=request.model,
-                parameters=request.parameters.model_dump(),
+                parameters=request.parameters.model_dump(exclude_unset=True),
                 context=request.context
             )
             return BaseResponse(
@@ -136,7 +136,7 @@ async def run_inference_stream(
                     prompt=request.prompt,
                     task_type=request.task_type,
                     model=request.model,
-                    parameters=request.parameters,
+                    parameters=request.parameters.model_dump(exclude_unset=True, exclude_none=True),
                     context=request.context
                 ):
                     yield f"data: {chunk}\n\n"
@@ -11,22 +11,27 @@ from platform_core.auth.dependencies import get_db, get_current_active_user, req
 from platform_core.auth.models import User
 from dto.v1.base import BaseResponse, ResponseStatus
 from services.database.explorer import DatabaseExplorerService
-from services.database.connection_manager import (
-    DatabaseConnectionManager
-)
 from dto.v1.requests.generation import DatabaseConfig
+from core.container import container
 
 router = APIRouter(prefix="/database-explorer", tags=["Database Explorer"])
 
-# Initialized via dependency or singleton
-db_manager = DatabaseConnectionManager()
-explorer_service = DatabaseExplorerService(db_manager)
+_explorer_service: Optional[DatabaseExplorerService] = None
+
+
+def get_explorer_service() -> DatabaseExplorerService:
+    """Explorer bound to the container's connection manager, so pools are shared and closed on shutdown"""
+    global _explorer_service
+    if _explorer_service is None:
+        _explorer_service = DatabaseExplorerService(container.db_manager)
+    return _explorer_service
 
 @router.post("/tables", response_model=BaseResponse[List[str]])
 async def list_tables(
     config: DatabaseConfig,
     search: Optional[str] = None,
-    user: User = Depends(require_git_account)
+    user: User = Depends(require_git_account),
+    explorer_service: DatabaseExplorerService = Depends(get_explorer_service)
 ):
     """List all tables in the project database with search"""
     try:
@@ -49,7 +54,8 @@ async def list_tables(
 async def get_schema(
     table_name: str,
     config: DatabaseConfig,
-    user: User = Depends(require_git_account)
+    user: User = Depends(require_git_account),
+    explorer_service: DatabaseExplorerService = Depends(get_explorer_service)
 ):
     """Get schema for a specific table"""
     try:
@@ -68,16 +74,23 @@ async def get_data(
     config: DatabaseConfig,
     limit: int = Query(50, ge=1, le=1000),
     offset: int = Query(0, ge=0),
-    user: User = Depends(require_git_account)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (keyset pagination)"),
+    exact_count: bool = Query(False, description="Run COUNT(*) instead of using planner estimates"),
+    user: User = Depends(require_git_account),
+    explorer_service: DatabaseExplorerService = Depends(get_explorer_service)
 ):
     """Get sample data from a table"""
     try:
-        data = await explorer_service.get_table_data(config, table_name, limit, offset)
+        data = await explorer_service.get_table_data(
+            config, table_name, limit, offset, cursor=cursor, exact_count=exact_count
+        )
         return BaseResponse(
             status=ResponseStatus.SUCCESS,
             code="DB_DATA_RETRIEVED",
             data={"data": data}
         )
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -85,7 +98,8 @@ async def get_data(
 async def execute_custom_query(
     config: DatabaseConfig,
     query: str = Query(...),
-    user: User = Depends(require_git_account)
+    user: User = Depends(require_git_account),
+    explorer_service: DatabaseExplorerService = Depends(get_explorer_service)
 ):
     """Execute a custom SQL SELECT query"""
     try:
@@ -115,7 +115,7 @@ async def write_file(
             status=ResponseStatus.SUCCESS,
             code="FILE_WRITTEN",
             message=f"File {path} written successfully",
-            data=IDEFileResponseDTO(**result) if result else None
+            data=IDEFileResponseDTO(**result).model_dump() if result else None
         )
     except Exception as e:
         logger.error(f"Failed to write file: {e}")
@@ -273,10 +273,15 @@ async def get_completions(
             request.get("offset", 0),
             request.get("language")
         )
+        # The service returns editor completion items; the DTO carries their insert text
+        completions = [
+            item.get("insertText") or item.get("label", "") if isinstance(item, dict) else str(item)
+            for item in result
+        ]
         return BaseResponse(
             status=ResponseStatus.SUCCESS,
             code="COMPLETIONS_RETRIEVED",
-            data=AICompletionResponseDTO(**result)
+            data=AICompletionResponseDTO(completions=completions)
         )
     except Exception as e:
         logger.error(f"Failed to get completions: {e}")
@@ -314,14 +319,15 @@ async def get_diagnostics(
     workspace_id: str,
     path: str,
     language: Optional[str] = None,
+    ai: bool = True,
     api_key: str = Depends(verify_api_key)
 ):
-    """Get code diagnostics"""
+    """Get code diagnostics (set ai=false for local-only checks on every keystroke)"""
     try:
         if not container.editor_service:
             raise HTTPException(status_code=503, detail="Editor service not ready")
             
-        result = await container.editor_service.get_diagnostics(workspace_id, path, language)
+        result = await container.editor_service.get_diagnostics(workspace_id, path, language, include_ai=ai)
         return BaseResponse(
             status=ResponseStatus.SUCCESS,
             code="DIAGNOSTICS_RETRIEVED",
@@ -462,12 +462,15 @@ async def execute_project_workflow(
     if not access_info["has_access"]:
         raise HTTPException(403, "Access denied to execute workflow on this project")
     
-    workflow_id = await container.workflow_engine.execute_workflow(
-        project_id=project_id,
-        user_id=project["user_id"],
-        steps=request.get("steps", ["sync", "update", "push", "build", "run"]),
-        config=request
-    )
+    try:
+        workflow_id = await container.workflow_engine.execute_workflow(
+            project_id=project_id,
+            user_id=project["user_id"],
+            steps=request.get("steps", ["sync", "update", "push", "build", "run"]),
+            config=request
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
     
     return BaseResponse(
         status=ResponseStatus.SUCCESS,
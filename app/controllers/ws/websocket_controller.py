@@ -4,6 +4,7 @@ from typing import Dict, Set, Optional
 import asyncio
 import json
 import logging
+import os
 from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import List, Dict, Set, Optional
@@ -13,91 +14,211 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-class ConnectionManager:
-    """Manages active WebSocket connections with heartbeats and locking."""
+# Per-session connection limit (V2.0: prevent DoS/FD exhaustion)
+MAX_CONNECTIONS_PER_SESSION = 5
+# Messages buffered per connection before it is considered too slow and dropped
+OUTBOUND_QUEUE_SIZE = int(os.getenv("WS_OUTBOUND_QUEUE_SIZE", "256"))
+
+# Socket closes run in the background; hold them so they are not garbage collected mid-close
+_closing: Set[asyncio.Task] = set()
+
+
+class Connection:
+    """One WebSocket with its own outbound queue, drained by a dedicated send task."""
+    
+    def __init__(self, websocket: WebSocket, session_id: str, on_closed):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=OUTBOUND_QUEUE_SIZE)
+        self.closed = False
+        self._on_closed = on_closed
+        self._sender: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._sender = asyncio.create_task(self._send_loop())
+    
+    def enqueue(self, text: str) -> bool:
+        """Queue an already-serialized message without waiting on the peer"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"WebSocket in session {self.session_id} is not keeping up, closing it")
+            self.close(code=1013, reason="Client too slow")
+            return False
+    
+    async def _send_loop(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                await self.websocket.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"WebSocket send failed in session {self.session_id}: {e}")
+            self.close()
+    
+    def close(self, code: Optional[int] = None, reason: str = ""):
+        """Stop sending; with a code, also close the socket (from a background task)"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._sender and self._sender is not asyncio.current_task():
+            self._sender.cancel()
+        if code is not None:
+            task = asyncio.create_task(self._close_socket(code, reason))
+            _closing.add(task)
+            task.add_done_callback(_closing.discard)
+        self._on_closed(self)
+    
+    async def _close_socket(self, code: int, reason: str):
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+
+class _Shard:
+    """A slice of the connection registry with its own lock."""
     
     def __init__(self):
-        # Map of session_id -> set of active WebSockets
-        self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self.lock = asyncio.Lock()
+        # Map of session_id -> active connections
+        self.connections: Dict[str, Set[Connection]] = {}
         # Map of session_id -> connection metadata
-        self.connection_info: Dict[str, Dict] = {}
-        self._lock = asyncio.Lock()
-    
-    async def connect(self, websocket: WebSocket, session_id: str):
-        """Accepts a connection and tracks it with strict resource limits."""
-        async with self._lock:
-            # V2.0 Requirement: Maximum 5 WebSockets per agent (prevent DoS/FD exhaustion)
-            if session_id in self.active_connections and len(self.active_connections[session_id]) >= 5:
-                await websocket.accept() # Must accept before closing gracefully
-                await websocket.close(code=1008, reason="Max concurrent connections reached for agent")
-                return
-
-            await websocket.accept()
-            if session_id not in self.active_connections:
-                self.active_connections[session_id] = set()
-            self.active_connections[session_id].add(websocket)
-            self.connection_info[session_id] = {
-                "connected_at": datetime.utcnow(),
-                "last_heartbeat": datetime.utcnow()
-            }
-        logger.info(f"WebSocket connected: {session_id} (Connections: {len(self.active_connections[session_id])})")
+        self.info: Dict[str, Dict] = {}
+
+
+class ConnectionManager:
+    """
+    Manages active WebSocket connections with heartbeats.
+    Sessions are spread over shards with independent locks, and every
+    connection sends from its own queue, so a broadcast serializes the message
+    once and never waits on a slow peer.
+    """
+    
+    def __init__(self, shards: Optional[int] = None):
+        self.shard_count = shards or int(os.getenv("WS_REGISTRY_SHARDS", "64"))
+        self._shards = [_Shard() for _ in range(self.shard_count)]
+        # websocket -> Connection, for personal messages through the same queue
+        self._by_socket: Dict[WebSocket, Connection] = {}
+    
+    def _shard(self, session_id: str) -> _Shard:
+        return self._shards[hash(session_id) % self.shard_count]
+    
+    @property
+    def active_connections(self) -> Dict[str, Set[WebSocket]]:
+        """Snapshot of session_id -> active WebSockets"""
+        return {
+            sid: {conn.websocket for conn in conns}
+            for shard in self._shards
+            for sid, conns in shard.connections.items()
+        }
+    
+    @property
+    def connection_info(self) -> Dict[str, Dict]:
+        """Snapshot of session_id -> connection metadata"""
+        return {sid: info for shard in self._shards for sid, info in shard.info.items()}
+    
+    async def connect(self, websocket: WebSocket, session_id: str) -> bool:
+        """Accepts a connection and tracks it with strict resource limits. Returns False if rejected."""
+        shard = self._shard(session_id)
+        async with shard.lock:
+            conns = shard.connections.setdefault(session_id, set())
+            if len(conns) >= MAX_CONNECTIONS_PER_SESSION:
+                rejected = True
+            else:
+                rejected = False
+                # Reserve the slot before accepting so concurrent connects respect the limit
+                connection = Connection(websocket, session_id, self._forget)
+                conns.add(connection)
+                self._by_socket[websocket] = connection
+                now = datetime.utcnow()
+                shard.info.setdefault(session_id, {"connected_at": now})["last_heartbeat"] = now
+            count = len(conns)
+        
+        try:
+            await websocket.accept() # Must accept before closing gracefully
+        except Exception:
+            if not rejected:
+                # Release the reserved slot; the peer is already gone
+                connection.close()
+            raise
+        if rejected:
+            await websocket.close(code=1008, reason="Max concurrent connections reached for agent")
+            return False
+        
+        connection.start()
+        logger.info(f"WebSocket connected: {session_id} (Connections: {count})")
+        return True
     
     async def disconnect(self, websocket: WebSocket, session_id: str):
         """Removes a connection and cleans up session if empty."""
-        async with self._lock:
-            if session_id in self.active_connections:
-                self.active_connections[session_id].discard(websocket)
-                if not self.active_connections[session_id]:
-                    del self.active_connections[session_id]
-                    if session_id in self.connection_info:
-                        del self.connection_info[session_id]
+        connection = self._by_socket.get(websocket)
+        if connection:
+            connection.close()
         logger.info(f"WebSocket disconnected: {session_id}")
     
+    def _forget(self, connection: Connection):
+        """Drop a closed connection from the registry (synchronous: safe without the shard lock)"""
+        shard = self._shard(connection.session_id)
+        conns = shard.connections.get(connection.session_id)
+        if conns is not None:
+            conns.discard(connection)
+            if not conns:
+                del shard.connections[connection.session_id]
+                shard.info.pop(connection.session_id, None)
+        if self._by_socket.get(connection.websocket) is connection:
+            del self._by_socket[connection.websocket]
+    
+    def touch(self, session_id: str):
+        """Record activity on a session for the heartbeat monitor"""
+        info = self._shard(session_id).info.get(session_id)
+        if info is not None:
+            info["last_heartbeat"] = datetime.utcnow()
+    
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """Sends a JSON message to a specific websocket."""
+        connection = self._by_socket.get(websocket)
+        if connection:
+            connection.enqueue(json.dumps(message))
+            return
         try:
             await websocket.send_json(message)
         except Exception as e:
             logger.error(f"Failed to send message: {e}")
             # The connection will likely be cleaned up by the caller or heartbeat
     
-    async def broadcast(self, message: dict, session_id: str):
-        """Sends a JSON message to all clients in a session."""
-        if session_id in self.active_connections:
-            dead_connections = set()
-            for connection in list(self.active_connections[session_id]):
-                try:
-                    await connection.send_json(message)
-                except Exception:
-                    dead_connections.add(connection)
-            
-            # Clean up dead connections
-            if dead_connections:
-                async with self._lock:
-                    for dead_conn in dead_connections:
-                        self.active_connections[session_id].discard(dead_conn)
+    async def broadcast(self, message: dict, session_id: str) -> int:
+        """Sends a JSON message to all clients in a session. Returns the number of connections it was queued for."""
+        conns = self._shard(session_id).connections.get(session_id)
+        if not conns:
+            return 0
+        text = json.dumps(message)
+        # Slow or dead peers are closed and unregistered by enqueue/send loop
+        return sum(1 for conn in list(conns) if conn.enqueue(text))
     
     async def heartbeat_monitor(self):
         """Prunes stale connections and zombie sockets every 60s."""
         while True:
             await asyncio.sleep(60) # V2.0 Requirement: 60s ping/pong detection
             now = datetime.utcnow()
-            async with self._lock:
-                stale_sessions = []
-                for session_id, info in self.connection_info.items():
+            for shard in self._shards:
+                async with shard.lock:
                     # Close if no heartbeat for 60 seconds (Aggressive pruning)
-                    if (now - info["last_heartbeat"]).total_seconds() > 60:
-                        stale_sessions.append(session_id)
-                
-                for sid in stale_sessions:
-                    logger.warning(f"Closing stale WebSocket session: {sid}")
-                    for conn in list(self.active_connections.get(sid, [])):
-                        try:
+                    stale_sessions = [
+                        sid for sid, info in shard.info.items()
+                        if (now - info["last_heartbeat"]).total_seconds() > 60
+                    ]
+                    for sid in stale_sessions:
+                        logger.warning(f"Closing stale WebSocket session: {sid}")
+                        for conn in list(shard.connections.get(sid, [])):
                             # V2.0 Requirement: code 1001 (going away)
-                            await conn.close(code=1001)
-                        except: pass
-                    self.active_connections.pop(sid, None)
-                    self.connection_info.pop(sid, None)
+                            conn.close(code=1001)
+                        shard.connections.pop(sid, None)
+                        shard.info.pop(sid, None)
 
 # Global connection manager instance
 manager = ConnectionManager()
@@ -105,10 +226,12 @@ manager = ConnectionManager()
 @router.websocket("/ide/terminal/{sid}")
 async def terminal_websocket(websocket: WebSocket, sid: str):
     """WebSocket for Cloud Shell / Terminal access"""
-    await manager.connect(websocket, sid)
+    if not await manager.connect(websocket, sid):
+        return
     try:
         while True:
             data = await websocket.receive_text()
+            manager.touch(sid)
             # In a real scenario, this would pipe to a shell process
             # For now, we broadcast it back as an echo for verification
             await manager.broadcast({
@@ -117,15 +240,19 @@ async def terminal_websocket(websocket: WebSocket, sid: str):
                 "output": data
             }, sid)
     except WebSocketDisconnect:
+        pass
+    finally:
         await manager.disconnect(websocket, sid)
 
 @router.websocket("/monitoring/stream")
 async def monitoring_stream(websocket: WebSocket):
     """WebSocket for live telemetry stream"""
-    await manager.connect(websocket, "monitoring")
+    if not await manager.connect(websocket, "monitoring"):
+        return
     try:
         while True:
             # Simulate metrics
+            manager.touch("monitoring")
             await websocket.send_json({
                 "type": "telemetry",
                 "timestamp": datetime.utcnow().isoformat(),
@@ -133,18 +260,24 @@ async def monitoring_stream(websocket: WebSocket):
             })
             await asyncio.sleep(2)
     except WebSocketDisconnect:
+        pass
+    finally:
         await manager.disconnect(websocket, "monitoring")
 
 @router.websocket("/collaboration/{sid}")
 async def collaboration_websocket(websocket: WebSocket, sid: str):
     """WebSocket for shared context and cursor syncing"""
-    await manager.connect(websocket, sid)
+    if not await manager.connect(websocket, sid):
+        return
     try:
         while True:
             data = await websocket.receive_json()
+            manager.touch(sid)
             # Broadcast collaboration events to other clients in same session
             await manager.broadcast(data, sid)
     except WebSocketDisconnect:
+        pass
+    finally:
         await manager.disconnect(websocket, sid)
 
 # --- Documentation Endpoint ---
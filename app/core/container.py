@@ -39,7 +39,7 @@ class Container(containers.DeclarativeContainer):
     
     # --- IDE & Development Services ---
     from services.ide import EditorService, TerminalService, DebuggerService
-    editor_service = providers.Singleton(EditorService)
+    editor_service = providers.Singleton(EditorService, orchestrator=orchestrator)
     terminal_service = providers.Singleton(TerminalService)
     debugger_service = providers.Singleton(DebuggerService)
     
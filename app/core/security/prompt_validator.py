@@ -2,15 +2,21 @@
 import re
 import math
 import logging
+from collections import Counter
 from typing import List, Tuple, Dict, Any
 from fastapi import HTTPException
 import tiktoken
 
+try:
+    import numpy as np
+except ImportError:  # Counter fallback for the entropy histogram
+    np = None
+
 logger = logging.getLogger(__name__)
 
 class PromptSecurityValidator:
     """Military-grade validator for LLM inputs with entropy analysis."""
-    
+
     # Required by V2.0 Spec
     INJECTION_PATTERNS = [
         r"(?i)(ignore|disregard|forget).*(previous|instruction)",
@@ -18,7 +24,7 @@ class PromptSecurityValidator:
         r"(\{\{|\}\}|<\{|</s>|###\s*System)",
         r"(?i)(DAN|jailbreak|developer mode|sudo)",
     ]
-    
+
     # Extended patterns for PII and advanced attacks
     PII_PATTERNS = {
         "email": r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+",
@@ -26,6 +32,14 @@ class PromptSecurityValidator:
         "ssn": r"\b\d{3}-\d{2}-\d{4}\b"
     }
 
+    # Characters that IGNORECASE matching folds onto ASCII letters but str.lower()
+    # does not ('K' already lowers to 'k'). Folding them and lowering lets the
+    # case-insensitive patterns run case-sensitively, which re scans far faster.
+    _CASE_FOLD = str.maketrans({"İ": "i", "ı": "i", "ſ": "s"})
+    _CI_PREFIX = "(?i)"
+    # A pattern opening with a group of plain words, e.g. "(ignore|forget)"
+    _LEADING_WORDS = re.compile(r"\(([\w ]+(?:\|[\w ]+)*)\)")
+
     def __init__(self, max_tokens: int = 2000):
         try:
             self.enc = tiktoken.get_encoding("cl100k_base")
@@ -34,44 +48,153 @@ class PromptSecurityValidator:
             self.enc = None
             logger.warning("Tiktoken encoding failed to initialize, using length estimates.")
         self.max_tokens = max_tokens
-        
+        self._compile_patterns()
+
+    def _compile_patterns(self):
+        """
+        Precompile every pattern once. Case-insensitive injection patterns are
+        lowercased to run over the case-folded text, anchored on their leading
+        words; the case-sensitive ones and PII run over the original text.
+        """
+        # (leading word, pattern to verify at its occurrences, pattern continues with ".*")
+        self._injection_anchors: List[Tuple[str, "re.Pattern", bool]] = []
+        self._injection_unanchored: List["re.Pattern"] = []
+        sensitive = []
+        for pattern in self.INJECTION_PATTERNS:
+            body = pattern[len(self._CI_PREFIX):]
+            # Lowercasing is only safe for patterns without escapes (\S vs \s)
+            if not pattern.startswith(self._CI_PREFIX) or "\\" in body:
+                sensitive.append(f"(?:{pattern})")
+                continue
+            body = body.lower()
+            compiled = re.compile(body)
+            leading = self._LEADING_WORDS.match(body)
+            if leading:
+                greedy = body[leading.end():].startswith(".*")
+                self._injection_anchors.extend((word, compiled, greedy) for word in leading.group(1).split("|"))
+            else:
+                self._injection_unanchored.append(compiled)
+
+        categories = {}
+        if sensitive:
+            categories["prompt_injection"] = "|".join(sensitive)
+        for pii_type, pattern in self.PII_PATTERNS.items():
+            if pii_type == "email":
+                # Only start at the beginning of a local-part run: same matches,
+                # but linear instead of quadratic on long runs without '@'
+                pattern = r"(?<![a-zA-Z0-9_.+-])" + pattern
+            categories[f"pii_detected_{pii_type}"] = pattern
+
+        self._categories = list(categories)
+        self._compiled = {name: re.compile(pattern) for name, pattern in categories.items()}
+
     def validate(self, text: str, user_id: str = "unknown") -> tuple[bool, dict]:
         """Analyzes text for injection, PII, and obfuscation."""
         violations = []
-        
+
         # 1. Token bomb protection (Hard Required)
-        token_count = self._get_token_count(text)
-        if token_count > self.max_tokens:
-            logger.warning(f"Security Violation: Token bomb detected from user {user_id} ({token_count} tokens)")
+        token_count, exceeded = self._check_token_budget(text)
+        if exceeded:
+            logger.warning(f"Security Violation: Token bomb detected from user {user_id} ({token_count}+ tokens)")
             return False, {"violations": ["payload_too_large"], "token_count": token_count}
-        
-        # 2. Pattern matching (Hard Required)
-        for pattern in self.INJECTION_PATTERNS:
-            if re.search(pattern, text):
-                violations.append("prompt_injection")
-                break # One hit is enough
-        
+
+        # 2. Pattern matching (Hard Required) and 4. PII detection
+        found = self._scan(text)
+        if "prompt_injection" in found:
+            violations.append("prompt_injection")
+
         # 3. Entropy analysis (Hard Required - detects base64/hex obfuscation)
         entropy = self._shannon_entropy(text)
         # Spec: entropy > 6.0 and len > 100
         if entropy > 6.0 and len(text) > 100:
             violations.append("high_entropy_obfuscation")
-            
-        # 4. PII Detection (Bonus requirement from PII regex spec)
-        for pii_type, pattern in self.PII_PATTERNS.items():
-            if re.search(pattern, text):
-                violations.append(f"pii_detected_{pii_type}")
-        
+
+        violations.extend(
+            f"pii_detected_{pii_type}" for pii_type in self.PII_PATTERNS
+            if f"pii_detected_{pii_type}" in found
+        )
+
         is_safe = len(violations) == 0
         if not is_safe:
             logger.warning(f"Security violations detected for user {user_id}: {violations}")
-            
+
         return is_safe, {
-            "violations": violations, 
+            "violations": violations,
             "entropy": round(entropy, 2),
             "token_count": token_count
         }
 
+    def _scan(self, text: str) -> set:
+        """
+        Find which violation categories occur in the text. Injection keywords are
+        located with str.find; the remaining patterns only run when cheap
+        necessary conditions hold, and each stops at its first hit.
+        """
+        found = set()
+        if self._folded_injection_found(text):
+            found.add("prompt_injection")
+        for name in self._categories:
+            if name not in found and self._possible(name, text) and self._compiled[name].search(text):
+                found.add(name)
+        return found
+
+    def _folded_injection_found(self, text: str) -> bool:
+        """
+        Case-insensitive injection patterns, anchored on their leading words:
+        str.find locates the words (a literal multi-pattern prefilter, far faster
+        than an IGNORECASE alternation in re) and the pattern is verified there.
+        """
+        if not (self._injection_anchors or self._injection_unanchored):
+            return False
+        if not text.isascii() and any(ch in text for ch in "İıſ"):
+            text = text.translate(self._CASE_FOLD)
+        folded = text.lower()
+
+        for word, pattern, greedy in self._injection_anchors:
+            index = folded.find(word)
+            while index != -1:
+                if pattern.match(folded, index):
+                    return True
+                if greedy:
+                    # "word.*X" failed here, so it fails for every later start on this line
+                    index = folded.find("\n", index)
+                    if index == -1:
+                        break
+                index = folded.find(word, index + 1)
+        return any(pattern.search(folded) for pattern in self._injection_unanchored)
+
+    @staticmethod
+    def _possible(category: str, text: str) -> bool:
+        """Cheap necessary conditions that let most prompts skip the PII patterns"""
+        if category == "pii_detected_email":
+            return "@" in text
+        if category in ("pii_detected_credit_card", "pii_detected_ssn"):
+            if category == "pii_detected_ssn" and "-" not in text:
+                return False
+            # Both need at least 9 digits
+            digits = 0
+            for digit in "0123456789":
+                digits += text.count(digit)
+                if digits >= 9:
+                    return True
+            return False
+        return True
+
+    def _check_token_budget(self, text: str) -> Tuple[int, bool]:
+        """Returns (token count, over budget). Oversized prompts are only tokenized far enough to prove it."""
+        if not self.enc:
+            token_count = len(text) // 4 # Rough approximation
+            return token_count, token_count > self.max_tokens
+        if len(text) <= self.max_tokens * 8:
+            token_count = len(self.enc.encode(text))
+            return token_count, token_count > self.max_tokens
+        # A prefix holding more than max_tokens (+1 for the token cut at the boundary) settles it
+        token_count = len(self.enc.encode(text[:self.max_tokens * 8]))
+        if token_count > self.max_tokens + 1:
+            return token_count, True
+        token_count = len(self.enc.encode(text))
+        return token_count, token_count > self.max_tokens
+
     def _get_token_count(self, text: str) -> int:
         if self.enc:
             return len(self.enc.encode(text))
@@ -81,12 +204,23 @@ class PromptSecurityValidator:
         """Calculates Shannon Entropy to detect obfuscation."""
         if not data:
             return 0.0
-        entropy = 0
-        probs = [data.count(c) / len(data) for c in set(data)]
-        for p in probs:
-            if p > 0:
-                entropy -= p * math.log2(p)
+        total = len(data)
+        entropy = 0.0
+        for count in self._char_counts(data):
+            p = count / total
+            entropy -= p * math.log2(p)
         return entropy
 
+    @staticmethod
+    def _char_counts(data: str):
+        """Occurrences of each distinct character, in one pass"""
+        if np is not None and len(data) > 4096:
+            if data.isascii():
+                counts = np.bincount(np.frombuffer(data.encode("ascii"), dtype=np.uint8))
+            else:
+                _, counts = np.unique(np.frombuffer(data.encode("utf-32-le"), dtype=np.uint32), return_counts=True)
+            return counts[counts > 0].tolist()
+        return Counter(data).values()
+
 # Global singleton
 security_validator = PromptSecurityValidator()
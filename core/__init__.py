@@ -1,12 +1,17 @@
 # core/__init__.py
 """Core orchestration modules"""
+import importlib
 
-from .orchestrator import Orchestrator
-from .router import Router
-from .planner import Planner
-from .registry import ModelRegistry
-from .memory import MemoryManager
-from .security import SecurityManager
+# Exported lazily: importing any core submodule (core.utils, core.startup, ...)
+# must not pull in the orchestrator and its runtimes
+_EXPORTS = {
+    'Orchestrator': '.orchestrator',
+    'Router': '.router',
+    'Planner': '.planner',
+    'ModelRegistry': '.registry',
+    'MemoryManager': '.memory',
+    'SecurityManager': '.security',
+}
 
 __all__ = [
     'Orchestrator',
@@ -15,4 +20,12 @@ __all__ = [
     'ModelRegistry',
     'MemoryManager',
     'SecurityManager'
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
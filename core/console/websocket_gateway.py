@@ -2,8 +2,10 @@
 WebSocket Gateway for Live Console
 Bridges browser terminal to Docker containers
 """
+import asyncio
 import logging
-from typing import Dict
+import math
+from typing import Any, Dict, Optional
 from fastapi import WebSocket, WebSocketDisconnect
 import json
 
@@ -60,30 +62,84 @@ class WebSocketGateway:
             del self.sessions[session_id]
     
     async def _stream_console(self, session: ConsoleSession):
-        """Stream console I/O between browser and container"""
-        while session.active:
-            try:
+        """
+        Stream console I/O between browser and container.
+        Output is forwarded as ``{"type": "stream", "stream", "data"}`` messages
+        while the command runs, followed by the final ``{"type": "output"}`` with
+        the complete stdout/stderr and the exit code, as before streaming, so
+        clients that ignore "stream" messages keep working. A ``{"type": "cancel"}``
+        message kills the running command; ``timeout`` must be a positive number.
+        """
+        running: Optional[asyncio.Task] = None
+        try:
+            while session.active:
                 # Receive command from browser
                 data = await session.receive()
-                command_data = json.loads(data)
+                try:
+                    command_data = json.loads(data)
+                except ValueError:
+                    continue
                 
                 if command_data.get("type") == "command":
-                    command = command_data.get("command")
-                    
-                    # Execute in workbench
-                    result = await self.workbench_manager.execute_in_workbench(
-                        session.workbench_id,
-                        command
-                    )
-                    
-                    # Send output back to browser
-                    await session.send(json.dumps({
-                        "type": "output",
-                        "stdout": result.get("stdout", ""),
-                        "stderr": result.get("stderr", ""),
-                        "exit_code": result.get("exit_code", 0)
-                    }))
-                    
-            except Exception as e:
-                logger.error(f"Stream error: {e}")
-                break
+                    if running and not running.done():
+                        await session.send(json.dumps({"type": "error", "message": "A command is already running"}))
+                        continue
+                    timeout = command_data.get("timeout")
+                    if timeout is not None and not self._valid_timeout(timeout):
+                        await session.send(json.dumps({"type": "error", "message": "timeout must be a positive number of seconds"}))
+                        continue
+                    running = asyncio.create_task(self._run_command(session, command_data))
+                elif command_data.get("type") == "cancel" and running and not running.done():
+                    running.cancel()
+        finally:
+            if running and not running.done():
+                running.cancel()
+    
+    async def _run_command(self, session: ConsoleSession, command_data: Dict[str, Any]):
+        """Execute in workbench, sending output back to the browser as it is produced"""
+        exit_code = -1
+        output = {"stdout": [], "stderr": []}
+        
+        def final(error: str = "") -> Dict[str, Any]:
+            stderr = "".join(output["stderr"])
+            if error:
+                stderr = f"{stderr}\n{error}" if stderr else error
+            return {"type": "output", "stdout": "".join(output["stdout"]), "stderr": stderr, "exit_code": exit_code}
+        
+        try:
+            proc = self.workbench_manager.stream_in_workbench(
+                session.workbench_id,
+                command_data.get("command"),
+                timeout=command_data.get("timeout")
+            )
+            async with proc:
+                async for stream, text in proc:
+                    output[stream].append(text)
+                    await session.send(json.dumps({"type": "stream", "stream": stream, "data": text}))
+            exit_code = proc.exit_code
+        except asyncio.CancelledError:
+            await self._send_quietly(session, final("Command cancelled"))
+            raise
+        except asyncio.TimeoutError as e:
+            await self._send_quietly(session, final(str(e) or "Command timed out"))
+            return
+        except Exception as e:
+            logger.error(f"Stream error: {e}")
+            await self._send_quietly(session, final(str(e)))
+            return
+        
+        await self._send_quietly(session, final())
+    
+    @staticmethod
+    def _valid_timeout(timeout: Any) -> bool:
+        # bool is an int subclass, and NaN/inf would never or always expire
+        return (
+            isinstance(timeout, (int, float)) and not isinstance(timeout, bool)
+            and math.isfinite(timeout) and timeout > 0
+        )
+    
+    async def _send_quietly(self, session: ConsoleSession, message: Dict[str, Any]):
+        try:
+            await session.send(json.dumps(message))
+        except Exception:
+            pass
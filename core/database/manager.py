@@ -10,7 +10,6 @@ load_dotenv()
 
 import redis.asyncio as redis
 from motor.motor_asyncio import AsyncIOMotorClient
-from qdrant_client import AsyncQdrantClient
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from app.core.database import Base
@@ -127,6 +126,8 @@ class UnifiedDatabaseManager:
         await self.mongo.admin.command('ping')
 
     async def _init_qdrant(self):
+        # Imported on use: the client package is slow to import
+        from qdrant_client import AsyncQdrantClient
         self.qdrant = AsyncQdrantClient(url=self.qdrant_url, timeout=5)
         await self.qdrant.get_collections()
 
@@ -36,17 +36,17 @@ class ProjectLifecycleService:
         temp_dir = f"temp/test_{project_id}"
         await self.storage.extract_project(project_id, temp_dir)
         
-        # 2. Provision Workbench (Docker)
+        # 2. Generate Build Script (before provisioning: the workspace is copied into the workbench)
+        build_script = self.orchestrator.build_system.generate_build_script(stack, project_meta.get("name"))
+        with open(os.path.join(temp_dir, "build.sh"), "w") as f:
+            f.write(build_script)
+        
+        # 3. Provision Workbench (Docker) and Run Build Script
         workbench = await self.orchestrator.workbench_manager.create_workbench(
             stack=stack,
             project_name=project_meta.get("name", "app"),
             mount_path=os.path.abspath(temp_dir)
         )
-        
-        # 3. Generate and Run Build Script
-        build_script = self.orchestrator.build_system.generate_build_script(stack, project_meta.get("name"))
-        with open(os.path.join(temp_dir, "build.sh"), "w") as f:
-            f.write(build_script)
             
         # Execute build in container
         build_result = await workbench.execute("bash build.sh")
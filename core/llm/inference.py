@@ -43,6 +43,8 @@ class LLMInference:
                 # No event loop running, will retry on first inference call
                 pass
         
+        if getattr(self, "_client_instance", None) is not None:
+            return
         # Initialize client (Ollama uses OpenAI-compatible API)
         try:
             from openai import OpenAI
@@ -67,6 +69,7 @@ class LLMInference:
     ) -> str:
         """Generate response with Dynamic Batching (if applicable) and CALT tracking"""
         # If concurrency is low, we might still benefit from batching via the queue
+        self._ensure_batch_task()
         future = asyncio.get_event_loop().create_future()
         await self.batch_queue.put((prompt, max_tokens, temperature, system_prompt, model or self.model, future))
         return await future
@@ -176,6 +179,7 @@ class LLMInference:
     async def get_embeddings(self, text: str, model: str = None) -> List[float]:
         """Generate semantic embeddings via Open-Source model"""
         target_model = model or os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+        self._ensure_batch_task()
         
         if self.client is None:
             import random
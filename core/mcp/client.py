@@ -5,6 +5,7 @@ Handles communication with MCP Servers over stdio
 import asyncio
 import json
 import logging
+import os
 from typing import Dict, Any, List, Optional, Union
 from core.mcp.protocol import (
     JSONRPCRequest, 
@@ -16,6 +17,9 @@ from core.mcp.protocol import (
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on the initialize/tools handshake, so a silent server cannot stall startup
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "30"))
+
 class MCPClient:
     """Client for Model Context Protocol servers using stdio transport"""
     
@@ -46,18 +50,20 @@ class MCPClient:
             # Start reader task
             self._reader_task = asyncio.create_task(self._read_loop())
             
-            # Initialize connection
-            await self._initialize()
-            
-            # Fetch tools
-            await self.list_tools()
+            # Initialize connection, then fetch tools
+            await asyncio.wait_for(self._handshake(), timeout=MCP_CONNECT_TIMEOUT)
             
             logger.info(f"Connected to MCP server '{self.name}'")
             return True
         except Exception as e:
-            logger.error(f"Failed to connect to MCP server '{self.name}': {e}")
+            logger.error(f"Failed to connect to MCP server '{self.name}': {e!r}")
+            await self.disconnect()
             return False
 
+    async def _handshake(self):
+        await self._initialize()
+        await self.list_tools()
+
     async def _initialize(self):
         """Perform MCP handshake"""
         params = InitializeParams(
@@ -91,6 +97,12 @@ class MCPClient:
             pass
         except Exception as e:
             logger.error(f"MCP client read loop error: {e}")
+        finally:
+            # Nothing will answer once stdout is closed; fail waiters instead of hanging them
+            pending, self.pending_requests = self.pending_requests, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"MCP server '{self.name}' closed its output"))
 
     async def _handle_message(self, message: Dict[str, Any]):
         """Handle incoming JSON-RPC message"""
@@ -149,7 +161,8 @@ class MCPClient:
             self._reader_task.cancel()
         
         if self.process:
-            self.process.terminate()
+            if self.process.returncode is None:
+                self.process.terminate()
             await self.process.wait()
             self.process = None
         
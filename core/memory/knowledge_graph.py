@@ -1,59 +1,227 @@
+import json
 import logging
-from typing import Dict, List, Any, Optional
+import sqlite3
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Set, Iterable, Tuple
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# node_id -> relation -> neighbour ids
+AdjacencyIndex = Dict[str, Dict[str, Set[str]]]
+
+
 class KnowledgeNode:
-    def __init__(self, id: str, type: str, metadata: Dict[str, Any]):
+    def __init__(self, id: str, type: str, metadata: Dict[str, Any], created_at: Optional[datetime] = None):
         self.id = id
         self.type = type
         self.metadata = metadata
-        self.created_at = datetime.now()
+        self.created_at = created_at or datetime.now()
 
 class KnowledgeGraphService:
     """
     🧠 Agentic Knowledge Graph (L3 Memory)
     Provides a relational map of all project entities (Code, Infra, Cost, Security).
+    Edges are held in forward and reverse adjacency indexes keyed by node and
+    relation, and persisted to SQLite so the graph survives restarts.
     """
-    def __init__(self):
+    def __init__(self, db_path: Optional[str] = "storage/knowledge_graph.db", default_max_depth: int = 5):
         self.nodes: Dict[str, KnowledgeNode] = {}
-        self.edges: List[Dict[str, str]] = []  # List of {"from": id, "to": id, "relation": type}
-        logger.info("🧠 KnowledgeGraphService initialized - L3 Relational Reasoning ready")
+        self.forward: AdjacencyIndex = {}
+        self.reverse: AdjacencyIndex = {}
+        self.edge_count = 0
+        self.default_max_depth = default_max_depth
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._open(db_path)
+        logger.info(
+            f"🧠 KnowledgeGraphService initialized - L3 Relational Reasoning ready "
+            f"({len(self.nodes)} nodes, {self.edge_count} edges)"
+        )
+
+    # --- Persistence ---
+
+    def _open(self, db_path: str):
+        """Open the SQLite store and load the persisted graph into the indexes"""
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS kg_nodes (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS kg_edges (
+                    source TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    relation TEXT NOT NULL,
+                    PRIMARY KEY (source, relation, target)
+                );
+            """)
+            for node_id, node_type, metadata, created_at in self._db.execute(
+                "SELECT id, type, metadata, created_at FROM kg_nodes"
+            ):
+                self.nodes[node_id] = KnowledgeNode(
+                    node_id, node_type, json.loads(metadata), datetime.fromisoformat(created_at)
+                )
+            for source, target, relation in self._db.execute("SELECT source, target, relation FROM kg_edges"):
+                self._index_edge(source, target, relation)
+        except sqlite3.Error as e:
+            logger.error(f"Knowledge Graph persistence unavailable, running in-memory only: {e}")
+            self._db = None
+
+    def _persist(self, sql: str, rows: Iterable[Tuple]):
+        if not self._db:
+            return
+        try:
+            with self._db:
+                self._db.executemany(sql, rows)
+        except sqlite3.Error as e:
+            logger.error(f"Knowledge Graph persistence failed: {e}")
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    # --- Mutation ---
+
+    def _index_edge(self, source_id: str, target_id: str, relation: str) -> bool:
+        targets = self.forward.setdefault(source_id, {}).setdefault(relation, set())
+        if target_id in targets:
+            return False
+        targets.add(target_id)
+        self.reverse.setdefault(target_id, {}).setdefault(relation, set()).add(source_id)
+        self.edge_count += 1
+        return True
+
+    def _unindex_node(self, node_id: str):
+        for relation, targets in self.forward.pop(node_id, {}).items():
+            for target in targets:
+                self.reverse.get(target, {}).get(relation, set()).discard(node_id)
+                self.edge_count -= 1
+        for relation, sources in self.reverse.pop(node_id, {}).items():
+            for source in sources:
+                self.forward.get(source, {}).get(relation, set()).discard(node_id)
+                self.edge_count -= 1
 
     async def add_node(self, node_id: str, node_type: str, metadata: Dict[str, Any]):
         """Add a node to the knowledge graph"""
-        self.nodes[node_id] = KnowledgeNode(node_id, node_type, metadata)
+        node = KnowledgeNode(node_id, node_type, metadata)
+        self.nodes[node_id] = node
+        self._persist(
+            "INSERT OR REPLACE INTO kg_nodes (id, type, metadata, created_at) VALUES (?, ?, ?, ?)",
+            [(node_id, node_type, json.dumps(metadata, default=str), node.created_at.isoformat())]
+        )
         logger.debug(f"Knowledge Graph: Added {node_type} node: {node_id}")
 
+    async def remove_node(self, node_id: str):
+        """Remove a node and all of its incident edges"""
+        if self.nodes.pop(node_id, None) is None:
+            return
+        self._unindex_node(node_id)
+        self._persist("DELETE FROM kg_nodes WHERE id = ?", [(node_id,)])
+        self._persist("DELETE FROM kg_edges WHERE source = ? OR target = ?", [(node_id, node_id)])
+
     async def link_nodes(self, source_id: str, target_id: str, relation: str):
         """Create a directed edge between two nodes"""
         if source_id in self.nodes and target_id in self.nodes:
-            self.edges.append({
-                "from": source_id,
-                "to": target_id,
-                "relation": relation
-            })
-            logger.info(f"Knowledge Graph Link: {source_id} --({relation})--> {target_id}")
-
-    async def query_impact(self, node_id: str) -> List[Dict[str, Any]]:
-        """Query all nodes affected by or related to a specific node (Recursive Impact Analysis)"""
+            if self._index_edge(source_id, target_id, relation):
+                self._persist(
+                    "INSERT OR IGNORE INTO kg_edges (source, target, relation) VALUES (?, ?, ?)",
+                    [(source_id, target_id, relation)]
+                )
+                logger.debug(f"Knowledge Graph Link: {source_id} --({relation})--> {target_id}")
+
+    async def link_many(self, edges: Iterable[Tuple[str, str, str]]) -> int:
+        """Bulk-create (source, target, relation) edges in a single transaction"""
+        added = [
+            (source, target, relation) for source, target, relation in edges
+            if source in self.nodes and target in self.nodes and self._index_edge(source, target, relation)
+        ]
+        self._persist("INSERT OR IGNORE INTO kg_edges (source, target, relation) VALUES (?, ?, ?)", added)
+        return len(added)
+
+    @property
+    def edges(self) -> List[Dict[str, str]]:
+        """Flat edge list view ({"from", "to", "relation"}), built on demand"""
+        return [
+            {"from": source, "to": target, "relation": relation}
+            for source, relations in self.forward.items()
+            for relation, targets in relations.items()
+            for target in targets
+        ]
+
+    # --- Queries ---
+
+    def neighbors(
+        self,
+        node_id: str,
+        relations: Optional[Iterable[str]] = None,
+        direction: str = "downstream"
+    ) -> List[Tuple[str, str]]:
+        """Direct (neighbour, relation) pairs; downstream follows edges, upstream reverses them"""
+        indexes = {
+            "downstream": (self.forward,),
+            "upstream": (self.reverse,),
+            "both": (self.forward, self.reverse),
+        }[direction]
+        wanted = set(relations) if relations is not None else None
+        result = []
+        for index in indexes:
+            for relation, others in index.get(node_id, {}).items():
+                if wanted is None or relation in wanted:
+                    result.extend((other, relation) for other in others)
+        return result
+
+    async def query_impact(
+        self,
+        node_id: str,
+        max_depth: Optional[int] = None,
+        relations: Optional[Iterable[str]] = None,
+        direction: str = "downstream"
+    ) -> List[Dict[str, Any]]:
+        """
+        Query all nodes affected by a specific node (Recursive Impact Analysis).
+        Breadth-first over the adjacency index up to ``max_depth`` hops; each node
+        is reported once, at its shortest distance, so cycles terminate.
+        """
+        depth_limit = self.default_max_depth if max_depth is None else max_depth
+        relation_filter = list(relations) if relations is not None else None
+        visited = {node_id}
+        queue = deque([(node_id, 0)])
         impacted = []
-        for edge in self.edges:
-            if edge["from"] == node_id:
-                target = self.nodes.get(edge["to"])
-                if target:
-                    impacted.append({
-                        "node": target.id,
-                        "type": target.type,
-                        "relation": edge["relation"]
-                    })
+        while queue:
+            current, depth = queue.popleft()
+            if depth >= depth_limit:
+                continue
+            for neighbor, relation in self.neighbors(current, relation_filter, direction):
+                if neighbor in visited:
+                    continue
+                visited.add(neighbor)
+                target = self.nodes.get(neighbor)
+                if not target:
+                    continue
+                impacted.append({
+                    "node": target.id,
+                    "type": target.type,
+                    "relation": relation,
+                    "depth": depth + 1,
+                    "via": current
+                })
+                queue.append((neighbor, depth + 1))
         return impacted
 
     async def get_graph_summary(self) -> Dict[str, Any]:
         """Return a high-level summary of the graph state"""
         return {
             "node_count": len(self.nodes),
-            "edge_count": len(self.edges),
-            "types": list(set(n.type for n in self.nodes.values()))
+            "edge_count": self.edge_count,
+            "types": list(set(n.type for n in self.nodes.values())),
+            "persistent": self._db is not None
         }
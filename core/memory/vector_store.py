@@ -6,7 +6,6 @@ import os
 import logging
 import uuid
 from typing import List, Dict, Any, Optional
-from qdrant_client.models import PointStruct, VectorParams, Distance
 
 from core.database.manager import unified_db
 
@@ -35,6 +34,7 @@ class VectorStoreService:
 
     async def ensure_collection(self, vector_size: int = 1536):
         """Ensure the target collection exists in Qdrant"""
+        from qdrant_client.models import VectorParams, Distance
         try:
             collections = await unified_db.qdrant.get_collections()
             exist = any(c.name == self.collection_name for c in collections.collections)
@@ -51,6 +51,7 @@ class VectorStoreService:
 
     async def index_files(self, files: List[str], orchestrator: Any):
         """Index a list of absolute file paths into Qdrant"""
+        from qdrant_client.models import PointStruct
         await self.ensure_collection()
         
         points = []
@@ -0,0 +1,316 @@
+"""
+Message Bus Backends
+Transport layer behind MessageBus: in-process fan-out or Redis Streams with
+consumer groups for delivery across uvicorn workers and pods.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+from typing import Dict, Any, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from core.messaging.bus import MessageBus, Subscription
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBackend:
+    """Base transport; the bus owns queues and workers, the backend moves messages"""
+
+    name = "base"
+
+    def __init__(self):
+        self.bus: Optional["MessageBus"] = None
+
+    def bind(self, bus: "MessageBus"):
+        self.bus = bus
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, topic: str, data: Dict[str, Any]):
+        raise NotImplementedError
+
+    def attach(self, subscription: "Subscription"):
+        """Called when a subscription becomes active"""
+        pass
+
+    def detach(self, subscription: "Subscription"):
+        """Called when a subscription is removed"""
+        pass
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class InMemoryBackend(MessageBackend):
+    """Single-process delivery straight into the local subscriber queues"""
+
+    name = "memory"
+
+    async def publish(self, topic: str, data: Dict[str, Any]):
+        await self.bus.dispatch(topic, data)
+
+
+class RedisStreamsBackend(MessageBackend):
+    """
+    Durable, multi-process transport on Redis Streams.
+
+    - One stream per topic (``<prefix>:<topic>``), trimmed approximately to ``max_len``.
+    - Each subscription reads through a consumer group. Processes subscribing the
+      same handler share a group, so every event is handled once per logical
+      subscriber across the cluster; ``broadcast`` subscriptions get a per-process
+      group so every process sees every event.
+    - Entries are acknowledged only after the handler succeeds. Entries left pending
+      by crashed or slow consumers are reclaimed with XAUTOCLAIM after
+      ``claim_idle_ms``; entries delivered more than ``max_deliveries`` times are
+      moved to ``<stream>:dead`` and acknowledged.
+    - Publishes are buffered and flushed as one pipelined batch of XADDs. Publishing
+      before ``start()`` connects lazily, so early events wait in the stream for
+      the consumers instead of failing.
+    """
+
+    name = "redis"
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        client=None,
+        prefix: str = "bus",
+        consumer_name: Optional[str] = None,
+        max_len: int = 100_000,
+        batch_size: int = 100,
+        linger_ms: float = 2.0,
+        read_count: int = 50,
+        block_ms: int = 1000,
+        claim_idle_ms: int = 30_000,
+        max_deliveries: int = 5
+    ):
+        super().__init__()
+        self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.client = client
+        self.prefix = prefix
+        self.consumer_name = consumer_name or os.getenv(
+            "MESSAGE_BUS_CONSUMER", f"{socket.gethostname()}-{os.getpid()}"
+        )
+        self.max_len = max_len
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self.read_count = read_count
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+
+        self._pending: List[Tuple[str, str, asyncio.Future]] = []
+        self._flush_wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._consumers: Dict[int, asyncio.Task] = {}
+        self._running = False
+        self.metrics = {"published": 0, "batches": 0, "acked": 0, "reclaimed": 0, "dead_lettered": 0}
+
+    def stream_key(self, topic: str) -> str:
+        return f"{self.prefix}:{topic}"
+
+    def group_name(self, subscription: "Subscription") -> str:
+        group = subscription.group
+        if subscription.broadcast:
+            group = f"{group}:{self.consumer_name}"
+        return group
+
+    def _connect(self):
+        if self.client is None:
+            import redis.asyncio as redis
+            self.client = redis.from_url(self.redis_url, decode_responses=True)
+        return self.client
+
+    async def start(self):
+        if self._running:
+            return
+        await self._connect().ping()
+        self._running = True
+        self._flusher = asyncio.create_task(self._flush_loop(), name="messagebus-redis-flusher")
+        for subscriptions in self.bus.subscribers.values():
+            for subscription in subscriptions:
+                self.attach(subscription)
+        logger.info(f"MessageBus Redis Streams backend started (consumer={self.consumer_name})")
+
+    async def stop(self):
+        self._running = False
+        await self.flush()
+        tasks = list(self._consumers.values())
+        if self._flusher:
+            tasks.append(self._flusher)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._consumers.clear()
+        self._flusher = None
+        # Per-process broadcast groups would otherwise accumulate across restarts
+        for subscriptions in self.bus.subscribers.values():
+            for subscription in subscriptions:
+                if subscription.broadcast:
+                    await self._destroy_group(subscription)
+
+    # --- Publishing ---
+
+    async def publish(self, topic: str, data: Dict[str, Any]):
+        """Buffer a message; resolves once its batch has been written to Redis"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((self.stream_key(topic), json.dumps(data, default=str), future))
+        if len(self._pending) >= self.batch_size or not self._running:
+            await self.flush()
+        else:
+            self._flush_wakeup.set()
+        await future
+
+    async def flush(self):
+        """Write all buffered messages in one pipelined round trip"""
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                async with self._connect().pipeline(transaction=False) as pipe:
+                    for key, payload, _ in batch:
+                        pipe.xadd(key, {"data": payload}, maxlen=self.max_len, approximate=True)
+                    await pipe.execute()
+                self.metrics["published"] += len(batch)
+                self.metrics["batches"] += 1
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+            except Exception as e:
+                logger.error(f"MessageBus Redis publish failed for {len(batch)} messages: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _flush_loop(self):
+        while True:
+            await self._flush_wakeup.wait()
+            self._flush_wakeup.clear()
+            # Linger briefly so concurrent publishers share a round trip
+            await asyncio.sleep(self.linger)
+            await self.flush()
+
+    # --- Consuming ---
+
+    def attach(self, subscription: "Subscription"):
+        if not self._running or id(subscription) in self._consumers:
+            return
+        self._consumers[id(subscription)] = asyncio.create_task(
+            self._consume(subscription), name=f"messagebus-redis-{subscription.topic}"
+        )
+
+    def detach(self, subscription: "Subscription"):
+        task = self._consumers.pop(id(subscription), None)
+        if task:
+            task.cancel()
+
+    async def _ensure_group(self, key: str, group: str):
+        try:
+            await self.client.xgroup_create(key, group, id="$", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _destroy_group(self, subscription: "Subscription"):
+        try:
+            await self.client.xgroup_destroy(self.stream_key(subscription.topic), self.group_name(subscription))
+        except Exception as e:
+            logger.debug(f"MessageBus could not destroy broadcast group: {e}")
+
+    def _make_ack(self, key: str, group: str, entry_id: str):
+        async def ack():
+            await self.client.xack(key, group, entry_id)
+            self.metrics["acked"] += 1
+        return ack
+
+    async def _deliver(self, subscription: "Subscription", key: str, group: str, entries):
+        for entry_id, fields in entries:
+            if fields is None:
+                # Entry trimmed from the stream while pending
+                await self.client.xack(key, group, entry_id)
+                continue
+            try:
+                data = json.loads(fields.get("data", "{}"))
+            except json.JSONDecodeError:
+                logger.error(f"MessageBus dropping undecodable entry {entry_id} on {key}")
+                await self.client.xack(key, group, entry_id)
+                continue
+            await self.bus.deliver(subscription, data, ack=self._make_ack(key, group, entry_id))
+
+    async def _reclaim(self, subscription: "Subscription", key: str, group: str):
+        """Dead-letter poison entries, then take over entries idle on other consumers"""
+        stale = await self.client.xpending_range(
+            key, group, min="-", max="+", count=self.read_count, idle=self.claim_idle_ms
+        )
+        for entry in stale:
+            if entry["times_delivered"] >= self.max_deliveries:
+                entry_id = entry["message_id"]
+                original = await self.client.xrange(key, min=entry_id, max=entry_id)
+                if original:
+                    await self.client.xadd(f"{key}:dead", original[0][1], maxlen=self.max_len, approximate=True)
+                await self.client.xack(key, group, entry_id)
+                self.metrics["dead_lettered"] += 1
+                logger.warning(f"MessageBus dead-lettered {entry_id} on {key} after {entry['times_delivered']} deliveries")
+
+        result = await self.client.xautoclaim(
+            key, group, self.consumer_name, min_idle_time=self.claim_idle_ms,
+            start_id="0-0", count=self.read_count
+        )
+        claimed = result[1] if len(result) > 1 else []
+        if claimed:
+            self.metrics["reclaimed"] += len(claimed)
+            await self._deliver(subscription, key, group, claimed)
+
+    async def _consume(self, subscription: "Subscription"):
+        key = self.stream_key(subscription.topic)
+        group = self.group_name(subscription)
+        loop = asyncio.get_running_loop()
+        next_reclaim = 0.0
+        while True:
+            try:
+                await self._ensure_group(key, group)
+                # Entries this consumer read before a restart come first
+                pending = await self.client.xreadgroup(group, self.consumer_name, {key: "0"}, count=self.read_count)
+                for _, entries in pending or []:
+                    await self._deliver(subscription, key, group, entries)
+                while True:
+                    if loop.time() >= next_reclaim:
+                        await self._reclaim(subscription, key, group)
+                        next_reclaim = loop.time() + self.claim_idle_ms / 1000
+                    response = await self.client.xreadgroup(
+                        group, self.consumer_name, {key: ">"}, count=self.read_count, block=self.block_ms
+                    )
+                    for _, entries in response or []:
+                        await self._deliver(subscription, key, group, entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"MessageBus Redis consumer for {key}/{group} failed: {e}")
+                await asyncio.sleep(1)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "consumer": self.consumer_name,
+            "buffered": len(self._pending),
+            **self.metrics
+        }
+
+
+def create_backend(name: Optional[str] = None) -> MessageBackend:
+    """Build the backend selected by ``name`` or the MESSAGE_BUS_BACKEND env var"""
+    name = (name or os.getenv("MESSAGE_BUS_BACKEND", "memory")).lower()
+    if name == "redis":
+        return RedisStreamsBackend()
+    if name != "memory":
+        logger.warning(f"Unknown MESSAGE_BUS_BACKEND '{name}', falling back to in-memory")
+    return InMemoryBackend()
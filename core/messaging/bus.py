@@ -1,14 +1,76 @@
 """
 Asynchronous Message Bus
 Decouples agents and services using a lightweight internal Pub/Sub system.
+Every subscription owns a bounded queue drained by a fixed worker pool, so
+bursts apply backpressure instead of spawning unbounded tasks. Transport is
+pluggable (see core.messaging.backends): in-process or Redis Streams.
 """
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional, Callable, Awaitable
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Set, Tuple
 from collections import defaultdict
 
+from core.messaging.backends import MessageBackend, create_backend
+
 logger = logging.getLogger(__name__)
 
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+Ack = Optional[Callable[[], Awaitable[None]]]
+
+
+class BackpressurePolicy(str, Enum):
+    """What publish does when a subscriber queue is full"""
+    BLOCK = "block"              # wait for room (optionally bounded by a timeout)
+    DROP_OLDEST = "drop_oldest"  # evict the oldest queued message
+    REJECT = "reject"            # refuse the new message with BackpressureError
+
+
+class BackpressureError(Exception):
+    """Raised when a message cannot be queued under the active backpressure policy"""
+    pass
+
+
+@dataclass
+class TopicConfig:
+    max_queue_size: int = 1000
+    policy: BackpressurePolicy = BackpressurePolicy.BLOCK
+    block_timeout: Optional[float] = None
+
+
+@dataclass
+class SubscriptionMetrics:
+    enqueued: int = 0
+    delivered: int = 0
+    failed: int = 0
+    dropped: int = 0
+    rejected: int = 0
+    last_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+@dataclass
+class Subscription:
+    """A handler bound to a topic with its own bounded queue and worker pool"""
+    topic: str
+    handler: Handler
+    workers: int
+    config: TopicConfig
+    queue: asyncio.Queue
+    metrics: SubscriptionMetrics = field(default_factory=SubscriptionMetrics)
+    tasks: List[asyncio.Task] = field(default_factory=list)
+    # Distributed backends: consumer group name (see MessageBus.subscribe) and
+    # whether every process should receive each message instead of sharing the work
+    group: Optional[str] = None
+    broadcast: bool = False
+
+    @property
+    def name(self) -> str:
+        return getattr(self.handler, "__qualname__", repr(self.handler))
+
+
 class MessageBus:
     """Lightweight event bus and message queue for asynchronous coordination"""
 
@@ -19,59 +81,298 @@ class MessageBus:
             cls._instance = super(MessageBus, cls).__new__(cls)
         return cls._instance
 
-    def __init__(self):
+    def __init__(
+        self,
+        default_max_queue_size: int = 1000,
+        default_policy: BackpressurePolicy = BackpressurePolicy.BLOCK,
+        task_queue_size: int = 1000,
+        task_workers: int = 4,
+        backend: Optional[MessageBackend] = None
+    ):
         if hasattr(self, '_initialized') and self._initialized:
             return
-        self.subscribers: Dict[str, List[Callable[[Dict[str, Any]], Awaitable[None]]]] = defaultdict(list)
-        self.task_queue: asyncio.Queue = asyncio.Queue()
+        self.default_config = TopicConfig(default_max_queue_size, BackpressurePolicy(default_policy))
+        self.topic_configs: Dict[str, TopicConfig] = {}
+        self.subscribers: Dict[str, List[Subscription]] = defaultdict(list)
+        # (topic, handler name) -> subscriptions made so far, for default group names
+        self._group_ordinals: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.task_queue: asyncio.Queue = asyncio.Queue(maxsize=task_queue_size)
+        self.task_workers = task_workers
+        self.task_metrics = SubscriptionMetrics()
+        self._worker_tasks: List[asyncio.Task] = []
+        # Acks for messages evicted by DROP_OLDEST, kept so they are not garbage collected mid-flight
+        self._ack_tasks: Set[asyncio.Task] = set()
+        self._running = False
+        # Set by stop(): subscriber workers are not (re)started until the next start()
+        self._stopped = False
+        self.backend = backend or create_backend()
+        self.backend.bind(self)
         self._initialized = True
-        self._worker_task: Optional[asyncio.Task] = None
-        logger.info("MessageBus initialized")
+        logger.info(f"MessageBus initialized (backend={self.backend.name})")
 
     async def start(self):
-        """Start the background task worker"""
-        if not self._worker_task:
-            self._worker_task = asyncio.create_task(self._process_queue())
-            logger.info("MessageBus Background Worker started")
+        """Start the background task workers and all subscriber worker pools"""
+        if self._running:
+            return
+        self._running = True
+        self._stopped = False
+        self._worker_tasks = [
+            asyncio.create_task(self._process_queue(), name=f"messagebus-task-worker-{i}")
+            for i in range(self.task_workers)
+        ]
+        for subscriptions in self.subscribers.values():
+            for subscription in subscriptions:
+                self._ensure_workers(subscription)
+        await self.backend.start()
+        logger.info(f"MessageBus Background Workers started ({self.task_workers} task workers)")
 
     async def stop(self):
-        """Stop the background task worker"""
-        if self._worker_task:
-            self._worker_task.cancel()
-            self._worker_task = None
+        """Stop all background workers; locally queued messages are discarded"""
+        self._running = False
+        self._stopped = True
+        await self.backend.stop()
+        tasks = list(self._worker_tasks)
+        for subscriptions in self.subscribers.values():
+            for subscription in subscriptions:
+                tasks.extend(subscription.tasks)
+                subscription.tasks = []
+        self._worker_tasks = []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._ack_tasks:
+            await asyncio.gather(*list(self._ack_tasks), return_exceptions=True)
+
+    def configure_topic(
+        self,
+        topic: str,
+        max_queue_size: Optional[int] = None,
+        policy: Optional[BackpressurePolicy] = None,
+        block_timeout: Optional[float] = None
+    ):
+        """Set queue bound and backpressure policy used by new subscriptions to a topic"""
+        self.topic_configs[topic] = TopicConfig(
+            max_queue_size=max_queue_size or self.default_config.max_queue_size,
+            policy=BackpressurePolicy(policy or self.default_config.policy),
+            block_timeout=block_timeout
+        )
 
-    def subscribe(self, topic: str, handler: Callable[[Dict[str, Any]], Awaitable[None]]):
-        """Subscribe a handler to a specific topic"""
-        self.subscribers[topic].append(handler)
-        logger.info(f"Subscribed handler to topic: {topic}")
+    def subscribe(
+        self,
+        topic: str,
+        handler: Handler,
+        workers: int = 1,
+        max_queue_size: Optional[int] = None,
+        policy: Optional[BackpressurePolicy] = None,
+        group: Optional[str] = None,
+        broadcast: bool = False
+    ) -> Subscription:
+        """
+        Subscribe a handler to a specific topic with its own queue and worker pool.
+        With a distributed backend, subscriptions sharing ``group`` split the work
+        across processes; ``broadcast`` delivers every message to this process.
+        The default group is the handler's module and qualified name, numbered
+        when several handlers on the topic share it (lambdas, bound methods of
+        different instances), so each gets every message and processes that
+        subscribe in the same order still line up.
+        """
+        base = self.topic_configs.get(topic, self.default_config)
+        config = TopicConfig(
+            max_queue_size=max_queue_size or base.max_queue_size,
+            policy=BackpressurePolicy(policy or base.policy),
+            block_timeout=base.block_timeout
+        )
+        if group is None:
+            name = f"{getattr(handler, '__module__', None) or 'handler'}.{getattr(handler, '__qualname__', type(handler).__qualname__)}"
+            self._group_ordinals[(topic, name)] += 1
+            ordinal = self._group_ordinals[(topic, name)]
+            group = name if ordinal == 1 else f"{name}#{ordinal}"
+        subscription = Subscription(
+            topic=topic,
+            handler=handler,
+            workers=max(1, workers),
+            config=config,
+            queue=asyncio.Queue(maxsize=config.max_queue_size),
+            group=group,
+            broadcast=broadcast
+        )
+        self.subscribers[topic].append(subscription)
+        if self._running:
+            self._ensure_workers(subscription)
+            self.backend.attach(subscription)
+        logger.info(f"Subscribed handler to topic: {topic} (workers={subscription.workers}, policy={config.policy.value})")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscription and stop its workers"""
+        if subscription in self.subscribers.get(subscription.topic, []):
+            self.subscribers[subscription.topic].remove(subscription)
+        self.backend.detach(subscription)
+        for task in subscription.tasks:
+            task.cancel()
+        subscription.tasks = []
 
     async def publish(self, topic: str, data: Dict[str, Any]):
-        """Publish a message to a topic (Fire-and-forget for handlers)"""
-        logger.info(f"Publishing to {topic}: {str(data)[:100]}...")
-        if topic in self.subscribers:
-            for handler in self.subscribers[topic]:
-                # Non-blocking invocation of handlers
-                asyncio.create_task(handler(data))
+        """
+        Publish a message to a topic through the configured backend. In-process,
+        returns once the message is queued for every subscriber and raises
+        BackpressureError if a REJECT (or timed-out BLOCK) queue is full.
+        """
+        logger.debug(f"Publishing to {topic}: {str(data)[:100]}...")
+        await self.backend.publish(topic, data)
+
+    async def dispatch(self, topic: str, data: Dict[str, Any]):
+        """Fan a message out to the local subscriber queues of a topic"""
+        rejected = []
+        for subscription in self.subscribers.get(topic, []):
+            self._ensure_workers(subscription)
+            if not await self._offer(subscription.queue, subscription.config, subscription.metrics, data):
+                rejected.append(subscription.name)
+        if rejected:
+            raise BackpressureError(f"Topic '{topic}' queue full for: {', '.join(rejected)}")
+
+    async def deliver(self, subscription: Subscription, data: Dict[str, Any], ack: Ack = None) -> bool:
+        """
+        Queue a message received by a backend for one subscription. ``ack`` runs once
+        the handler succeeds (or the message is dropped by policy); a rejected message
+        is left unacknowledged for the backend to redeliver.
+        """
+        self._ensure_workers(subscription)
+        return await self._offer(subscription.queue, subscription.config, subscription.metrics, data, ack)
 
     async def enqueue_task(self, task_type: str, payload: Dict[str, Any]):
-        """Add a long-running task to the background queue"""
-        await self.task_queue.put({"type": task_type, "payload": payload})
+        """Add a long-running task to the bounded background queue (blocks when full)"""
+        await self._offer(
+            self.task_queue,
+            TopicConfig(self.task_queue.maxsize, BackpressurePolicy.BLOCK),
+            self.task_metrics,
+            {"type": task_type, "payload": payload}
+        )
         logger.info(f"Task enqueued: {task_type}")
 
+    async def _offer(
+        self,
+        queue: asyncio.Queue,
+        config: TopicConfig,
+        metrics: SubscriptionMetrics,
+        data: Dict[str, Any],
+        ack: Ack = None
+    ) -> bool:
+        """Queue a message according to the backpressure policy; False if it was rejected"""
+        item: Tuple[float, Dict[str, Any], Ack] = (time.monotonic(), data, ack)
+        if config.policy == BackpressurePolicy.BLOCK:
+            try:
+                if config.block_timeout is None:
+                    await queue.put(item)
+                else:
+                    await asyncio.wait_for(queue.put(item), timeout=config.block_timeout)
+            except asyncio.TimeoutError:
+                metrics.rejected += 1
+                return False
+        elif config.policy == BackpressurePolicy.DROP_OLDEST:
+            while queue.full():
+                try:
+                    _, _, dropped_ack = queue.get_nowait()
+                    queue.task_done()
+                    metrics.dropped += 1
+                    if dropped_ack:
+                        task = asyncio.create_task(dropped_ack())
+                        self._ack_tasks.add(task)
+                        task.add_done_callback(self._ack_tasks.discard)
+                except asyncio.QueueEmpty:
+                    break
+            queue.put_nowait(item)
+        else:
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                metrics.rejected += 1
+                return False
+        metrics.enqueued += 1
+        return True
+
+    def _ensure_workers(self, subscription: Subscription):
+        """
+        Start (or restart) the worker pool for a subscription. Before the first
+        start() workers start lazily so early publishes are handled; after stop()
+        nothing is started and messages stay queued until the bus is restarted.
+        """
+        if self._stopped:
+            return
+        subscription.tasks = [t for t in subscription.tasks if not t.done()]
+        for i in range(len(subscription.tasks), subscription.workers):
+            subscription.tasks.append(
+                asyncio.create_task(self._run_subscriber(subscription), name=f"messagebus-{subscription.topic}-{i}")
+            )
+
+    @staticmethod
+    def _record_wait(metrics: SubscriptionMetrics, enqueued_at: float):
+        wait = time.monotonic() - enqueued_at
+        metrics.last_wait_seconds = wait
+        metrics.max_wait_seconds = max(metrics.max_wait_seconds, wait)
+
+    async def _run_subscriber(self, subscription: Subscription):
+        """Worker loop draining one subscription queue"""
+        while True:
+            enqueued_at, data, ack = await subscription.queue.get()
+            try:
+                self._record_wait(subscription.metrics, enqueued_at)
+                await subscription.handler(data)
+                subscription.metrics.delivered += 1
+                if ack:
+                    await ack()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                subscription.metrics.failed += 1
+                logger.error(f"MessageBus handler {subscription.name} failed on {subscription.topic}: {e}")
+            finally:
+                subscription.queue.task_done()
+
     async def _process_queue(self):
-        """Infinite loop to process background tasks"""
+        """Task worker loop: drain the background queue"""
         while True:
             try:
-                task = await self.task_queue.get()
-                logger.info(f"Processing background task: {task['type']}")
-                
-                # In a real system, we'd route this to a specific Worker class
-                # For this implementation, we broadcast it to a special "worker_topic"
-                await self.publish(f"worker:{task['type']}", task["payload"])
-                
-                self.task_queue.task_done()
+                enqueued_at, task, _ = await self.task_queue.get()
+                try:
+                    self._record_wait(self.task_metrics, enqueued_at)
+                    logger.info(f"Processing background task: {task['type']}")
+
+                    # In a real system, we'd route this to a specific Worker class
+                    # For this implementation, we broadcast it to a special "worker_topic"
+                    await self.publish(f"worker:{task['type']}", task["payload"])
+                    self.task_metrics.delivered += 1
+                finally:
+                    self.task_queue.task_done()
             except asyncio.CancelledError:
                 break
             except Exception as e:
+                self.task_metrics.failed += 1
                 logger.error(f"MessageBus worker error: {e}")
                 await asyncio.sleep(1) # Backoff
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth (lag), wait times and drop/reject counters per topic and subscriber"""
+        topics = {}
+        for topic, subscriptions in self.subscribers.items():
+            topics[topic] = [
+                {
+                    "handler": s.name,
+                    "workers": s.workers,
+                    "policy": s.config.policy.value,
+                    "max_queue_size": s.config.max_queue_size,
+                    "lag": s.queue.qsize(),
+                    **vars(s.metrics)
+                }
+                for s in subscriptions
+            ]
+        return {
+            "running": self._running,
+            "backend": self.backend.get_metrics(),
+            "tasks": {
+                "workers": self.task_workers,
+                "lag": self.task_queue.qsize(),
+                **vars(self.task_metrics)
+            },
+            "topics": topics
+        }
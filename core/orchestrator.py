@@ -122,6 +122,9 @@ class Orchestrator:
         # Initialize MCP Servers with dynamic configuration
         await self._initialize_mcp_servers()
         
+        # Start warming workbench containers in the background
+        await self.workbench_manager.start_pool()
+        
         logger.info("Orchestrator initialized successfully")
         
     async def _initialize_mcp_servers(self):
@@ -187,6 +190,9 @@ class Orchestrator:
         # Shutdown memory manager
         await self.memory.shutdown()
         
+        # Remove idle warm workbench containers
+        await self.workbench_manager.stop_pool()
+        
         logger.info("Orchestrator shut down complete")
         
     @retry(retries=3, delay=1.0, backoff=2.0)
@@ -196,9 +202,10 @@ class Orchestrator:
         prompt: str, 
         task_type: TaskType = TaskType.CODE_GENERATION, 
         context: Optional[Dict[str, Any]] = None, 
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        parameters: Optional[Dict[str, Any]] = None
     ):
-        """Run inference with automatic routing"""
+        """Run inference with automatic routing; max_tokens/temperature in parameters apply to the swarm workers"""
         request_id = str(uuid.uuid4())
         start_time = time.time()
         
@@ -207,6 +214,12 @@ class Orchestrator:
             
             # PHASE 1: Use Lead Architect for swarm orchestration
             logger.info(f"Delegating inference to LeadArchitect: task={task_type}")
+            generation = {
+                key: value for key, value in (parameters or {}).items()
+                if key in ("max_tokens", "temperature") and value is not None
+            }
+            if generation:
+                context = {**(context or {}), "generation": generation}
             swarm_result = await self.lead_architect.act(prompt, context)
             
             # If the swarm produced code/output, we can either return it directly
@@ -229,9 +242,21 @@ class Orchestrator:
                     }
                 )
             
+            workers = swarm_result.get("worker_results", {}) if isinstance(swarm_result, dict) else {}
+            output = "\n\n".join(
+                result["solution"] for result in workers.values()
+                if isinstance(result, dict) and isinstance(result.get("solution"), str)
+            )
+            
             return {
                 "request_id": request_id,
                 "status": "success",
+                "model": model or "swarm",
+                "runtime": "swarm",
+                "output": output,
+                # The swarm does not report usage: ~4 characters per token, flagged in metadata
+                "tokens_used": (len(prompt) + len(output)) // 4,
+                "metadata": {"tokens_estimated": True},
                 "swarm_output": swarm_result,
                 "processing_time": processing_time
             }
@@ -0,0 +1,162 @@
+"""
+Startup Budget
+Times imports and startup phases, and warms heavy subsystems in the background
+once the app is serving. Readiness waits only for the warm-ups marked required.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Startup phases slower than this are logged as warnings
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "5"))
+
+
+class StartupReport:
+    """Wall-clock time spent per import group, startup phase and background warm-up"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.ready_at: Optional[float] = None
+        self.timings: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def measure(self, kind: str, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, name, time.perf_counter() - start)
+
+    def imports(self, name: str):
+        return self.measure("import", name)
+
+    def phase(self, name: str):
+        return self.measure("startup", name)
+
+    def record(self, kind: str, name: str, seconds: float):
+        self.timings.append({"kind": kind, "name": name, "seconds": round(seconds, 4)})
+
+    def mark_ready(self):
+        self.ready_at = time.perf_counter()
+        total = self.ready_at - self.started_at
+        imports = sum(t["seconds"] for t in self.timings if t["kind"] == "import")
+        slowest = sorted(
+            (t for t in self.timings if t["kind"] != "warmup"), key=lambda t: t["seconds"], reverse=True
+        )[:5]
+        breakdown = ", ".join(f"{t['name']} {t['seconds']:.2f}s" for t in slowest)
+        message = f"Ready in {total:.2f}s (imports {imports:.2f}s; slowest: {breakdown})"
+        if total > STARTUP_BUDGET_SECONDS:
+            logger.warning(f"{message} - over the {STARTUP_BUDGET_SECONDS:.0f}s startup budget")
+        else:
+            logger.info(message)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ready_after_seconds": round(self.ready_at - self.started_at, 4) if self.ready_at else None,
+            "budget_seconds": STARTUP_BUDGET_SECONDS,
+            "timings": list(self.timings)
+        }
+
+
+class ServiceWarmup:
+    """
+    Heavy subsystems started in the background once the app is serving. Each
+    warm-up runs independently; ``required`` ones gate readiness. Its stop
+    callback runs at shutdown whenever it was started, even if it failed or was
+    cancelled, so partly started subsystems are cleaned up. Request paths that
+    cannot work without a subsystem can ``await wait(name)``.
+    """
+
+    def __init__(self, report: StartupReport):
+        self.report = report
+        self._steps: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._stops: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._required: List[str] = []
+
+    def add(
+        self,
+        name: str,
+        start: Callable[[], Awaitable[Any]],
+        stop: Optional[Callable[[], Awaitable[Any]]] = None,
+        required: bool = False
+    ):
+        self._steps[name] = start
+        if stop:
+            self._stops[name] = stop
+        if required:
+            self._required.append(name)
+
+    def start(self):
+        for name, step in self._steps.items():
+            if name not in self._tasks:
+                self._tasks[name] = asyncio.create_task(self._run(name, step), name=f"warmup-{name}")
+
+    async def _run(self, name: str, step: Callable[[], Awaitable[Any]]):
+        start = time.perf_counter()
+        try:
+            await step()
+            logger.info(f"Warmed up {name} in {time.perf_counter() - start:.2f}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Warm-up of {name} failed: {e}")
+            raise
+        finally:
+            self.report.record("warmup", name, time.perf_counter() - start)
+
+    async def wait(self, name: str, timeout: Optional[float] = None) -> bool:
+        """Wait for a warm-up; False if it failed, timed out or isn't registered"""
+        task = self._tasks.get(name)
+        if not task:
+            return False
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    def status(self) -> Dict[str, str]:
+        states = {}
+        for name in self._steps:
+            task = self._tasks.get(name)
+            if not task:
+                states[name] = "pending"
+            elif not task.done():
+                states[name] = "warming"
+            elif task.cancelled() or task.exception():
+                states[name] = "failed"
+            else:
+                states[name] = "ready"
+        return states
+
+    def is_ready(self) -> bool:
+        """True once every required warm-up has finished successfully"""
+        states = self.status()
+        return all(states[name] == "ready" for name in self._required)
+
+    async def stop(self):
+        """Cancel unfinished warm-ups, then run every started one's stop callback in reverse order"""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        for name in reversed(list(self._steps)):
+            task = self._tasks.get(name)
+            stop = self._stops.get(name)
+            if stop and task:
+                try:
+                    await stop()
+                except Exception as e:
+                    logger.error(f"Failed to stop {name}: {e}")
+        self._tasks.clear()
+
+
+startup_report = StartupReport()
+warmup = ServiceWarmup(startup_report)
@@ -3,5 +3,7 @@ __init__.py for core.workbench package
 """
 from .manager import WorkbenchManager, Workbench
 from .blueprint import BlueprintRegistry, WorkbenchBlueprint
+from .pool import WarmContainerPool
+from .exec_stream import ExecStream
 
-__all__ = ['WorkbenchManager', 'Workbench', 'BlueprintRegistry', 'WorkbenchBlueprint']
+__all__ = ['WorkbenchManager', 'Workbench', 'BlueprintRegistry', 'WorkbenchBlueprint', 'WarmContainerPool', 'ExecStream']
@@ -0,0 +1,210 @@
+"""
+Streaming Workbench Exec
+Runs commands through the Docker exec socket API on a dedicated thread pool
+and hands stdout/stderr to the event loop as they arrive.
+"""
+import asyncio
+import codecs
+import logging
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, AsyncIterator, Optional, Tuple
+
+from docker.utils.socket import STDOUT, STDERR, frames_iter
+from docker.models.containers import Container
+
+logger = logging.getLogger(__name__)
+
+# Each running exec holds one thread blocked on its socket; keep them off the
+# default executor so long commands cannot starve other to_thread work
+_executor: Optional[ThreadPoolExecutor] = None
+
+# The wrapper starts the command in its own session (when setsid exists) and
+# records the PID so the whole process group can be signalled on cancel;
+# docker itself has no API to kill an exec
+EXEC_WRAPPER = (
+    'if command -v setsid >/dev/null 2>&1; then setsid sh -c "$1" & else sh -c "$1" & fi; '
+    'pid=$!; echo $pid > "$0"; wait $pid; rc=$?; rm -f "$0"; exit $rc'
+)
+KILL_SCRIPT = (
+    'pid=$(cat "$0" 2>/dev/null) || exit 0; '
+    'kill -s TERM -- -"$pid" 2>/dev/null || kill -s TERM "$pid" 2>/dev/null; sleep "$1"; '
+    'kill -s KILL -- -"$pid" 2>/dev/null || kill -s KILL "$pid" 2>/dev/null; rm -f "$0"'
+)
+KILL_GRACE_SECONDS = 2
+
+
+def get_exec_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("WORKBENCH_EXEC_THREADS", "64")),
+            thread_name_prefix="workbench-exec"
+        )
+    return _executor
+
+
+class ExecStream:
+    """
+    A command running in a container, iterated as ``(stream, text)`` chunks
+    where stream is "stdout" or "stderr". ``exit_code`` is set once the
+    iteration ends; exceeding ``timeout`` kills the command and raises
+    asyncio.TimeoutError, and cancelling the consuming task kills it too.
+
+        async with workbench.stream("npm test", timeout=300) as proc:
+            async for stream, text in proc:
+                ...
+        print(proc.exit_code)
+    """
+
+    def __init__(
+        self,
+        container: Container,
+        command: str,
+        workdir: str = "/workspace",
+        environment: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ):
+        self.container = container
+        self.command = command
+        self.workdir = workdir
+        self.environment = environment or {}
+        self.timeout = timeout
+        self.exit_code: Optional[int] = None
+        self.timed_out = False
+
+        self._api = container.client.api
+        self._pid_file = f"/tmp/.orchestrator-exec-{uuid.uuid4().hex[:12]}"
+        self._exec_id: Optional[str] = None
+        self._socket = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._reader: Optional[asyncio.Future] = None
+        self._deadline: Optional[float] = None
+        self._finished = False
+        self._killed = False
+
+    async def __aenter__(self) -> "ExecStream":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if not self._finished:
+            await self.kill()
+        await self._close()
+
+    async def start(self):
+        if self._reader:
+            return
+        loop = asyncio.get_running_loop()
+        self._exec_id, self._socket = await loop.run_in_executor(get_exec_executor(), self._open)
+        self._reader = loop.run_in_executor(get_exec_executor(), self._read_frames, loop)
+        self._deadline = time.monotonic() + self.timeout if self.timeout else None
+
+    def _open(self) -> Tuple[str, object]:
+        exec_id = self._api.exec_create(
+            self.container.id,
+            ["sh", "-c", EXEC_WRAPPER, self._pid_file, self.command],
+            workdir=self.workdir,
+            environment=self.environment
+        )["Id"]
+        return exec_id, self._api.exec_start(exec_id, socket=True)
+
+    def _read_frames(self, loop: asyncio.AbstractEventLoop):
+        """Runs on the exec pool: forwards demultiplexed frames until EOF"""
+        decoders = {
+            STDOUT: codecs.getincrementaldecoder("utf-8")(errors="replace"),
+            STDERR: codecs.getincrementaldecoder("utf-8")(errors="replace"),
+        }
+        names = {STDOUT: "stdout", STDERR: "stderr"}
+        try:
+            for stream_id, data in frames_iter(self._socket, tty=False):
+                decoder = decoders.get(stream_id)
+                text = decoder.decode(data) if decoder else ""
+                if text:
+                    loop.call_soon_threadsafe(self._queue.put_nowait, (names[stream_id], text))
+            for stream_id, decoder in decoders.items():
+                tail = decoder.decode(b"", final=True)
+                if tail:
+                    loop.call_soon_threadsafe(self._queue.put_nowait, (names[stream_id], tail))
+        except Exception as e:
+            if not self._killed:
+                loop.call_soon_threadsafe(self._queue.put_nowait, ("stderr", f"\n[exec stream error: {e}]"))
+        finally:
+            loop.call_soon_threadsafe(self._queue.put_nowait, None)
+
+    def __aiter__(self) -> AsyncIterator[Tuple[str, str]]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Tuple[str, str]]:
+        await self.start()
+        try:
+            while True:
+                remaining = self._deadline - time.monotonic() if self._deadline else None
+                try:
+                    if remaining is not None and remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    self.timed_out = True
+                    await self.kill()
+                    raise asyncio.TimeoutError(f"Command timed out after {self.timeout}s")
+                if item is None:
+                    break
+                yield item
+            self._finished = True
+            self.exit_code = await self._exit_code()
+        except asyncio.CancelledError:
+            await asyncio.shield(self.kill())
+            raise
+
+    async def wait(self) -> int:
+        """Drain the output and return the exit code"""
+        async for _ in self:
+            pass
+        return self.exit_code
+
+    async def _exit_code(self) -> int:
+        loop = asyncio.get_running_loop()
+        # The daemon may report the exec as running for a moment after EOF
+        for _ in range(20):
+            info = await loop.run_in_executor(get_exec_executor(), self._api.exec_inspect, self._exec_id)
+            if not info.get("Running") and info.get("ExitCode") is not None:
+                return info["ExitCode"]
+            await asyncio.sleep(0.05)
+        return -1
+
+    async def kill(self):
+        """Signal the command (TERM, then KILL after a grace period) and stop reading"""
+        if self._killed or not self._exec_id:
+            return
+        self._killed = True
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(get_exec_executor(), self._kill_in_container)
+        except Exception as e:
+            logger.warning(f"Failed to signal exec in {self.container.name}: {e}")
+        await self._close()
+
+    def _kill_in_container(self):
+        kill_id = self._api.exec_create(
+            self.container.id, ["sh", "-c", KILL_SCRIPT, self._pid_file, str(KILL_GRACE_SECONDS)]
+        )["Id"]
+        self._api.exec_start(kill_id, detach=True)
+
+    async def _close(self):
+        """Unblock the reader thread by shutting the exec socket down"""
+        if self._socket is None:
+            return
+        sock, self._socket = self._socket, None
+        raw = getattr(sock, "_sock", sock)
+        try:
+            raw.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+        try:
+            sock.close()
+        except Exception:
+            pass
@@ -2,43 +2,75 @@
 Universal Workbench Manager
 Manages Docker-based isolated environments for any tech stack
 """
+import asyncio
+import io
 import logging
+import os
+import posixpath
+import tarfile
 import uuid
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import docker
 from docker.models.containers import Container
 from core.workbench.blueprint import BlueprintRegistry, WorkbenchBlueprint
+from core.workbench.exec_stream import ExecStream
+from core.workbench.pool import WarmContainerPool
 
 logger = logging.getLogger(__name__)
 
 class Workbench:
     """Represents a single isolated workbench environment"""
     
-    def __init__(self, workbench_id: str, stack: str, container: Container, blueprint: WorkbenchBlueprint):
+    def __init__(
+        self,
+        workbench_id: str,
+        stack: str,
+        container: Container,
+        blueprint: WorkbenchBlueprint,
+        environment: Optional[Dict[str, str]] = None,
+        sync_path: Optional[str] = None
+    ):
         self.id = workbench_id
         self.stack = stack
         self.container = container
         self.blueprint = blueprint
+        # Warm containers are started before they are assigned, so the
+        # workbench environment is applied per exec: only commands run through
+        # stream()/execute() see it, not PID 1, a plain `docker exec` or `docker inspect`
+        self.environment = environment or {}
+        # Host directory the project was copied from (warm containers only); writes
+        # in /workspace reach it through sync_workspace(), not a bind mount
+        self.sync_path = sync_path
         self.status = "running"
         
-    async def execute(self, command: str, workdir: str = "/workspace") -> Dict[str, Any]:
-        """Execute a command inside the workbench"""
+    def stream(self, command: str, workdir: str = "/workspace", timeout: Optional[float] = None) -> ExecStream:
+        """Run a command, yielding ("stdout" | "stderr", text) chunks as they are produced"""
+        return ExecStream(self.container, command, workdir=workdir, environment=self.environment, timeout=timeout)
+    
+    async def execute(self, command: str, workdir: str = "/workspace", timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Execute a command inside the workbench and collect its output"""
+        output = {"stdout": [], "stderr": []}
         try:
-            exec_result = self.container.exec_run(
-                cmd=f"sh -c '{command}'",
-                workdir=workdir,
-                demux=True
-            )
-            
-            stdout = exec_result.output[0].decode() if exec_result.output[0] else ""
-            stderr = exec_result.output[1].decode() if exec_result.output[1] else ""
+            async with self.stream(command, workdir, timeout) as proc:
+                async for stream, text in proc:
+                    output[stream].append(text)
             
             return {
-                "exit_code": exec_result.exit_code,
-                "stdout": stdout,
-                "stderr": stderr,
-                "success": exec_result.exit_code == 0
+                "exit_code": proc.exit_code,
+                "stdout": "".join(output["stdout"]),
+                "stderr": "".join(output["stderr"]),
+                "success": proc.exit_code == 0
+            }
+        except asyncio.TimeoutError:
+            logger.warning(f"Command in workbench {self.id} timed out after {timeout}s")
+            return {
+                "exit_code": -1,
+                "stdout": "".join(output["stdout"]),
+                "stderr": "".join(output["stderr"]) + f"\nCommand timed out after {timeout}s",
+                "success": False
             }
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"Failed to execute command in workbench {self.id}: {e}")
             return {
@@ -48,15 +80,72 @@ class Workbench:
                 "success": False
             }
     
+    async def sync_workspace(self):
+        """
+        Copy /workspace back to the host directory the project was copied from.
+        Files are added and overwritten; files deleted in the container are left on the host.
+        """
+        if self.sync_path:
+            await asyncio.to_thread(_extract_workspace, self.container, self.sync_path)
+    
     async def upload_file(self, local_path: str, container_path: str):
-        """Upload a file to the workbench"""
-        # Implementation would use docker.put_archive
-        pass
+        """Upload a file or directory to the workbench (``container_path`` is the target path)"""
+        archive = await asyncio.to_thread(_tar_path, local_path, os.path.basename(container_path.rstrip("/")))
+        target_dir = posixpath.dirname(container_path.rstrip("/")) or "/"
+        await asyncio.to_thread(self.container.exec_run, ["mkdir", "-p", target_dir])
+        await asyncio.to_thread(self.container.put_archive, target_dir, archive)
     
     async def download_file(self, container_path: str, local_path: str):
-        """Download a file from the workbench"""
-        # Implementation would use docker.get_archive
-        pass
+        """Download a file or directory from the workbench to ``local_path``"""
+        def download():
+            stream, _ = self.container.get_archive(container_path)
+            buffer = io.BytesIO(b"".join(stream))
+            name = posixpath.basename(container_path.rstrip("/"))
+            with tarfile.open(fileobj=buffer) as archive:
+                for member in archive.getmembers():
+                    member.name = os.path.join(os.path.basename(local_path), os.path.relpath(member.name, name))
+                parent = os.path.dirname(os.path.abspath(local_path))
+                os.makedirs(parent, exist_ok=True)
+                if hasattr(tarfile, "data_filter"):
+                    archive.extractall(parent, filter="data")
+                else:
+                    archive.extractall(parent)
+        await asyncio.to_thread(download)
+
+
+def _tar_directory(path: str) -> bytes:
+    """Pack the contents of a directory (not the directory itself) into an in-memory tar"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for name in sorted(os.listdir(path)):
+            archive.add(os.path.join(path, name), arcname=name)
+    return buffer.getvalue()
+
+
+def _extract_workspace(container: Container, target: str):
+    """Unpack the container's /workspace contents into ``target``"""
+    stream, _ = container.get_archive("/workspace")
+    with tarfile.open(fileobj=io.BytesIO(b"".join(stream))) as archive:
+        members = []
+        for member in archive.getmembers():
+            # Entries are rooted at "workspace/"; drop that component
+            _, _, member.name = member.name.partition("/")
+            if member.name:
+                members.append(member)
+        os.makedirs(target, exist_ok=True)
+        if hasattr(tarfile, "data_filter"):
+            archive.extractall(target, members=members, filter="data")
+        else:
+            archive.extractall(target, members=members)
+
+
+def _tar_path(local_path: str, arcname: str) -> bytes:
+    """Pack a file or directory into an in-memory tar for put_archive"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        archive.add(local_path, arcname=arcname)
+    return buffer.getvalue()
+
 
 class WorkbenchManager:
     """Manages lifecycle of all workbenches"""
@@ -71,14 +160,35 @@ class WorkbenchManager:
         
         self.workbenches: Dict[str, Workbench] = {}
         self.blueprint_registry = BlueprintRegistry()
+        self.pool = WarmContainerPool(self.docker_client, self.blueprint_registry)
+    
+    async def start_pool(self):
+        """Start keeping warm containers for the configured stacks"""
+        try:
+            await self.pool.start()
+        except Exception as e:
+            logger.error(f"Failed to start workbench pool: {e}")
+    
+    async def stop_pool(self):
+        """Remove idle warm containers (claimed workbenches are left running)"""
+        await self.pool.stop()
     
     async def create_workbench(
         self,
         stack: str,
         project_name: str = None,
-        mount_path: str = None
+        mount_path: str = None,
+        live_mount: bool = False
     ) -> Workbench:
-        """Create a new isolated workbench for a specific stack"""
+        """
+        Create a new isolated workbench for a specific stack.
+        A warm container from the pool is claimed and ``mount_path`` is copied
+        into its /workspace. Docker cannot add a bind mount to a running
+        container, so writes only reach ``mount_path`` through
+        ``Workbench.sync_workspace()``, which also runs when the workbench is
+        destroyed. Pass ``live_mount=True`` (or run with an empty pool) to start a
+        fresh container with ``mount_path`` bind-mounted instead.
+        """
         if not self.docker_client:
             raise RuntimeError("Docker client not available")
         
@@ -89,13 +199,6 @@ class WorkbenchManager:
         workbench_id = f"wb-{uuid.uuid4().hex[:8]}"
         container_name = f"orchestrator-{workbench_id}"
         
-        logger.info(f"Creating workbench {workbench_id} for stack {stack}")
-        
-        # Prepare volumes
-        volumes = {}
-        if mount_path:
-            volumes[mount_path] = {"bind": "/workspace", "mode": "rw"}
-        
         # Environment variables
         environment = {
             "WORKBENCH_ID": workbench_id,
@@ -103,48 +206,64 @@ class WorkbenchManager:
             "PROJECT_NAME": project_name or "migration"
         }
         
-        # Create Dockerfile content for universal tooling
-        dockerfile_content = f"""
-FROM {blueprint.base_image}
-
-# Install universal tooling
-RUN apt-get update && apt-get install -y \\
-    git \\
-    curl \\
-    jq \\
-    wget \\
-    vim \\
-    && rm -rf /var/lib/apt/lists/*
-
-# Set working directory
-WORKDIR /workspace
-
-# Keep container running
-CMD ["tail", "-f", "/dev/null"]
-"""
+        container = None if live_mount else await self.pool.claim(blueprint)
+        if container:
+            logger.info(f"Creating workbench {workbench_id} for stack {stack} from warm container {container.name}")
+            try:
+                await asyncio.to_thread(container.rename, container_name)
+                if mount_path:
+                    archive = await asyncio.to_thread(_tar_directory, mount_path)
+                    await asyncio.to_thread(container.put_archive, "/workspace", archive)
+            except Exception as e:
+                logger.error(f"Failed to prepare warm container: {e}")
+                await asyncio.to_thread(container.remove, force=True)
+                raise
+        else:
+            logger.info(f"Creating workbench {workbench_id} for stack {stack} (cold start)")
+            container = await self._start_cold(blueprint, container_name, mount_path, environment)
+        
+            mount_path = None  # Bind-mounted: nothing to sync back
+        
+        workbench = Workbench(workbench_id, stack, container, blueprint, environment, sync_path=mount_path)
+        self.workbenches[workbench_id] = workbench
+        
+        logger.info(f"Workbench {workbench_id} created successfully")
+        return workbench
+    
+    async def _start_cold(
+        self,
+        blueprint: WorkbenchBlueprint,
+        container_name: str,
+        mount_path: Optional[str],
+        environment: Dict[str, str]
+    ) -> Container:
+        """Start a dedicated container with the project bind-mounted"""
+        # Prepare volumes
+        volumes = {}
+        if mount_path:
+            volumes[mount_path] = {"bind": "/workspace", "mode": "rw"}
+        
+        # The tooling image is built once per base image and shared with the pool
+        image = await self.pool.tooling_image(blueprint.base_image)
         
         try:
-            # For simplicity, we'll use the base image directly
-            # In production, you'd build custom images with universal tools
-            container = self.docker_client.containers.run(
-                image=blueprint.base_image,
+            container = await asyncio.to_thread(
+                self.docker_client.containers.run,
+                image=image,
                 name=container_name,
                 detach=True,
                 volumes=volumes,
                 environment=environment,
+                working_dir="/workspace",
                 network_mode="bridge",
                 remove=False,
                 command="tail -f /dev/null"  # Keep container alive
             )
             
-            # Install universal tools
-            await self._install_universal_tools(container)
-            
-            workbench = Workbench(workbench_id, stack, container, blueprint)
-            self.workbenches[workbench_id] = workbench
-            
-            logger.info(f"Workbench {workbench_id} created successfully")
-            return workbench
+            if image == blueprint.base_image:
+                # Tooling image unavailable, install tools in place
+                await self._install_universal_tools(container)
+            return container
             
         except Exception as e:
             logger.error(f"Failed to create workbench: {e}")
@@ -159,7 +278,7 @@ CMD ["tail", "-f", "/dev/null"]
         
         for cmd in commands:
             try:
-                container.exec_run(cmd)
+                await asyncio.to_thread(container.exec_run, ["sh", "-c", cmd])
             except:
                 pass  # Best effort
     
@@ -167,14 +286,27 @@ CMD ["tail", "-f", "/dev/null"]
         self,
         workbench_id: str,
         command: str,
-        workdir: str = "/workspace"
+        workdir: str = "/workspace",
+        timeout: Optional[float] = None
     ) -> Dict[str, Any]:
         """Execute a command in a specific workbench"""
+        return await self.get_workbench(workbench_id).execute(command, workdir, timeout)
+    
+    def stream_in_workbench(
+        self,
+        workbench_id: str,
+        command: str,
+        workdir: str = "/workspace",
+        timeout: Optional[float] = None
+    ) -> ExecStream:
+        """Stream a command's output from a specific workbench"""
+        return self.get_workbench(workbench_id).stream(command, workdir, timeout)
+    
+    def get_workbench(self, workbench_id: str) -> Workbench:
         workbench = self.workbenches.get(workbench_id)
         if not workbench:
             raise ValueError(f"Workbench {workbench_id} not found")
-        
-        return await workbench.execute(command, workdir)
+        return workbench
     
     async def destroy_workbench(self, workbench_id: str):
         """Destroy a workbench and cleanup resources"""
@@ -183,6 +315,11 @@ CMD ["tail", "-f", "/dev/null"]
             logger.warning(f"Workbench {workbench_id} not found")
             return
         
+        try:
+            await workbench.sync_workspace()
+        except Exception as e:
+            logger.error(f"Failed to sync workbench {workbench_id} back to {workbench.sync_path}: {e}")
+        
         try:
             workbench.container.stop()
             workbench.container.remove()
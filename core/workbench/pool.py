@@ -0,0 +1,233 @@
+"""
+Warm Workbench Container Pool
+Keeps pre-started, idle containers per blueprint image so creating a workbench
+is a claim plus a project copy instead of an image build and container start.
+"""
+import asyncio
+import collections
+import hashlib
+import io
+import logging
+import os
+import uuid
+from typing import Deque, Dict, Any, List, Optional
+
+from docker.models.containers import Container
+from core.workbench.blueprint import BlueprintRegistry, WorkbenchBlueprint
+
+logger = logging.getLogger(__name__)
+
+POOL_LABEL = "orchestrator.pool"
+POOL_NAME_PREFIX = "orchestrator-pool-"
+DEFAULT_POOL_STACKS = "python-3.12,node-20,java-21,go-1.22"
+
+# Universal tooling, installed with whichever package manager the base image has
+TOOLING_DOCKERFILE = """
+FROM {base_image}
+
+# Install universal tooling
+RUN (apt-get update && apt-get install -y git curl jq wget vim && rm -rf /var/lib/apt/lists/*) \\
+    || apk add --no-cache git curl jq wget vim bash \\
+    || yum install -y git curl jq wget vim \\
+    || true
+
+# Set working directory
+WORKDIR /workspace
+
+# Keep container running
+CMD ["tail", "-f", "/dev/null"]
+"""
+
+
+class WarmContainerPool:
+    """
+    Idle containers per blueprint base image, replenished in the background.
+    Stacks sharing a base image (e.g. the node-20 based frontends) share one
+    pool, since a warm container only differs per workbench by its environment,
+    which is passed on every exec.
+
+    Limitations of claimed containers compared to a cold start: WORKBENCH_ID,
+    STACK and PROJECT_NAME are not part of the container config, so only execs
+    made through the Workbench see them. The project is copied in rather than
+    bind-mounted, and reaches the host again only via Workbench.sync_workspace().
+    """
+
+    def __init__(
+        self,
+        docker_client,
+        registry: Optional[BlueprintRegistry] = None,
+        target_size: Optional[int] = None,
+        stacks: Optional[List[str]] = None,
+        refill_interval: Optional[float] = None
+    ):
+        self.docker_client = docker_client
+        self.registry = registry or BlueprintRegistry()
+        self.target_size = target_size if target_size is not None else int(os.getenv("WORKBENCH_POOL_SIZE", "2"))
+        if stacks is None:
+            stacks = [s.strip() for s in os.getenv("WORKBENCH_POOL_STACKS", DEFAULT_POOL_STACKS).split(",") if s.strip()]
+        self.stacks = [stack for stack in stacks if self.registry.get_blueprint(stack)]
+        self.refill_interval = refill_interval or float(os.getenv("WORKBENCH_POOL_REFILL_INTERVAL", "30"))
+
+        # base image -> idle containers ready to be claimed
+        self._idle: Dict[str, Deque[Container]] = collections.defaultdict(collections.deque)
+        # base image -> tooling image tag (or the base image if the build failed)
+        self._images: Dict[str, str] = {}
+        self._image_locks: Dict[str, asyncio.Lock] = collections.defaultdict(asyncio.Lock)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.docker_client is not None and self.target_size > 0 and bool(self.stacks)
+
+    def pooled_images(self) -> List[str]:
+        return sorted({self.registry.get_blueprint(stack).base_image for stack in self.stacks})
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        """Adopt warm containers left by a previous process and start the replenisher"""
+        if not self.enabled or self._task:
+            return
+        await asyncio.to_thread(self._adopt_existing)
+        self._task = asyncio.create_task(self._replenish_loop())
+        logger.info(f"Workbench pool started: {self.target_size} warm container(s) for {', '.join(self.pooled_images())}")
+
+    async def stop(self):
+        """Stop replenishing and remove the idle containers"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        containers = [container for idle in self._idle.values() for container in idle]
+        self._idle.clear()
+        await asyncio.gather(*(asyncio.to_thread(self._remove, c) for c in containers))
+
+    def _adopt_existing(self):
+        pooled = set(self.pooled_images())
+        for container in self.docker_client.containers.list(all=True, filters={"label": POOL_LABEL}):
+            base_image = container.labels.get(POOL_LABEL)
+            idle = self._idle[base_image]
+            if (
+                container.status == "running"
+                and container.name.startswith(POOL_NAME_PREFIX)
+                and base_image in pooled
+                and len(idle) < self.target_size
+            ):
+                idle.append(container)
+            elif container.name.startswith(POOL_NAME_PREFIX):
+                # Stopped, surplus or no longer configured
+                self._remove(container)
+        adopted = sum(len(idle) for idle in self._idle.values())
+        if adopted:
+            logger.info(f"Adopted {adopted} warm workbench container(s)")
+
+    async def _replenish_loop(self):
+        while True:
+            try:
+                await self.replenish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Workbench pool replenish failed: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def replenish(self):
+        """Start containers until every pooled image has ``target_size`` idle ones"""
+        starts = []
+        for base_image in self.pooled_images():
+            missing = self.target_size - len(self._idle[base_image])
+            starts.extend(self._add_container(base_image) for _ in range(max(0, missing)))
+        if starts:
+            await asyncio.gather(*starts)
+
+    async def _add_container(self, base_image: str):
+        try:
+            image = await self.tooling_image(base_image)
+            container = await asyncio.to_thread(self._start_container, base_image, image)
+            self._idle[base_image].append(container)
+        except Exception as e:
+            logger.warning(f"Could not start warm container for {base_image}: {e}")
+
+    def _start_container(self, base_image: str, image: str) -> Container:
+        return self.docker_client.containers.run(
+            image=image,
+            name=f"{POOL_NAME_PREFIX}{uuid.uuid4().hex[:8]}",
+            detach=True,
+            labels={POOL_LABEL: base_image},
+            working_dir="/workspace",
+            network_mode="bridge",
+            remove=False,
+            command="tail -f /dev/null"
+        )
+
+    # --- Images ---
+
+    async def tooling_image(self, base_image: str) -> str:
+        """Tag of the base image with universal tooling baked in, built once per Dockerfile revision"""
+        if base_image in self._images:
+            return self._images[base_image]
+        async with self._image_locks[base_image]:
+            if base_image not in self._images:
+                self._images[base_image] = await asyncio.to_thread(self._ensure_tooling_image, base_image)
+            return self._images[base_image]
+
+    def _ensure_tooling_image(self, base_image: str) -> str:
+        dockerfile = TOOLING_DOCKERFILE.format(base_image=base_image)
+        digest = hashlib.sha256(dockerfile.encode()).hexdigest()[:12]
+        tag = f"orchestrator-workbench:{digest}"
+        try:
+            self.docker_client.images.get(tag)
+            return tag
+        except Exception:
+            pass
+        try:
+            logger.info(f"Building workbench tooling image {tag} from {base_image}")
+            self.docker_client.images.build(fileobj=io.BytesIO(dockerfile.encode()), tag=tag, rm=True)
+            return tag
+        except Exception as e:
+            logger.warning(f"Tooling image build failed for {base_image}, using the base image: {e}")
+            return base_image
+
+    # --- Claiming ---
+
+    async def claim(self, blueprint: WorkbenchBlueprint) -> Optional[Container]:
+        """Take a running idle container for the blueprint, or None if the pool is empty"""
+        if not self.enabled:
+            return None
+        idle = self._idle.get(blueprint.base_image)
+        try:
+            while idle:
+                container = idle.popleft()
+                # A warm container may have died since it was started
+                await asyncio.to_thread(container.reload)
+                if container.status == "running":
+                    return container
+                await asyncio.to_thread(self._remove, container)
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to claim warm container for {blueprint.base_image}: {e}")
+            return None
+        finally:
+            self._wake.set()
+
+    def _remove(self, container: Container):
+        try:
+            container.remove(force=True)
+        except Exception as e:
+            logger.debug(f"Failed to remove pool container {container.name}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "target_size": self.target_size,
+            "idle": {image: len(self._idle.get(image, ())) for image in self.pooled_images()},
+            "images": dict(self._images)
+        }
@@ -12,78 +12,48 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from fastapi.exceptions import RequestValidationError
-from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+# Import and startup timings (see /health/startup)
+from core.startup import startup_report, warmup
 
-# Load .env file
-load_dotenv()
-import uvicorn
-from starlette.exceptions import HTTPException as StarletteHTTPException
+with startup_report.imports("fastapi"):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+    from fastapi.exceptions import RequestValidationError
+    from fastapi.middleware.cors import CORSMiddleware
+    import uvicorn
+    from starlette.exceptions import HTTPException as StarletteHTTPException
 
 # Core Imports
-from core.orchestrator import Orchestrator
-from core.container import container
-from middleware.rate_limit import RateLimitMiddleware
-from dto.v1.base import ErrorResponse, ErrorDetail
-
-# Platform Components
-from services.git import GitCredentialManager, RepositoryManager
-from services.database import DatabaseConnectionManager, SchemaAnalyzer, EntityGenerator
-from services.registry import LanguageRegistry
-from platform_core.auth.dependencies import require_git_account
-
-# Services
-from services.ide import EditorService, TerminalService, DebuggerService
-from services.project_manager import ProjectManager
-from services.git_sync import GitSyncService
-from services.ai_update_service import AIUpdateService
-from services.build_service import BuildService
-from services.runtime_service import RuntimeService
-from services.workflow_engine import WorkflowEngine
-from services.monitoring import RealtimeMonitoringService
-from core.storage import StorageManager, BackupManager
-from services.collaboration import CollaborationService
-from core.database.manager import unified_db
-
-# Extreme Power 2026 Imports
-from services.devops.iac_engine import AutonomousIaCEngine
-from services.monitoring.cost_pilot import AICostPilot
-from services.security.red_team_ai import RedTeamAI
-
-# Next-Gen Core 2026+ Imports
-from core.messaging.bus import MessageBus
-from services.monitoring.calt_service import CALTLogger
-
-# Strategic 20/20 Refinements
-from services.mcp.bridge import MCPBridge
-
-# Hyper-Intelligence 2026 Final Imports
-from core.memory.knowledge_graph import KnowledgeGraphService
-from services.security.quantum_vault import QuantumVaultService
+# Services are constructed on first use by the container; heavy subsystems are
+# warmed in the background once the app is ready (see lifespan)
+with startup_report.imports("service container"):
+    from core.container import container
+    from core.database.manager import unified_db
+    from middleware.rate_limit import RateLimitMiddleware
+    from dto.v1.base import ErrorResponse, ErrorDetail
+    from platform_core.auth.dependencies import require_git_account
 
 # Controllers
-from app.controllers.v1.endpoints.system import router as system_router
-from app.controllers.v1.endpoints.ai import router as ai_router
-from app.controllers.v1.endpoints.projects import router as project_router
-from app.controllers.v1.endpoints.git import router as git_router
-from app.controllers.v1.endpoints.ide import router as ide_router
-from app.controllers.v1.endpoints.storage import router as storage_router
-from app.controllers.v1.endpoints.monitoring import router as monitoring_router
-from app.controllers.v1.endpoints.admin import router as admin_router
-from app.controllers.v1.endpoints.workspace import router as workspace_router
-from app.controllers.v1.endpoints.enterprise import router as enterprise_router
-from app.controllers.v1.endpoints.auth import router as auth_controller
-from app.controllers.v1.endpoints.db_explorer import router as db_explorer_controller
-from app.controllers.v1.endpoints.tools import router as tools_router
-from app.controllers.v1.endpoints.registry import router as registry_router
-from app.controllers.v1.endpoints.emulator import router as emulator_router
-from app.controllers.ws.websocket_controller import router as ws_router
-from app.middleware.exception_handler import register_exception_handlers
-from app.middleware.logging_context import logging_context_middleware
-from core.utils.logging import setup_logging
+with startup_report.imports("controllers"):
+    from app.controllers.v1.endpoints.system import router as system_router
+    from app.controllers.v1.endpoints.ai import router as ai_router
+    from app.controllers.v1.endpoints.projects import router as project_router
+    from app.controllers.v1.endpoints.git import router as git_router
+    from app.controllers.v1.endpoints.ide import router as ide_router
+    from app.controllers.v1.endpoints.storage import router as storage_router
+    from app.controllers.v1.endpoints.monitoring import router as monitoring_router
+    from app.controllers.v1.endpoints.admin import router as admin_router
+    from app.controllers.v1.endpoints.workspace import router as workspace_router
+    from app.controllers.v1.endpoints.enterprise import router as enterprise_router
+    from app.controllers.v1.endpoints.auth import router as auth_controller
+    from app.controllers.v1.endpoints.db_explorer import router as db_explorer_controller
+    from app.controllers.v1.endpoints.tools import router as tools_router
+    from app.controllers.v1.endpoints.registry import router as registry_router
+    from app.controllers.v1.endpoints.emulator import router as emulator_router
+    from app.controllers.ws.websocket_controller import router as ws_router
+    from app.middleware.exception_handler import register_exception_handlers
+    from app.middleware.logging_context import logging_context_middleware
+    from core.utils.logging import setup_logging
 
 # Configure logging
 setup_logging(os.getenv("LOG_LEVEL", "INFO").upper())
@@ -93,112 +63,83 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Lifecycle management for the application"""
     
-    # Startup
+    # Startup: only what requests cannot do without
     logger.info("Starting AI Orchestrator...")
-    orchestrator = Orchestrator()
-    await orchestrator.initialize()
+    with startup_report.phase("orchestrator"):
+        # The container's instance, so controllers share the initialized one
+        orchestrator = container.orchestrator
     
     # Initialize Unified Database Stack
-    await unified_db.initialize()
-    
-    # Initialize Core Services (Shared with Orchestrator where relevant)
-    git_credentials = orchestrator.git_credentials
-    repo_manager = RepositoryManager(git_credentials)
-    db_manager = DatabaseConnectionManager()
-    schema_analyzer = SchemaAnalyzer(db_manager)
-    entity_generator = EntityGenerator(orchestrator)
-    language_registry = LanguageRegistry()
-    
-    logger.info("Platform services initialized")
-    
-    # Initialize IDE Services
-    editor_service = EditorService()
-    terminal_service = TerminalService()
-    debugger_service = DebuggerService()
+    with startup_report.phase("databases"):
+        await unified_db.initialize()
     
-    # Initialize Project Management Services
-    project_manager = ProjectManager()
-    git_sync_service = GitSyncService()
-    ai_update_service = AIUpdateService(orchestrator)
-    build_service = BuildService()
-    runtime_service = RuntimeService()
-    monitoring_service = RealtimeMonitoringService()
-    storage_manager = orchestrator.storage
-    backup_manager = BackupManager()
-    collaboration_service = CollaborationService()
+    # Next-Gen Core 2026+ Services
+    with startup_report.phase("message bus"):
+        await container.message_bus.start() # Start background worker
     
-    workflow_engine = WorkflowEngine({
-        "project_manager": project_manager,
-        "git_sync": git_sync_service,
-        "ai_update": ai_update_service,
-        "build": build_service,
-        "runtime": runtime_service
-    })
-    
-    # Initialize Service Container
-    container.initialize_services(
-        orchestrator, git_credentials, repo_manager, db_manager,
-        schema_analyzer, entity_generator, language_registry
-    )
-    
-    container.initialize_ide_services(
-        editor_service, terminal_service, debugger_service
-    )
-    
-    container.initialize_project_services(
-        project_manager, git_sync_service, ai_update_service,
-        build_service, runtime_service, workflow_engine, monitoring_service,
-        storage_manager, backup_manager, collaboration_service
-    )
-    
-    # 3. Initialize Extreme Power 2026 Services
-    iac_engine = AutonomousIaCEngine(orchestrator)
-    cost_pilot = AICostPilot(monitoring_service)
-    red_team_ai = RedTeamAI(orchestrator)
+    # Auth router is now handled via Controller registration below
+    container.auth_router = auth_controller
     
-    container.initialize_extreme_power_services(iac_engine, cost_pilot, red_team_ai)
-    logger.info("Extreme Power 2026 services initialized and registered")
+    # Heavy subsystems warm up after readiness, each timed in the startup report
+    registry_updates = []
     
-    # 4. Initialize Next-Gen Core 2026+ Services
-    message_bus = MessageBus()
-    await message_bus.start() # Start background worker
-    calt_logger = CALTLogger()
+    async def start_registry_updates():
+        from services.registry.registry_updater import RegistryUpdater
+        updater = RegistryUpdater()
+        registry_updates.append((updater, asyncio.create_task(updater.schedule_periodic_updates(interval_hours=24))))
     
-    container.initialize_next_gen_services(message_bus, calt_logger)
-    logger.info("Next-Gen Core 2026+ services (CALT, MessageBus) initialized and registered")
+    async def stop_registry_updates():
+        for updater, task in registry_updates:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await updater.client.close()
     
-    # 5. Initialize Hyper-Intelligence Final 2026 Services
-    knowledge_graph = KnowledgeGraphService()
-    quantum_vault = QuantumVaultService(orchestrator)
+    async def warm_vector_store():
+        if unified_db.qdrant:
+            from core.memory.vector_store import VectorStoreService
+            await VectorStoreService().ensure_collection()
     
-    container.initialize_hyper_intelligence_services(knowledge_graph, quantum_vault)
-    logger.info("Hyper-Intelligence Final 2026 services (KG, PQC) initialized and registered")
+    async def warm_docker_sandbox():
+        # Connect the instances requests use, off the event loop; a throwaway
+        # DockerSandboxService would leave their first use connecting on the loop
+        from services.mobile.mobile_service import mobile_service
+        runtime = container.runtime_service
+        await asyncio.gather(
+            asyncio.to_thread(lambda: runtime.sandbox_service),
+            asyncio.to_thread(lambda: mobile_service.sandbox)
+        )
     
-    # 6. Initialize Strategic 20/20 Optimization Services
-    mcp_bridge = MCPBridge(orchestrator)
-    container.initialize_strategic_services(mcp_bridge)
-    logger.info("Strategic 20/20 services (MCP Bridge) initialized and registered")
+    async def resume_workflows():
+        # Resumed steps run through the orchestrator, so it must be initialized first
+        if not await warmup.wait("orchestrator"):
+            raise RuntimeError("orchestrator warm-up failed, interrupted workflows stay queued")
+        await container.workflow_engine.resume_incomplete()
     
-    # Auth router is now handled via Controller registration below
-    container.auth_router = auth_controller
-    logger.info("Auth router registered in container")
-
-    # Start background tasks
-    await monitoring_service.start()
+    async def warm_collaboration():
+        container.collaboration_service
     
-    from services.registry.registry_updater import RegistryUpdater
-    updater = RegistryUpdater()
-    asyncio.create_task(updater.schedule_periodic_updates(interval_hours=24))
+    # Runtimes, memory, MCP servers and the workbench pool
+    # Requests need loaded runtimes and policies, so readiness waits for this one
+    warmup.add("orchestrator", orchestrator.initialize, orchestrator.shutdown, required=True)
+    warmup.add("workflows", resume_workflows, lambda: container.workflow_engine.shutdown())
+    warmup.add("monitoring", lambda: container.monitoring_service.start(), lambda: container.monitoring_service.stop())
+    warmup.add("vector store", warm_vector_store)
+    warmup.add("docker sandbox", warm_docker_sandbox)
+    warmup.add("collaboration", warm_collaboration)
+    warmup.add("registry updates", start_registry_updates, stop_registry_updates)
+    warmup.start()
     
-    logger.info("AI Orchestrator initialized successfully")
+    startup_report.mark_ready()
+    logger.info("AI Orchestrator ready, warming up background services")
     
     yield
     
     # Shutdown
     logger.info("Shutting down AI Orchestrator...")
-    await container.monitoring_service.stop()
+    await warmup.stop()
+    await container.message_bus.stop()
     await unified_db.close()
-    await orchestrator.shutdown()
+    await container.db_manager.close_all()
     logger.info("AI Orchestrator shut down successfully")
 
 
@@ -271,8 +212,15 @@ async def live_check():
 
 @app.get("/health/ready")
 async def ready_check():
-    """K8s Readiness Probe."""
-    return {"status": "ready"}
+    """K8s Readiness Probe. 503 until the required warm-ups (the orchestrator) have finished."""
+    if not warmup.is_ready():
+        return JSONResponse(status_code=503, content={"status": "warming", "warmup": warmup.status()})
+    return {"status": "ready", "warmup": warmup.status()}
+
+@app.get("/health/startup")
+async def startup_check():
+    """Import, startup and warm-up timings for this process."""
+    return {**startup_report.as_dict(), "warmup": warmup.status()}
 
 # Add CORS middleware - SECURITY: Restrict origins in production
 # Get allowed origins from environment variable
@@ -3,7 +3,6 @@ Transformers Runtime - Direct integration with HuggingFace Transformers
 """
 import logging
 import yaml
-import torch
 from typing import Dict, Any, AsyncGenerator
 from pathlib import Path
 from runtimes.base import BaseRuntime
@@ -11,6 +10,12 @@ from runtimes.base import BaseRuntime
 logger = logging.getLogger(__name__)
 
 
+def _torch():
+    """torch takes seconds to import; only load it once this runtime is used"""
+    import torch
+    return torch
+
+
 class TransformersRuntime(BaseRuntime):
     """HuggingFace Transformers runtime implementation"""
     
@@ -30,7 +35,7 @@ class TransformersRuntime(BaseRuntime):
                 
             # Set device
             device_config = self.config.get("device", "cuda")
-            if device_config == "cuda" and torch.cuda.is_available():
+            if device_config == "cuda" and _torch().cuda.is_available():
                 self.device = "cuda"
             else:
                 self.device = "cpu"
@@ -69,7 +74,7 @@ class TransformersRuntime(BaseRuntime):
             model = AutoModelForCausalLM.from_pretrained(
                 model_name,
                 device_map=self.config.get("device_map", "auto"),
-                torch_dtype=getattr(torch, self.config.get("torch_dtype", "float16")),
+                torch_dtype=getattr(_torch(), self.config.get("torch_dtype", "float16")),
                 trust_remote_code=self.config.get("trust_remote_code", True),
                 low_cpu_mem_usage=self.config.get("low_cpu_mem_usage", True)
             )
@@ -101,8 +106,8 @@ class TransformersRuntime(BaseRuntime):
                 self.loaded_models.remove(model_name)
                 
             # Clear CUDA cache if using GPU
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
+            if _torch().cuda.is_available():
+                _torch().cuda.empty_cache()
                 
             logger.info(f"Model {model_name} unloaded")
             return {"status": "unloaded", "model": model_name}
@@ -131,7 +136,7 @@ class TransformersRuntime(BaseRuntime):
                 inputs = inputs.to("cuda")
                 
             # Generate
-            with torch.no_grad():
+            with _torch().no_grad():
                 outputs = model_obj.generate(
                     **inputs,
                     max_new_tokens=kwargs.get("max_tokens", 2048),
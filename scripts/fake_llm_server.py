@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Fake Inference Server for load testing
+Speaks enough of the Ollama and OpenAI-compatible (vLLM) APIs for the
+orchestrator's runtimes, with configurable time-to-first-token, token rate
+and error injection. Needs no model, GPU or network access.
+
+    python scripts/fake_llm_server.py --ttft-ms 200 --tokens-per-second 40 --error-rate 0.02
+
+Every port given with --port serves both API families, so one process can
+stand in for Ollama (11434) and vLLM (config/runtimes.yaml) at once.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+EMBEDDING_DIMENSIONS = 768
+# Tokens are drawn from this vocabulary so responses look like code and prose
+VOCABULARY = (
+    "def class return import self async await for in if else None True False "
+    "the model output result value data request response token stream error "
+    "( ) : , . = + [ ] { } \n    "
+).split(" ")
+
+
+@dataclass
+class FakeLLMConfig:
+    """Latency and failure profile of the fake server"""
+    ttft_ms: float = 150.0
+    tokens_per_second: float = 50.0
+    output_tokens: int = 64
+    # Relative +/- variation applied to TTFT and per-token delay
+    jitter: float = 0.1
+    # Fraction of requests answered with error_status instead of tokens
+    error_rate: float = 0.0
+    error_status: int = 500
+    # Fraction of streaming responses cut off half way through
+    stream_abort_rate: float = 0.0
+    seed: int = 42
+    models: tuple = ("qwen2.5-coder:7b", "llama3.1:8b", "mistral:7b")
+
+
+class FakeLLMServer:
+    """Serves the fake Ollama and OpenAI endpoints and counts what it answered"""
+
+    def __init__(self, config: FakeLLMConfig):
+        self.config = config
+        self.requests = 0
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "aborted": 0, "tokens": 0}
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            # Ollama
+            web.get("/api/tags", self.ollama_tags),
+            web.get("/api/version", self.ollama_version),
+            web.post("/api/show", self.ollama_show),
+            web.post("/api/pull", self.ollama_pull),
+            web.post("/api/generate", self.ollama_generate),
+            web.post("/api/chat", self.ollama_chat),
+            web.post("/api/embeddings", self.ollama_embeddings),
+            # OpenAI-compatible (vLLM, llama.cpp server)
+            web.get("/health", self.health),
+            web.get("/v1/models", self.openai_models),
+            web.post("/v1/completions", self.openai_completions),
+            web.post("/v1/chat/completions", self.openai_chat_completions),
+            web.post("/v1/embeddings", self.openai_embeddings),
+            # Harness
+            web.get("/_fake/stats", self.get_stats),
+            web.post("/_fake/stats/reset", self.reset_stats),
+        ])
+        return app
+
+    # --- Request planning ---
+
+    def _plan(self, max_tokens: Optional[int]) -> Dict[str, Any]:
+        """
+        Decide the fate of one request. Each request gets its own RNG seeded
+        from the server seed and its sequence number, so a run is repeatable
+        regardless of how requests interleave.
+        """
+        self.requests += 1
+        self.stats["requests"] += 1
+        rng = random.Random(f"{self.config.seed}:{self.requests}")
+        count = self.config.output_tokens
+        if max_tokens:
+            count = min(count, int(max_tokens))
+        return {
+            "rng": rng,
+            "fail": rng.random() < self.config.error_rate,
+            "abort": rng.random() < self.config.stream_abort_rate,
+            "tokens": [rng.choice(VOCABULARY) + " " for _ in range(max(count, 1))],
+        }
+
+    def _jittered(self, rng: random.Random, seconds: float) -> float:
+        if not self.config.jitter:
+            return seconds
+        return max(0.0, seconds * (1 + rng.uniform(-self.config.jitter, self.config.jitter)))
+
+    async def _tokens(self, plan: Dict[str, Any], stop_after: Optional[int] = None):
+        """
+        Yield tokens on schedule: the first after the TTFT, the rest at the
+        configured rate. Delays are against an absolute schedule so timer
+        overshoot does not accumulate over long outputs.
+        """
+        rng = plan["rng"]
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+        due = loop.time() + self._jittered(rng, self.config.ttft_ms / 1000.0)
+        for index, token in enumerate(plan["tokens"]):
+            if stop_after is not None and index >= stop_after:
+                return
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.stats["tokens"] += 1
+            yield token
+            due += self._jittered(rng, interval)
+
+    async def _complete(self, plan: Dict[str, Any]) -> str:
+        return "".join([token async for token in self._tokens(plan)])
+
+    def _embedding(self, text: str) -> List[float]:
+        """A fixed vector per text, so similarity search results are repeatable"""
+        rng = random.Random(f"{self.config.seed}:{text}")
+        return [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIMENSIONS)]
+
+    def _error(self, openai: bool = False) -> web.Response:
+        self.stats["errors"] += 1
+        message = "injected failure from fake inference server"
+        body = {"error": {"message": message, "type": "server_error"}} if openai else {"error": message}
+        return web.json_response(body, status=self.config.error_status)
+
+    async def _stream(
+        self,
+        request: web.Request,
+        plan: Dict[str, Any],
+        content_type: str,
+        frame: Callable[[str], bytes],
+        final: Callable[[], List[str]]
+    ) -> web.StreamResponse:
+        """Write one frame per token, then the closing frames (unless the stream is aborted)"""
+        response = web.StreamResponse(headers={"Content-Type": content_type, "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        stop_after = len(plan["tokens"]) // 2 if plan["abort"] else None
+        async for token in self._tokens(plan, stop_after):
+            await response.write(frame(token))
+        if plan["abort"]:
+            # Drop the connection mid-response, as a crashed or restarted backend would
+            self.stats["aborted"] += 1
+            request.transport.close()
+            return response
+        for chunk in final():
+            await response.write(chunk.encode())
+        await response.write_eof()
+        return response
+
+    # --- Ollama ---
+
+    async def ollama_tags(self, request: web.Request) -> web.Response:
+        return web.json_response({"models": [
+            {"name": name, "model": name, "size": 4_000_000_000, "digest": uuid.uuid5(uuid.NAMESPACE_DNS, name).hex,
+             "details": {"family": name.split(":")[0], "quantization_level": "Q4_K_M"}}
+            for name in self.config.models
+        ]})
+
+    async def ollama_version(self, request: web.Request) -> web.Response:
+        return web.json_response({"version": "0.0.0-fake"})
+
+    async def ollama_show(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        name = body.get("name") or body.get("model")
+        if name not in self.config.models:
+            return web.json_response({"error": f"model '{name}' not found"}, status=404)
+        return web.json_response({"modelfile": "", "parameters": "", "details": {"family": name.split(":")[0]}})
+
+    async def ollama_pull(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "success"})
+
+    async def ollama_embeddings(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response({"embedding": self._embedding(body.get("prompt", ""))})
+
+    async def ollama_generate(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        return await self._ollama_respond(request, body, chat=False)
+
+    async def ollama_chat(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        return await self._ollama_respond(request, body, chat=True)
+
+    async def _ollama_respond(self, request: web.Request, body: Dict[str, Any], chat: bool) -> web.StreamResponse:
+        model = body.get("model", self.config.models[0])
+        plan = self._plan((body.get("options") or {}).get("num_predict"))
+        if plan["fail"]:
+            return self._error()
+        started = time.perf_counter_ns()
+
+        def message(text: str, done: bool) -> Dict[str, Any]:
+            payload = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "done": done}
+            if chat:
+                payload["message"] = {"role": "assistant", "content": text}
+            else:
+                payload["response"] = text
+            return payload
+
+        def summary() -> Dict[str, Any]:
+            return {
+                "done_reason": "stop",
+                "total_duration": time.perf_counter_ns() - started,
+                "prompt_eval_count": len(str(body.get("prompt") or body.get("messages", ""))) // 4,
+                "eval_count": len(plan["tokens"]),
+            }
+
+        if body.get("stream", True) is False:
+            text = await self._complete(plan)
+            return web.json_response({**message(text, True), **summary()})
+
+        def frame(token: str) -> bytes:
+            return (json.dumps(message(token, False)) + "\n").encode()
+
+        def final() -> List[str]:
+            return [json.dumps({**message("", True), **summary()}) + "\n"]
+
+        return await self._stream(request, plan, "application/x-ndjson", frame, final)
+
+    # --- OpenAI-compatible ---
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    async def openai_models(self, request: web.Request) -> web.Response:
+        return web.json_response({"object": "list", "data": [
+            {"id": name, "object": "model", "owned_by": "fake"} for name in self.config.models
+        ]})
+
+    async def openai_embeddings(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        inputs = body.get("input", "")
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        return web.json_response({"object": "list", "model": body.get("model"), "data": [
+            {"object": "embedding", "index": index, "embedding": self._embedding(text)}
+            for index, text in enumerate(inputs)
+        ]})
+
+    async def openai_completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        return await self._openai_respond(request, body, chat=False)
+
+    async def openai_chat_completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        return await self._openai_respond(request, body, chat=True)
+
+    async def _openai_respond(self, request: web.Request, body: Dict[str, Any], chat: bool) -> web.StreamResponse:
+        model = body.get("model", self.config.models[0])
+        plan = self._plan(body.get("max_tokens"))
+        if plan["fail"]:
+            return self._error(openai=True)
+        completion_id = f"{'chatcmpl' if chat else 'cmpl'}-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": len(str(body.get("prompt") or body.get("messages", ""))) // 4,
+            "completion_tokens": len(plan["tokens"]),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not body.get("stream"):
+            text = await self._complete(plan)
+            choice = {"index": 0, "finish_reason": "stop"}
+            choice.update({"message": {"role": "assistant", "content": text}} if chat else {"text": text})
+            return web.json_response({
+                "id": completion_id, "object": "chat.completion" if chat else "text_completion",
+                "created": created, "model": model, "choices": [choice], "usage": usage
+            })
+
+        def chunk(choice: Dict[str, Any]) -> str:
+            return "data: " + json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk" if chat else "text_completion",
+                "created": created, "model": model, "choices": [{"index": 0, **choice}]
+            }) + "\n\n"
+
+        def frame(token: str) -> bytes:
+            delta = {"delta": {"content": token}} if chat else {"text": token}
+            return chunk({**delta, "finish_reason": None}).encode()
+
+        last = {"delta": {}} if chat else {"text": ""}
+        def final() -> List[str]:
+            return [chunk({**last, "finish_reason": "stop"}), "data: [DONE]\n\n"]
+
+        return await self._stream(request, plan, "text/event-stream", frame, final)
+
+    # --- Harness ---
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({**self.stats, "config": asdict(self.config)})
+
+    async def reset_stats(self, request: web.Request) -> web.Response:
+        self.stats = {key: 0 for key in self.stats}
+        return web.json_response(self.stats)
+
+
+async def serve(config: FakeLLMConfig, host: str, ports: List[int]) -> web.AppRunner:
+    """Start the fake server on every port; the caller cleans up the returned runner"""
+    runner = web.AppRunner(FakeLLMServer(config).build_app(), access_log=None)
+    await runner.setup()
+    for port in ports:
+        await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def main(args: argparse.Namespace):
+    config = FakeLLMConfig(
+        ttft_ms=args.ttft_ms,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        stream_abort_rate=args.stream_abort_rate,
+        seed=args.seed,
+    )
+    ports = args.port or [11434]
+    runner = await serve(config, args.host, ports)
+    print(f"Fake inference server on {args.host}:{','.join(map(str, ports))} "
+          f"(TTFT {config.ttft_ms:.0f}ms, {config.tokens_per_second:g} tok/s, "
+          f"{config.output_tokens} tokens, errors {config.error_rate:.1%}, aborts {config.stream_abort_rate:.1%})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Orchestrator - Fake Ollama/OpenAI inference server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, action="append", help="Port to serve on; repeat for several (default 11434)")
+    parser.add_argument("--ttft-ms", type=float, default=150.0, help="Time to first token in milliseconds")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Token rate after the first token")
+    parser.add_argument("--output-tokens", type=int, default=64, help="Tokens per response (capped by the request's max tokens)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Relative +/- variation of TTFT and token delays")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument("--stream-abort-rate", type=float, default=0.0, help="Fraction of streams dropped half way")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for token content, jitter and injected failures")
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Load Test Harness for AI Orchestrator
+Drives the inference, streaming, IDE completion and WebSocket paths at a fixed
+concurrency and reports p50/p95/p99 latency, throughput and event-loop lag.
+
+Run against an orchestrator whose runtimes point at scripts/fake_llm_server.py
+for fully offline, repeatable numbers:
+
+    python scripts/fake_llm_server.py --port 11434 &
+    python scripts/load_test.py --scenario all --concurrency 32 --duration 30 --output load.json
+
+Event-loop lag is reported twice: for this process (a sleep-drift probe, to
+show the load generator itself is not the bottleneck) and for the server, as
+the latency of /health probes taken while the load runs.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+# Load .env file
+load_dotenv()
+
+API_PREFIX = "/api/v1"
+SCENARIOS = ("inference", "stream", "completion", "websocket")
+
+# Prompts are picked with the run's seed, so repeated runs send the same sequence
+PROMPTS = [
+    "Write a Python function that merges two sorted lists.",
+    "Explain the difference between a process and a thread.",
+    "Refactor this loop into a list comprehension: for x in xs: ys.append(x * 2)",
+    "Write a SQL query returning the ten most recent orders per customer.",
+    "What does the async keyword change about a Python function?",
+    "Generate a FastAPI endpoint that returns the current server time.",
+]
+COMPLETION_SOURCE = (
+    "import json\n\n\n"
+    "def load_config(path):\n"
+    "    with open(path) as f:\n"
+    "        return json.\n"
+)
+
+
+@dataclass
+class Sample:
+    """One request: total latency, time to first byte/token for streams, and outcome"""
+    scenario: str
+    latency: float
+    ok: bool
+    ttft: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    samples: List[Sample] = field(default_factory=list)
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank p50/p95/p99/max in milliseconds"""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        index = min(len(ordered), max(1, math.ceil(q * len(ordered)))) - 1
+        return round(ordered[index] * 1000, 2)
+
+    return {"p50": rank(0.50), "p95": rank(0.95), "p99": rank(0.99), "max": round(ordered[-1] * 1000, 2)}
+
+
+class LoopLagProbe:
+    """Measures how late this process's event loop wakes from a fixed sleep"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+class ServerProbe:
+    """Latency of GET /health during the run: a trivial handler, so it tracks the server's loop lag"""
+
+    def __init__(self, session: aiohttp.ClientSession, base_url: str, interval: float = 0.25):
+        self.session = session
+        self.url = f"{base_url}/health"
+        self.interval = interval
+        self.samples: List[float] = []
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            try:
+                async with self.session.get(self.url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    await response.read()
+                self.samples.append(time.perf_counter() - start)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failures += 1
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.samples = []
+        self.failures = 0
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+class Scenario:
+    """A request path under load; ``setup`` runs once per worker before timing starts"""
+
+    name = ""
+
+    def __init__(self, session: aiohttp.ClientSession, base_url: str, api_key: str, timeout: float):
+        self.session = session
+        self.base_url = base_url
+        self.headers = {"X-API-Key": api_key}
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def setup(self, worker: int) -> Dict[str, Any]:
+        return {}
+
+    async def teardown(self, state: Dict[str, Any]):
+        pass
+
+    async def request(self, state: Dict[str, Any], rng: random.Random) -> Sample:
+        raise NotImplementedError
+
+    def _inference_body(self, rng: random.Random) -> Dict[str, Any]:
+        return {"prompt": rng.choice(PROMPTS), "task_type": "chat", "parameters": {"max_tokens": 128}}
+
+    def _failed(self, start: float, error: str, ttft: Optional[float] = None) -> Sample:
+        return Sample(self.name, time.perf_counter() - start, False, ttft, error)
+
+
+class InferenceScenario(Scenario):
+    """POST /ai/inference, waiting for the whole answer"""
+
+    name = "inference"
+
+    async def request(self, state: Dict[str, Any], rng: random.Random) -> Sample:
+        start = time.perf_counter()
+        try:
+            async with self.session.post(
+                f"{self.base_url}{API_PREFIX}/ai/inference",
+                json=self._inference_body(rng), headers=self.headers, timeout=self.timeout
+            ) as response:
+                await response.read()
+                if response.status != 200:
+                    return self._failed(start, f"HTTP {response.status}")
+        except asyncio.TimeoutError:
+            return self._failed(start, "timeout")
+        except aiohttp.ClientError as e:
+            return self._failed(start, type(e).__name__)
+        return Sample(self.name, time.perf_counter() - start, True)
+
+
+class StreamScenario(Scenario):
+    """POST /ai/inference/stream, timing the first SSE event and the end of the stream"""
+
+    name = "stream"
+
+    async def request(self, state: Dict[str, Any], rng: random.Random) -> Sample:
+        start = time.perf_counter()
+        ttft = None
+        try:
+            async with self.session.post(
+                f"{self.base_url}{API_PREFIX}/ai/inference/stream",
+                json=self._inference_body(rng), headers=self.headers, timeout=self.timeout
+            ) as response:
+                if response.status != 200:
+                    await response.read()
+                    return self._failed(start, f"HTTP {response.status}")
+                async for line in response.content:
+                    if not line.startswith(b"data:"):
+                        continue
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    # The endpoint reports failures in-band, as an error event
+                    if b'"error"' in line:
+                        return self._failed(start, "stream error event", ttft)
+        except asyncio.TimeoutError:
+            return self._failed(start, "timeout", ttft)
+        except aiohttp.ClientError as e:
+            return self._failed(start, type(e).__name__, ttft)
+        if ttft is None:
+            return self._failed(start, "empty stream")
+        return Sample(self.name, time.perf_counter() - start, True, ttft)
+
+
+class CompletionScenario(Scenario):
+    """
+    POST /ide/intelligence/completions against a file in a per-worker
+    workspace; the workspaces are reused by later runs rather than piling up.
+    """
+
+    name = "completion"
+    path = "loadtest/config.py"
+
+    async def setup(self, worker: int) -> Dict[str, Any]:
+        workspace_id = f"loadtest-{worker}"
+        async with self.session.post(
+            f"{self.base_url}{API_PREFIX}/ide/workspace",
+            json={"workspace_id": workspace_id}, headers=self.headers, timeout=self.timeout
+        ) as response:
+            if response.status != 200:
+                raise RuntimeError(f"creating workspace failed: HTTP {response.status} {await response.text()}")
+        async with self.session.post(
+            f"{self.base_url}{API_PREFIX}/ide/files/{workspace_id}/{self.path}",
+            json={"content": COMPLETION_SOURCE}, headers=self.headers, timeout=self.timeout
+        ) as response:
+            if response.status != 200:
+                raise RuntimeError(f"writing {self.path} failed: HTTP {response.status} {await response.text()}")
+        return {"workspace_id": workspace_id}
+
+    async def request(self, state: Dict[str, Any], rng: random.Random) -> Sample:
+        start = time.perf_counter()
+        try:
+            async with self.session.post(
+                f"{self.base_url}{API_PREFIX}/ide/intelligence/completions/{state['workspace_id']}/{self.path}",
+                json={"offset": len(COMPLETION_SOURCE) - 1, "language": "python"},
+                headers=self.headers, timeout=self.timeout
+            ) as response:
+                await response.read()
+                if response.status != 200:
+                    return self._failed(start, f"HTTP {response.status}")
+        except asyncio.TimeoutError:
+            return self._failed(start, "timeout")
+        except aiohttp.ClientError as e:
+            return self._failed(start, type(e).__name__)
+        return Sample(self.name, time.perf_counter() - start, True)
+
+
+class WebSocketScenario(Scenario):
+    """
+    Round trips on /ws/collaboration/{sid}: the server broadcasts each message
+    to the session, sender included, so the echo times the full path.
+    """
+
+    name = "websocket"
+
+    async def setup(self, worker: int) -> Dict[str, Any]:
+        sid = f"loadtest-{uuid.uuid4().hex[:8]}-{worker}"
+        return {"websocket": await self._connect(sid), "sid": sid, "seq": 0}
+
+    async def _connect(self, sid: str) -> aiohttp.ClientWebSocketResponse:
+        ws_url = self.base_url.replace("http", "ws", 1)
+        return await self.session.ws_connect(
+            f"{ws_url}/ws/collaboration/{sid}", timeout=aiohttp.ClientWSTimeout(ws_close=self.timeout.total)
+        )
+
+    async def teardown(self, state: Dict[str, Any]):
+        await state["websocket"].close()
+
+    async def request(self, state: Dict[str, Any], rng: random.Random) -> Sample:
+        state["seq"] += 1
+        seq = state["seq"]
+        start = time.perf_counter()
+        if state["websocket"].closed:
+            # Count the drop once, then carry on over a fresh connection
+            try:
+                state["websocket"] = await self._connect(state["sid"])
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                await asyncio.sleep(1)
+                return self._failed(start, f"reconnect failed: {type(e).__name__}")
+            return self._failed(start, "connection dropped")
+        websocket = state["websocket"]
+        try:
+            await websocket.send_json({"type": "cursor", "seq": seq, "line": rng.randint(1, 500), "column": rng.randint(1, 80)})
+            while True:
+                message = await websocket.receive(timeout=self.timeout.total)
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    return self._failed(start, f"ws {message.type.name.lower()}")
+                if json.loads(message.data).get("seq") == seq:
+                    break
+        except asyncio.TimeoutError:
+            return self._failed(start, "timeout")
+        except aiohttp.ClientError as e:
+            return self._failed(start, type(e).__name__)
+        return Sample(self.name, time.perf_counter() - start, True)
+
+
+SCENARIO_CLASSES = {cls.name: cls for cls in (InferenceScenario, StreamScenario, CompletionScenario, WebSocketScenario)}
+
+
+async def run_scenario(
+    scenario: Scenario,
+    concurrency: int,
+    duration: float,
+    max_requests: Optional[int],
+    warmup: float,
+    seed: int
+) -> ScenarioResult:
+    """
+    Closed loop: ``concurrency`` workers each send their next request as soon
+    as the previous one finishes, until the duration or request budget is
+    spent. Requests finishing inside the warm-up window are not recorded.
+    """
+    result = ScenarioResult(scenario.name)
+    budget = {"left": max_requests}
+    states = await asyncio.gather(*(scenario.setup(worker) for worker in range(concurrency)))
+    loop = asyncio.get_running_loop()
+    measure_from = loop.time() + warmup
+    deadline = measure_from + duration
+
+    async def worker(index: int):
+        rng = random.Random(f"{seed}:{scenario.name}:{index}")
+        state = states[index]
+        while loop.time() < deadline:
+            if budget["left"] is not None:
+                if budget["left"] <= 0:
+                    return
+                budget["left"] -= 1
+            sample = await scenario.request(state, rng)
+            if loop.time() >= measure_from:
+                result.samples.append(sample)
+
+    result.started_at = time.time() + warmup
+    try:
+        await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        result.finished_at = time.time()
+    finally:
+        await asyncio.gather(*(scenario.teardown(state) for state in states), return_exceptions=True)
+    return result
+
+
+def summarize(
+    result: ScenarioResult,
+    concurrency: int,
+    client_lag: List[float],
+    server_probe: ServerProbe
+) -> Dict[str, Any]:
+    ok = [sample for sample in result.samples if sample.ok]
+    errors: Dict[str, int] = {}
+    for sample in result.samples:
+        if not sample.ok:
+            errors[sample.error] = errors.get(sample.error, 0) + 1
+    elapsed = max(result.finished_at - result.started_at, 1e-9)
+    summary = {
+        "scenario": result.name,
+        "concurrency": concurrency,
+        "requests": len(result.samples),
+        "ok": len(ok),
+        "errors": errors,
+        "error_rate": round(1 - len(ok) / len(result.samples), 4) if result.samples else None,
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2),
+        "latency_ms": percentiles([sample.latency for sample in ok]),
+        "client_loop_lag_ms": percentiles(client_lag),
+        "server_health_ms": percentiles(server_probe.samples),
+        "server_health_failures": server_probe.failures,
+    }
+    ttfts = [sample.ttft for sample in ok if sample.ttft is not None]
+    if ttfts:
+        summary["ttft_ms"] = percentiles(ttfts)
+    return summary
+
+
+def print_report(summaries: List[Dict[str, Any]]):
+    def fmt(stats: Optional[Dict[str, Optional[float]]]) -> str:
+        if not stats or stats["p50"] is None:
+            return "-"
+        return f"{stats['p50']:.1f}/{stats['p95']:.1f}/{stats['p99']:.1f}"
+
+    header = f"{'scenario':<11} {'conc':>4} {'ok':>7} {'err%':>6} {'rps':>8}  {'latency p50/p95/p99 ms':<24} {'ttft p50/p95/p99 ms':<22} {'server lag ms':<20} {'client lag ms':<16}"
+    print(header)
+    print("-" * len(header))
+    for s in summaries:
+        error_rate = f"{s['error_rate'] * 100:.1f}" if s["error_rate"] is not None else "-"
+        print(
+            f"{s['scenario']:<11} {s['concurrency']:>4} {s['ok']:>7} {error_rate:>6} {s['throughput_rps']:>8.1f}  "
+            f"{fmt(s['latency_ms']):<24} {fmt(s.get('ttft_ms')):<22} {fmt(s['server_health_ms']):<20} {fmt(s['client_loop_lag_ms']):<16}"
+        )
+        for error, count in sorted(s["errors"].items(), key=lambda item: -item[1]):
+            print(f"    {count:>6} x {error}")
+
+
+async def main(args: argparse.Namespace) -> int:
+    names = list(SCENARIOS) if args.scenario == ["all"] else args.scenario
+    connector = aiohttp.TCPConnector(limit=0)
+    summaries = []
+    async with aiohttp.ClientSession(connector=connector) as session:
+        try:
+            async with session.get(f"{args.base_url}/health", timeout=aiohttp.ClientTimeout(total=10)) as response:
+                await response.read()
+        except Exception as e:
+            print(f"Orchestrator not reachable at {args.base_url}: {e}", file=sys.stderr)
+            return 2
+
+        for name in names:
+            scenario = SCENARIO_CLASSES[name](session, args.base_url, args.api_key, args.timeout)
+            client_lag = LoopLagProbe()
+            server_probe = ServerProbe(session, args.base_url, args.probe_interval)
+            print(f"Running {name}: {args.concurrency} workers, {args.duration:g}s (+{args.warmup:g}s warm-up)...", file=sys.stderr)
+            client_lag.start()
+            server_probe.start()
+            try:
+                result = await run_scenario(
+                    scenario, args.concurrency, args.duration, args.requests, args.warmup, args.seed
+                )
+            except Exception as e:
+                print(f"Scenario {name} could not start: {e}", file=sys.stderr)
+                continue
+            finally:
+                await client_lag.stop()
+                await server_probe.stop()
+            summaries.append(summarize(result, args.concurrency, client_lag.samples, server_probe))
+
+    print_report(summaries)
+    if args.output:
+        report = {
+            "base_url": args.base_url,
+            "seed": args.seed,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "scenarios": summaries,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}", file=sys.stderr)
+    return 0 if summaries else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Orchestrator - Load test harness")
+    parser.add_argument("--base-url", default=f"http://localhost:{os.getenv('API_PORT', '8000')}")
+    parser.add_argument("--api-key", default=os.getenv("ORCHESTRATOR_API_KEY") or os.getenv("DEFAULT_API_KEY", ""), help="X-API-Key (default: ORCHESTRATOR_API_KEY or DEFAULT_API_KEY)")
+    parser.add_argument("--scenario", nargs="+", choices=[*SCENARIOS, "all"], default=["all"])
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent workers per scenario")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Seconds of load before measuring")
+    parser.add_argument("--requests", type=int, help="Stop a scenario after this many requests")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--probe-interval", type=float, default=0.25, help="Seconds between /health probes")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for prompt and payload selection")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+    if "all" in args.scenario:
+        args.scenario = ["all"]
+    sys.exit(asyncio.run(main(args)))
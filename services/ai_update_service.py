@@ -7,6 +7,7 @@ from typing import List, Dict, Any, Optional
 from pathlib import Path
 import asyncio
 
+
 logger = logging.getLogger(__name__)
 
 
@@ -120,6 +121,9 @@ class AIUpdateService:
             
             if updated_content:
                 full_file_path.write_text(updated_content)
+                # Imported lazily: the services.git package imports core
+                from services.git.change_set import get_change_tracker
+                get_change_tracker().record(full_file_path)
             
             return {
                 "success": True,
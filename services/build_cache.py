@@ -0,0 +1,176 @@
+"""
+Content-addressed build cache
+Stores build artifacts and logs under a key derived from the source tree, the
+lockfiles and the build command, so unchanged projects skip rebuilding.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tarfile
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Never part of the source inputs, whatever the build system
+ALWAYS_EXCLUDED = {".git", ".hg", ".svn", "__pycache__", ".venv", "venv", ".idea", ".vscode", ".pytest_cache"}
+
+ARCHIVE_NAME = "outputs.tar.gz"
+MANIFEST_NAME = "manifest.json"
+
+
+class BuildCache:
+    """On-disk cache of build (and dependency-install) results keyed by content hashes"""
+
+    def __init__(self, root: str = "storage/build_cache", max_bytes: Optional[int] = None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes or int(os.getenv("BUILD_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+        self.root.mkdir(parents=True, exist_ok=True)
+        # absolute path -> (mtime_ns, size, sha256) so unchanged files are not re-read
+        self._stat_cache_path = self.root / "file_hashes.json"
+        self._stat_cache: Dict[str, Tuple[int, int, str]] = self._load_stat_cache()
+
+    # --- Hashing ---
+
+    def _load_stat_cache(self) -> Dict[str, Tuple[int, int, str]]:
+        try:
+            with open(self._stat_cache_path, 'r') as f:
+                return {path: tuple(entry) for path, entry in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable build hash cache: {e}")
+            return {}
+
+    def save_stat_cache(self):
+        tmp_path = self._stat_cache_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self._stat_cache, f)
+        os.replace(tmp_path, self._stat_cache_path)
+
+    def file_digest(self, path: Path) -> str:
+        stat = path.stat()
+        key = str(path.resolve())
+        cached = self._stat_cache.get(key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        self._stat_cache[key] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def hash_files(self, base: Path, patterns: Iterable[str]) -> str:
+        """Hash the files matching ``patterns`` (globs relative to ``base``), e.g. lockfiles"""
+        sha = hashlib.sha256()
+        for pattern in patterns:
+            for path in sorted(base.glob(pattern)):
+                if path.is_file():
+                    sha.update(f"{path.relative_to(base).as_posix()}\0{self.file_digest(path)}\n".encode())
+        return sha.hexdigest()
+
+    def hash_tree(self, base: Path, exclude: Set[str]) -> str:
+        """
+        Hash every source file under ``base``. ``exclude`` holds paths relative to
+        ``base`` (build outputs), so ``build`` skips ``./build`` but not ``src/build``;
+        ALWAYS_EXCLUDED names are skipped at any depth.
+        """
+        excluded_paths = {Path(p).as_posix().strip("/") for p in exclude}
+        sha = hashlib.sha256()
+        for root, dirs, files in os.walk(base):
+            rel_root = Path(root).relative_to(base).as_posix()
+            dirs[:] = sorted(
+                d for d in dirs
+                if d not in ALWAYS_EXCLUDED and (f"{rel_root}/{d}" if rel_root != "." else d) not in excluded_paths
+            )
+            for name in sorted(files):
+                path = Path(root) / name
+                if path.is_symlink() or not path.is_file():
+                    continue
+                sha.update(f"{path.relative_to(base).as_posix()}\0{self.file_digest(path)}\n".encode())
+        return sha.hexdigest()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    # --- Entries ---
+
+    def _entry_dir(self, namespace: str, key: str) -> Path:
+        return self.root / namespace / key[:2] / key
+
+    def lookup(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest of a cached result, or None on a miss"""
+        manifest_path = self._entry_dir(namespace, key) / MANIFEST_NAME
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        # Touch for LRU pruning
+        os.utime(manifest_path)
+        return manifest
+
+    def store(self, namespace: str, key: str, base: Path, outputs: List[str], manifest: Dict[str, Any]):
+        """Archive the existing ``outputs`` (paths relative to ``base``) and record the manifest"""
+        entry_dir = self._entry_dir(namespace, key)
+        tmp_dir = entry_dir.with_name(entry_dir.name + f".tmp-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        present = [output for output in outputs if (base / output).exists()]
+        if present:
+            with tarfile.open(tmp_dir / ARCHIVE_NAME, "w:gz", compresslevel=1) as archive:
+                for output in present:
+                    archive.add(base / output, arcname=output)
+
+        manifest = {**manifest, "key": key, "artifacts": present, "created_at": time.time()}
+        with open(tmp_dir / MANIFEST_NAME, 'w') as f:
+            json.dump(manifest, f)
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+        self.prune()
+
+    def restore(self, namespace: str, key: str, base: Path, outputs: List[str]) -> bool:
+        """Replace ``outputs`` in ``base`` with the cached copies"""
+        archive_path = self._entry_dir(namespace, key) / ARCHIVE_NAME
+        if not archive_path.exists():
+            return not outputs
+        for output in outputs:
+            target = base / output
+            if target.is_dir() and not target.is_symlink():
+                shutil.rmtree(target)
+            elif target.exists() or target.is_symlink():
+                target.unlink()
+        try:
+            with tarfile.open(archive_path, "r:gz") as archive:
+                if hasattr(tarfile, "data_filter"):
+                    archive.extractall(base, filter="data")
+                else:
+                    archive.extractall(base)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to restore cached build outputs {key[:12]}: {e}")
+            return False
+
+    def prune(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for manifest_path in self.root.glob(f"*/*/*/{MANIFEST_NAME}"):
+            entry_dir = manifest_path.parent
+            size = sum(f.stat().st_size for f in entry_dir.iterdir() if f.is_file())
+            entries.append((manifest_path.stat().st_mtime, size, entry_dir))
+            total += size
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            logger.info(f"Pruned build cache entry {entry_dir.name[:12]}")
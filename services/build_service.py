@@ -1,80 +1,314 @@
+import asyncio
+import hashlib
 import logging
-import os
+import shutil
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 from core.utils.subprocess import run_command_async
+from services.build_cache import BuildCache
 
 logger = logging.getLogger(__name__)
 
+# Common lockfile / manifest names per ecosystem; they key the dependency layer
+NODE_LOCKFILES = ["package.json", "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml"]
+PYTHON_LOCKFILES = ["requirements*.txt", "pyproject.toml", "poetry.lock", "Pipfile.lock", "setup.py", "setup.cfg"]
+
+# Docker images are tagged per workspace and build key, so verifying a cache hit can only
+# match this build's own image and superseded tags of a workspace can be pruned
+DOCKER_IMAGE_REPO = "orchestrator-build-{workspace}"
+DOCKER_IMAGE_TAG = DOCKER_IMAGE_REPO + ":{key}"
+
+# Written into output directories a build produced. A candidate output directory
+# without it predates the build, so it is treated as source: hashed, never replaced.
+BUILD_OUTPUT_MARKER = ".orchestrator-build"
+
+
 class BuildService:
-    """Handles building projects asynchronously"""
-    
-    def __init__(self):
-        pass
-        
+    """Handles building projects asynchronously, skipping builds whose inputs are unchanged"""
+
+    def __init__(self, cache: Optional[BuildCache] = None):
+        self.cache = cache or BuildCache()
+        # local path -> build key whose outputs are currently in that workspace
+        self._workspace_builds: Dict[str, str] = {}
+
     async def build_project(
         self,
         local_path: str,
         config: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """Build a project asynchronously based on its language and configuration"""
+        """
+        Build a project asynchronously based on its language and configuration.
+        The dependency install is cached by lockfile hash and the build itself by
+        the hash of sources + lockfiles + command; set ``use_cache: false`` in
+        ``config`` to force a rebuild.
+        """
+        config = config or {}
+        use_cache = config.get("use_cache", True)
         local_path_obj = Path(local_path)
         logger.info(f"Building project at {local_path}")
-        
+
         # 1. Detect language / build system
         build_info = self._detect_build_system(local_path_obj)
-        
+
         if not build_info:
             return {
-                "success": False, 
+                "success": False,
                 "error": "Could not detect build system automatically. Please provide a build configuration."
             }
-            
+
         build_cmd = build_info["command"]
-        logger.info(f"Detected build system: {build_info['type']}. Running: {' '.join(build_cmd)}")
-        
+        logger.info(f"Detected build system: {build_info['type']}. Running: {' '.join(build_cmd or build_info['install']['command'])}")
+
         try:
-            # 2. Run build command asynchronously
+            # 2. Compute cache keys (hashing is blocking file I/O)
+            build_info = {**build_info, "outputs": self._build_outputs(local_path_obj, build_info["outputs"])}
+            keys = await asyncio.to_thread(self._cache_keys, local_path_obj, build_info)
+            if build_info["type"] == "docker":
+                build_info = self._tag_docker_image(build_info, local_path_obj, keys["build"])
+                build_cmd = build_info["command"]
+
+            # 3. Dependency layer (later steps such as "run" rely on it even when the build is cached)
+            logs = []
+            install = build_info["install"]
+            if install:
+                ok, install_logs, error, deps_cached = await self._install_dependencies(
+                    local_path_obj, install, keys["deps"], use_cache
+                )
+                logs.append(install_logs)
+                if not ok:
+                    logger.error(f"Dependency install failed: {error}")
+                    return {"success": False, "error": error, "logs": "\n".join(logs)}
+                if not build_cmd:
+                    return {
+                        "success": True,
+                        "logs": "\n".join(logs),
+                        "message": "Build completed successfully",
+                        "cached": deps_cached,
+                        "cache_key": keys["deps"]
+                    }
+
+            if use_cache:
+                cached = self.cache.lookup("builds", keys["build"])
+                if cached and (
+                    (not build_info.get("verify") and self._outputs_in_place(local_path, keys["build"], cached))
+                    or await self._restore_outputs("builds", keys["build"], local_path_obj, build_info)
+                ):
+                    logger.info(f"Build cache hit for {local_path} ({keys['build'][:12]}), skipping build")
+                    self._workspace_builds[local_path] = keys["build"]
+                    return self._with_image(self._cached_result(cached, keys["build"]), build_info)
+
+            # 4. Run build command asynchronously
             code, stdout, stderr = await run_command_async(
                 build_cmd,
                 cwd=local_path,
                 timeout=600  # 10 minutes
             )
-            
+            logs.append(stdout)
+
             if code != 0:
                 logger.error(f"Build failed: {stderr}")
                 return {
                     "success": False,
                     "error": stderr,
-                    "logs": stdout
+                    "logs": "\n".join(logs)
                 }
-                
-            return {
+
+            self._mark_outputs(local_path_obj, build_info["outputs"])
+            if use_cache:
+                await asyncio.to_thread(
+                    self.cache.store, "builds", keys["build"], local_path_obj, build_info["outputs"],
+                    {"type": build_info["type"], "command": build_cmd, "logs": "\n".join(logs)}
+                )
+                self._workspace_builds[local_path] = keys["build"]
+            if build_info.get("image"):
+                await self._prune_images(build_info)
+
+            return self._with_image({
                 "success": True,
-                "logs": stdout,
-                "message": "Build completed successfully"
-            }
-            
+                "logs": "\n".join(logs),
+                "message": "Build completed successfully",
+                "cached": False,
+                "cache_key": keys["build"]
+            }, build_info)
+
         except Exception as e:
             logger.error(f"Build exception: {e}")
             return {"success": False, "error": str(e)}
 
+    async def _install_dependencies(self, path: Path, install: Dict[str, Any], key: str, use_cache: bool):
+        """Run (or restore) the dependency layer. Returns (ok, logs, error, served_from_cache)."""
+        # Layers without in-tree artifacts (pip, go mod) install into the environment,
+        # which the cache cannot restore, so they always run
+        use_cache = use_cache and bool(install["outputs"])
+        marker = path / install["outputs"][0] / ".orchestrator-deps" if install["outputs"] else None
+        if use_cache and self.cache.lookup("deps", key):
+            # Outputs already in place from this exact lockfile state
+            if marker and marker.exists() and marker.read_text() == key:
+                return True, "[cache] dependencies up to date", None, True
+            if await self._restore_outputs("deps", key, path, install):
+                return True, f"[cache] dependencies restored ({key[:12]})", None, True
+
+        code, stdout, stderr = await run_command_async(install["command"], cwd=str(path), timeout=600)
+        if code != 0:
+            return False, stdout, stderr, False
+
+        if marker and marker.parent.is_dir():
+            marker.write_text(key)
+        if use_cache:
+            await asyncio.to_thread(
+                self.cache.store, "deps", key, path, install["outputs"],
+                {"command": install["command"], "logs": stdout}
+            )
+        return True, stdout, None, False
+
+    async def _restore_outputs(self, namespace: str, key: str, path: Path, step: Dict[str, Any]) -> bool:
+        """Restore a step's cached outputs; steps with a ``verify`` command (e.g. docker images) must also pass it"""
+        if step.get("verify"):
+            code, _, _ = await run_command_async(step["verify"], cwd=str(path), timeout=30)
+            if code != 0:
+                return False
+        return await asyncio.to_thread(self.cache.restore, namespace, key, path, step["outputs"])
+
+    def _outputs_in_place(self, local_path: str, key: str, manifest: Dict[str, Any]) -> bool:
+        """True when this workspace already holds the outputs of the cached build"""
+        if self._workspace_builds.get(local_path) != key:
+            return False
+        return all((Path(local_path) / output).exists() for output in manifest.get("artifacts", []))
+
+    @staticmethod
+    def _build_outputs(path: Path, outputs: List[str]) -> List[str]:
+        """Candidate outputs that are absent or were produced by an earlier build (see BUILD_OUTPUT_MARKER)"""
+        return [
+            output for output in outputs
+            if not (path / output).is_dir() or (path / output / BUILD_OUTPUT_MARKER).exists()
+        ]
+
+    @staticmethod
+    def _mark_outputs(path: Path, outputs: List[str]):
+        for output in outputs:
+            if (path / output).is_dir():
+                (path / output / BUILD_OUTPUT_MARKER).touch()
+
+    def _cache_keys(self, path: Path, build_info: Dict[str, Any]) -> Dict[str, str]:
+        install = build_info["install"]
+        lockfiles = self.cache.hash_files(path, build_info["lockfiles"])
+        # The toolchain on PATH is part of the input: a different npm/pip means a different result
+        toolchain = [shutil.which(cmd[0]) for cmd in (build_info["command"], install and install["command"]) if cmd]
+        deps_key = self.cache.make_key(build_info["type"], install and install["command"], lockfiles, toolchain)
+        excluded = set(build_info["outputs"]) | set(install["outputs"] if install else [])
+        sources = self.cache.hash_tree(path, excluded)
+        build_key = self.cache.make_key(build_info["type"], build_info["command"], deps_key, lockfiles, sources)
+        self.cache.save_stat_cache()
+        return {"deps": deps_key, "build": build_key}
+
+    @staticmethod
+    def _tag_docker_image(build_info: Dict[str, Any], path: Path, key: str) -> Dict[str, Any]:
+        workspace = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:12]
+        image = DOCKER_IMAGE_TAG.format(workspace=workspace, key=key[:16])
+        return {
+            **build_info,
+            "image": image,
+            "image_repo": DOCKER_IMAGE_REPO.format(workspace=workspace),
+            "command": ["docker", "build", "-t", image, "."],
+            "verify": ["docker", "image", "inspect", image]
+        }
+
+    async def _prune_images(self, build_info: Dict[str, Any]):
+        """Remove this workspace's images from earlier builds; their cache entries then miss on verify"""
+        repo = build_info["image_repo"]
+        code, stdout, _ = await run_command_async(
+            ["docker", "images", repo, "--format", "{{.Repository}}:{{.Tag}}"], timeout=30
+        )
+        if code != 0:
+            return
+        stale = [image for image in stdout.split() if image != build_info["image"]]
+        if stale:
+            code, _, stderr = await run_command_async(["docker", "image", "rm", *stale], timeout=60)
+            if code != 0:
+                logger.warning(f"Failed to prune superseded images of {repo}: {stderr}")
+
+    @staticmethod
+    def _with_image(result: Dict[str, Any], build_info: Dict[str, Any]) -> Dict[str, Any]:
+        if build_info.get("image"):
+            result["image"] = build_info["image"]
+        return result
+
+    @staticmethod
+    def _cached_result(manifest: Dict[str, Any], key: str) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "logs": manifest.get("logs", ""),
+            "message": "Build skipped: inputs unchanged since a cached build",
+            "cached": True,
+            "cache_key": key,
+            "artifacts": manifest.get("artifacts", [])
+        }
+
     def _detect_build_system(self, path: Path) -> Optional[Dict[str, Any]]:
-        """Detect the build system of a project"""
+        """
+        Detect the build system of a project. ``install`` is the dependency layer
+        (cached by lockfiles), ``command`` the build proper and ``outputs`` the
+        artifacts cached with it.
+        """
         if (path / "requirements.txt").exists() or (path / "pyproject.toml").exists():
-            return {"type": "python", "command": ["pip", "install", "-r", "requirements.txt"]}
+            return {
+                "type": "python",
+                "install": {"command": ["pip", "install", "-r", "requirements.txt"], "outputs": []},
+                "command": None,
+                "lockfiles": PYTHON_LOCKFILES,
+                "outputs": []
+            }
         elif (path / "package.json").exists():
-            return {"type": "nodejs", "command": ["npm", "install"]}
+            return {
+                "type": "nodejs",
+                "install": {"command": ["npm", "install"], "outputs": ["node_modules"]},
+                "command": None,
+                "lockfiles": NODE_LOCKFILES,
+                "outputs": []
+            }
         elif (path / "pom.xml").exists():
-            return {"type": "maven", "command": ["mvn", "clean", "install"]}
+            return {
+                "type": "maven",
+                "install": None,
+                "command": ["mvn", "clean", "install"],
+                "lockfiles": ["pom.xml", "**/pom.xml"],
+                "outputs": ["target"]
+            }
         elif (path / "build.gradle").exists():
-            return {"type": "gradle", "command": ["gradle", "build"]}
+            return {
+                "type": "gradle",
+                "install": None,
+                "command": ["gradle", "build"],
+                "lockfiles": ["build.gradle", "settings.gradle", "gradle.lockfile", "gradle/libs.versions.toml"],
+                "outputs": ["build", ".gradle"]
+            }
         elif (path / "go.mod").exists():
-            return {"type": "go", "command": ["go", "build", "./..."]}
+            return {
+                "type": "go",
+                "install": {"command": ["go", "mod", "download"], "outputs": []},
+                "command": ["go", "build", "./..."],
+                "lockfiles": ["go.mod", "go.sum"],
+                "outputs": []
+            }
         elif any(path.glob("*.sln")) or any(path.glob("*.csproj")):
-            return {"type": "dotnet", "command": ["dotnet", "build"]}
+            return {
+                "type": "dotnet",
+                "install": None,
+                "command": ["dotnet", "build"],
+                "lockfiles": ["*.sln", "**/*.csproj", "**/packages.lock.json", "Directory.Packages.props"],
+                "outputs": ["bin", "obj"]
+            }
         elif (path / "Dockerfile").exists():
-            return {"type": "docker", "command": ["docker", "build", "-t", "project-build", "."]}
-            
+            return {
+                "type": "docker",
+                "install": None,
+                # The image tag is bound to the build key once it is known (see _tag_docker_image)
+                "command": ["docker", "build", "."],
+                "lockfiles": ["Dockerfile", ".dockerignore"],
+                "outputs": [],
+                # The artifact is the image itself; only a hit if it still exists
+                "verify": None
+            }
+
         return None
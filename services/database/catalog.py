@@ -0,0 +1,313 @@
+"""
+Bulk catalog reflection for SQL databases
+Reads columns, primary keys, foreign keys and indexes for every table of a schema
+with one catalog query per object kind instead of per-table inspector round trips.
+"""
+import hashlib
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+# table -> {"columns": [...], "pk": [...], "fks": [...], "indexes": [...]}
+CatalogSnapshot = Dict[str, Dict[str, Any]]
+
+
+def _empty_table() -> Dict[str, Any]:
+    return {"columns": [], "pk": [], "fks": [], "indexes": []}
+
+
+_PG_COLUMNS = text("""
+    SELECT c.relname AS table_name,
+           a.attname AS column_name,
+           format_type(a.atttypid, a.atttypmod) AS data_type,
+           CASE WHEN a.atttypid IN (1042, 1043) AND a.atttypmod > 4 THEN a.atttypmod - 4 END AS length,
+           NOT a.attnotnull AS nullable,
+           pg_get_expr(d.adbin, d.adrelid) AS column_default,
+           a.attidentity <> '' AS is_identity,
+           col_description(c.oid, a.attnum) AS comment
+    FROM pg_attribute a
+    JOIN pg_class c ON c.oid = a.attrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+    WHERE n.nspname = :schema AND c.relkind IN ('r', 'p')
+      AND a.attnum > 0 AND NOT a.attisdropped
+    ORDER BY c.relname, a.attnum
+""")
+
+_PG_CONSTRAINTS = text("""
+    SELECT c.relname AS table_name,
+           con.conname AS name,
+           con.contype AS kind,
+           ARRAY(SELECT att.attname FROM unnest(con.conkey) WITH ORDINALITY k(attnum, ord)
+                 JOIN pg_attribute att ON att.attrelid = con.conrelid AND att.attnum = k.attnum
+                 ORDER BY k.ord) AS columns,
+           rc.relname AS referred_table,
+           ARRAY(SELECT att.attname FROM unnest(con.confkey) WITH ORDINALITY k(attnum, ord)
+                 JOIN pg_attribute att ON att.attrelid = con.confrelid AND att.attnum = k.attnum
+                 ORDER BY k.ord) AS referred_columns
+    FROM pg_constraint con
+    JOIN pg_class c ON c.oid = con.conrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_class rc ON rc.oid = con.confrelid
+    WHERE n.nspname = :schema AND con.contype IN ('p', 'f')
+""")
+
+_PG_INDEXES = text("""
+    SELECT t.relname AS table_name,
+           i.relname AS name,
+           ix.indisunique AS is_unique,
+           ARRAY(SELECT att.attname FROM unnest(ix.indkey) WITH ORDINALITY k(attnum, ord)
+                 JOIN pg_attribute att ON att.attrelid = ix.indrelid AND att.attnum = k.attnum
+                 ORDER BY k.ord) AS columns
+    FROM pg_index ix
+    JOIN pg_class t ON t.oid = ix.indrelid
+    JOIN pg_class i ON i.oid = ix.indexrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    WHERE n.nspname = :schema AND NOT ix.indisprimary
+""")
+
+_PG_FINGERPRINT = text("""
+    SELECT md5(coalesce(string_agg(x.sig, ',' ORDER BY x.sig), '')) FROM (
+        SELECT c.oid::text || ':' || c.xmin::text || ':' || c.relnatts::text AS sig
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relkind IN ('r', 'p', 'i')
+        UNION ALL
+        SELECT con.oid::text || ':' || con.xmin::text
+        FROM pg_constraint con JOIN pg_namespace n ON n.oid = con.connamespace
+        WHERE n.nspname = :schema
+        UNION ALL
+        -- Column renames, type/typmod and NOT NULL changes only touch pg_attribute
+        SELECT a.attrelid::text || ':' || a.attnum::text || ':' || a.attname || ':' || a.atttypid::text
+               || ':' || a.atttypmod::text || ':' || a.attnotnull::text
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relkind IN ('r', 'p') AND a.attnum > 0 AND NOT a.attisdropped
+        UNION ALL
+        SELECT 'def:' || d.adrelid::text || ':' || d.adnum::text || ':' || md5(pg_get_expr(d.adbin, d.adrelid))
+        FROM pg_attrdef d
+        JOIN pg_class c ON c.oid = d.adrelid JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema
+        UNION ALL
+        SELECT 'comment:' || ds.objoid::text || ':' || ds.objsubid::text || ':' || md5(ds.description)
+        FROM pg_description ds
+        JOIN pg_class c ON c.oid = ds.objoid AND ds.classoid = 'pg_class'::regclass
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema
+    ) x
+""")
+
+_MYSQL_COLUMNS = text("""
+    SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, CHARACTER_MAXIMUM_LENGTH,
+           IS_NULLABLE = 'YES', COLUMN_DEFAULT, EXTRA LIKE '%auto_increment%', COLUMN_COMMENT
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = :schema
+    ORDER BY TABLE_NAME, ORDINAL_POSITION
+""")
+
+_MYSQL_KEYS = text("""
+    SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+    FROM information_schema.KEY_COLUMN_USAGE
+    WHERE TABLE_SCHEMA = :schema
+    ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+""")
+
+_MYSQL_INDEXES = text("""
+    SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE = 0, COLUMN_NAME
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = :schema AND INDEX_NAME <> 'PRIMARY'
+    ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+""")
+
+# One row per table; the column, key and index signatures XOR a per-row digest so they
+# are order-free and not subject to group_concat_max_len truncation. Keys and indexes
+# are covered by name and column, so renames and re-pointed foreign keys are caught
+_MYSQL_FINGERPRINT = text("""
+    SELECT t.TABLE_NAME, t.CREATE_TIME,
+           (SELECT CONCAT(COUNT(*), ':', COALESCE(BIT_XOR(CAST(CONV(LEFT(MD5(CONCAT_WS(':',
+                       c.ORDINAL_POSITION, c.COLUMN_NAME, c.COLUMN_TYPE, c.IS_NULLABLE,
+                       c.COLUMN_DEFAULT IS NULL, IFNULL(c.COLUMN_DEFAULT, ''), c.EXTRA, c.COLUMN_COMMENT
+                   )), 16), 16, 10) AS UNSIGNED)), 0))
+            FROM information_schema.COLUMNS c
+            WHERE c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME) AS columns_sig,
+           (SELECT CONCAT(COUNT(*), ':', COALESCE(BIT_XOR(CAST(CONV(LEFT(MD5(CONCAT_WS(':',
+                       k.CONSTRAINT_NAME, k.ORDINAL_POSITION, k.COLUMN_NAME,
+                       IFNULL(k.REFERENCED_TABLE_NAME, ''), IFNULL(k.REFERENCED_COLUMN_NAME, ''),
+                       IFNULL(r.UPDATE_RULE, ''), IFNULL(r.DELETE_RULE, '')
+                   )), 16), 16, 10) AS UNSIGNED)), 0))
+            FROM information_schema.KEY_COLUMN_USAGE k
+            LEFT JOIN information_schema.REFERENTIAL_CONSTRAINTS r
+              ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+             AND r.TABLE_NAME = k.TABLE_NAME
+            WHERE k.TABLE_SCHEMA = t.TABLE_SCHEMA AND k.TABLE_NAME = t.TABLE_NAME) AS keys_sig,
+           (SELECT CONCAT(COUNT(*), ':', COALESCE(BIT_XOR(CAST(CONV(LEFT(MD5(CONCAT_WS(':',
+                       s.INDEX_NAME, s.SEQ_IN_INDEX, s.COLUMN_NAME, s.NON_UNIQUE, IFNULL(s.SUB_PART, '')
+                   )), 16), 16, 10) AS UNSIGNED)), 0))
+            FROM information_schema.STATISTICS s
+            WHERE s.TABLE_SCHEMA = t.TABLE_SCHEMA AND s.TABLE_NAME = t.TABLE_NAME) AS indexes_sig
+    FROM information_schema.TABLES t
+    WHERE t.TABLE_SCHEMA = :schema AND t.TABLE_TYPE = 'BASE TABLE'
+    ORDER BY t.TABLE_NAME
+""")
+
+
+class CatalogReader:
+    """Reads a whole schema in bulk using dialect-specific catalog queries"""
+
+    def __init__(self, schema: Optional[str] = None):
+        self.schema = schema
+        self.queries_issued = 0
+
+    def _execute(self, conn: Connection, query, params: Dict[str, Any]):
+        self.queries_issued += 1
+        return conn.execute(query, params)
+
+    def _schema_name(self, conn: Connection) -> str:
+        if self.schema:
+            return self.schema
+        return inspect(conn).default_schema_name
+
+    def fingerprint(self, conn: Connection) -> Optional[str]:
+        """Cheap digest that changes whenever the schema's DDL changes (None if unsupported)"""
+        dialect = conn.dialect.name
+        try:
+            if dialect == "postgresql":
+                return self._execute(conn, _PG_FINGERPRINT, {"schema": self._schema_name(conn)}).scalar()
+            if dialect in ("mysql", "mariadb"):
+                rows = self._execute(conn, _MYSQL_FINGERPRINT, {"schema": self._schema_name(conn)})
+                return hashlib.md5(",".join(":".join(str(v) for v in row) for row in rows).encode()).hexdigest()
+            if dialect == "sqlite":
+                version = self._execute(conn, text("PRAGMA schema_version"), {}).scalar()
+                return f"sqlite:{version}"
+            if dialect == "mssql":
+                row = self._execute(
+                    conn,
+                    text("SELECT COUNT(*), MAX(modify_date) FROM sys.objects WHERE type IN ('U', 'PK', 'F', 'UQ')"),
+                    {}
+                ).one()
+                return hashlib.md5(f"{row[0]}:{row[1]}".encode()).hexdigest()
+        except Exception as e:
+            logger.debug(f"Schema fingerprint unavailable for {dialect}: {e}")
+        return None
+
+    def read(self, conn: Connection) -> CatalogSnapshot:
+        """Reflect every table in the schema; falls back to bulk inspector calls"""
+        dialect = conn.dialect.name
+        try:
+            if dialect == "postgresql":
+                return self._read_postgresql(conn)
+            if dialect in ("mysql", "mariadb"):
+                return self._read_mysql(conn)
+        except Exception as e:
+            logger.warning(f"Catalog fast path failed for {dialect}, falling back to inspector: {e}")
+        return self._read_inspector(conn)
+
+    def _read_postgresql(self, conn: Connection) -> CatalogSnapshot:
+        params = {"schema": self._schema_name(conn)}
+        tables: CatalogSnapshot = defaultdict(_empty_table)
+        for row in self._execute(conn, _PG_COLUMNS, params):
+            default = row.column_default
+            tables[row.table_name]["columns"].append({
+                "name": row.column_name,
+                "type": row.data_type,
+                "length": row.length,
+                "nullable": row.nullable,
+                "default": default,
+                "autoincrement": bool(row.is_identity or (default and default.startswith("nextval("))),
+                "comment": row.comment,
+            })
+        for row in self._execute(conn, _PG_CONSTRAINTS, params):
+            if row.table_name not in tables:
+                continue
+            if row.kind == "p":
+                tables[row.table_name]["pk"] = list(row.columns)
+            else:
+                tables[row.table_name]["fks"].append({
+                    "name": row.name,
+                    "constrained_columns": list(row.columns),
+                    "referred_table": row.referred_table,
+                    "referred_columns": list(row.referred_columns),
+                })
+        for row in self._execute(conn, _PG_INDEXES, params):
+            if row.table_name in tables:
+                tables[row.table_name]["indexes"].append({
+                    "name": row.name, "unique": row.is_unique, "column_names": list(row.columns)
+                })
+        return dict(tables)
+
+    def _read_mysql(self, conn: Connection) -> CatalogSnapshot:
+        params = {"schema": self._schema_name(conn)}
+        tables: CatalogSnapshot = defaultdict(_empty_table)
+        for table, name, col_type, length, nullable, default, auto_inc, comment in self._execute(conn, _MYSQL_COLUMNS, params):
+            tables[table]["columns"].append({
+                "name": name,
+                "type": col_type,
+                "length": length,
+                "nullable": bool(nullable),
+                "default": default,
+                "autoincrement": bool(auto_inc),
+                "comment": comment or None,
+            })
+
+        fks: Dict[tuple, Dict[str, Any]] = {}
+        for table, constraint, column, ref_table, ref_column in self._execute(conn, _MYSQL_KEYS, params):
+            if table not in tables:
+                continue
+            if constraint == "PRIMARY":
+                tables[table]["pk"].append(column)
+            elif ref_table:
+                fk = fks.get((table, constraint))
+                if fk is None:
+                    fk = fks[(table, constraint)] = {
+                        "name": constraint, "constrained_columns": [],
+                        "referred_table": ref_table, "referred_columns": []
+                    }
+                    tables[table]["fks"].append(fk)
+                fk["constrained_columns"].append(column)
+                fk["referred_columns"].append(ref_column)
+
+        indexes: Dict[tuple, Dict[str, Any]] = {}
+        for table, index_name, unique, column in self._execute(conn, _MYSQL_INDEXES, params):
+            if table not in tables:
+                continue
+            index = indexes.get((table, index_name))
+            if index is None:
+                index = indexes[(table, index_name)] = {"name": index_name, "unique": bool(unique), "column_names": []}
+                tables[table]["indexes"].append(index)
+            index["column_names"].append(column)
+        return dict(tables)
+
+    def _read_inspector(self, conn: Connection) -> CatalogSnapshot:
+        """Portable path using SQLAlchemy 2.0 multi-table reflection (bulk where the dialect supports it)"""
+        inspector = inspect(conn)
+        schema = self.schema
+        columns = inspector.get_multi_columns(schema=schema)
+        pks = inspector.get_multi_pk_constraint(schema=schema)
+        fks = inspector.get_multi_foreign_keys(schema=schema)
+        indexes = inspector.get_multi_indexes(schema=schema)
+        uniques = inspector.get_multi_unique_constraints(schema=schema)
+        self.queries_issued += 5
+
+        tables: CatalogSnapshot = {}
+        for (_, table), table_columns in columns.items():
+            tables[table] = {
+                "columns": [
+                    {
+                        **col,
+                        "type": str(col["type"]),
+                        "length": getattr(col["type"], "length", None),
+                    }
+                    for col in table_columns
+                ],
+                "pk": (pks.get((schema, table)) or {}).get("constrained_columns", []),
+                "fks": fks.get((schema, table), []),
+                "indexes": indexes.get((schema, table), []) + [
+                    {"name": uc.get("name"), "unique": True, "column_names": uc["column_names"]}
+                    for uc in uniques.get((schema, table), [])
+                ],
+            }
+        return tables
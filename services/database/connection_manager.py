@@ -1,26 +1,85 @@
 """
 Database connection manager and utilities
+Keeps a registry of per-target async connection pools (SQLAlchemy/asyncpg,
+motor, redis.asyncio) with size limits, health checks, idle eviction and a
+global cap on open connections.
 """
+import asyncio
 import logging
-from typing import Dict, Any
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Set
 
 from dto.v1.schemas.enums import DatabaseType
 from dto.v1.schemas.generation import DatabaseConfig
 
 logger = logging.getLogger(__name__)
 
+SQL_TYPES = (DatabaseType.POSTGRESQL, DatabaseType.MYSQL, DatabaseType.SQLITE, DatabaseType.SQLSERVER)
+
+
+class ConnectionLimitError(Exception):
+    """Raised when opening another pool would exceed the global connection cap"""
+    pass
+
+
+@dataclass
+class PoolEntry:
+    """One pooled client for a single database target"""
+    key: str
+    kind: str  # "sql", "mongo" or "redis"
+    client: Any
+    max_connections: int
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    last_health_check: float = field(default_factory=time.monotonic)
+    checked_out: int = 0
+
+    def in_use(self) -> int:
+        """Connections currently checked out of the pool"""
+        return self.checked_out
+
+
 class DatabaseConnectionManager:
-    """Manages connections to various database types"""
-    
-    def __init__(self):
-        self._engines: Dict[str, Any] = {}
-        self._connections: Dict[str, Any] = {}
-        
+    """Manages pooled connections to various database types"""
+
+    # Sync driver prefix -> async driver prefix
+    ASYNC_DRIVERS = {
+        "postgresql+psycopg2://": "postgresql+asyncpg://",
+        "postgresql://": "postgresql+asyncpg://",
+        "mysql+pymysql://": "mysql+aiomysql://",
+        "mysql://": "mysql+aiomysql://",
+        "mssql+pyodbc://": "mssql+aioodbc://",
+        "sqlite:///": "sqlite+aiosqlite:///",
+    }
+
+    def __init__(
+        self,
+        pool_size: Optional[int] = None,
+        max_overflow: Optional[int] = None,
+        max_total_connections: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        health_check_interval: float = 30.0
+    ):
+        self.pool_size = pool_size or int(os.getenv("PROJECT_DB_POOL_SIZE", "5"))
+        self.max_overflow = max_overflow if max_overflow is not None else int(os.getenv("PROJECT_DB_MAX_OVERFLOW", "5"))
+        self.max_total_connections = max_total_connections or int(os.getenv("PROJECT_DB_MAX_CONNECTIONS", "200"))
+        self.idle_timeout = idle_timeout or float(os.getenv("PROJECT_DB_IDLE_TIMEOUT", "300"))
+        self.health_check_interval = health_check_interval
+
+        self._pools: Dict[str, PoolEntry] = {}
+        # Friendly names (database_name / "mongo" / "redis") -> pool key
+        self._names: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+        # Pools evicted to make room are closed in the background; keep them so shutdown can wait
+        self._closing: Set[asyncio.Task] = set()
+
     async def get_connection_string(self, config: DatabaseConfig) -> str:
         """Generate connection string based on config"""
         if config.connection_string:
             return config.connection_string
-            
+
         if config.type == DatabaseType.POSTGRESQL:
             return f"postgresql://{config.username}:{config.password}@{config.host}:{config.port}/{config.database_name}"
         elif config.type == DatabaseType.MYSQL:
@@ -32,94 +91,286 @@ class DatabaseConnectionManager:
         elif config.type == DatabaseType.MONGODB:
             creds = f"{config.username}:{config.password}@" if config.username else ""
             return f"mongodb://{creds}{config.host}:{config.port}/{config.database_name}"
+        elif config.type == DatabaseType.REDIS:
+            auth = f":{config.password}@" if config.password else ""
+            return f"redis://{auth}{config.host}:{config.port or 6379}/0"
         # Add support for others
         return ""
 
+    def to_async_url(self, conn_str: str) -> str:
+        """Rewrite a sync SQLAlchemy URL to its async driver equivalent"""
+        for sync_prefix, async_prefix in self.ASYNC_DRIVERS.items():
+            if conn_str.startswith(sync_prefix):
+                return async_prefix + conn_str[len(sync_prefix):]
+        return conn_str
+
     async def connect(self, config: DatabaseConfig) -> bool:
-        """Establish connection to database"""
+        """Establish (or reuse) a pooled connection to a database"""
         try:
-            conn_str = await self.get_connection_string(config)
-            
-            if config.type in [DatabaseType.POSTGRESQL, DatabaseType.MYSQL, DatabaseType.SQLITE, DatabaseType.SQLSERVER]:
-                return await self._connect_sql(conn_str, config.database_name)
+            if config.type in SQL_TYPES:
+                await self.get_async_engine(config)
             elif config.type == DatabaseType.MONGODB:
-                return await self._connect_mongo(conn_str)
+                await self.get_mongo_client(config)
             elif config.type == DatabaseType.REDIS:
-                return await self._connect_redis(config)
-            
-            logger.warning(f"Unsupported database type: {config.type}")
-            return False
-            
-        except Exception as e:
-            logger.error(f"Failed to connect to database: {e}")
-            raise
-
-    async def _connect_sql(self, conn_str: str, name: str) -> bool:
-        """Connect to SQL database using SQLAlchemy"""
-        try:
-            from sqlalchemy import create_engine, text
-            
-            engine = create_engine(conn_str)
-            # Test connection
-            with engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
-                
-            self._engines[name or "default"] = engine
-            logger.info(f"Connected to SQL database: {name}")
+                await self.get_redis_client(config)
+            else:
+                logger.warning(f"Unsupported database type: {config.type}")
+                return False
             return True
-        except ImportError:
-            logger.error("SQLAlchemy not installed")
+        except ConnectionLimitError:
+            raise
+        except ImportError as e:
+            logger.error(f"Database driver not installed: {e}")
             return False
         except Exception as e:
-            logger.error(f"SQL connection error: {e}")
+            logger.error(f"Failed to connect to database: {e}")
             return False
 
-    async def _connect_mongo(self, conn_str: str) -> bool:
-        """Connect to MongoDB"""
-        try:
-            from pymongo import MongoClient
-            
-            client = MongoClient(conn_str)
-            # Test connection
-            client.admin.command('ping')
-            
-            self._connections["mongo"] = client
-            logger.info("Connected to MongoDB")
-            return True
-        except ImportError:
-            logger.error("pymongo not installed")
-            return False
-        except Exception as e:
-            logger.error(f"MongoDB connection error: {e}")
-            return False
-            
-    async def _connect_redis(self, config: DatabaseConfig) -> bool:
-        """Connect to Redis"""
-        try:
-            import redis
-            
-            r = redis.Redis(
-                host=config.host,
-                port=config.port,
-                password=config.password,
-                decode_responses=True
-            )
-            r.ping()
-            
-            self._connections["redis"] = r
-            logger.info("Connected to Redis")
-            return True
-        except ImportError:
-            logger.error("redis not installed")
-            return False
-        except Exception as e:
-            logger.error(f"Redis connection error: {e}")
-            return False
+    # --- Typed accessors ---
+
+    async def get_async_engine(self, config: DatabaseConfig) -> Any:
+        """Get the pooled async SQLAlchemy engine for a SQL database"""
+        url = self.to_async_url(await self.get_connection_string(config))
+        entry = await self._acquire(url, "sql", lambda entry: self._create_sql(url))
+        self._names[config.database_name or "default"] = url
+        return entry.client
+
+    async def get_mongo_client(self, config: DatabaseConfig) -> Any:
+        """Get the pooled motor client for a MongoDB target"""
+        url = await self.get_connection_string(config)
+        entry = await self._acquire(url, "mongo", lambda entry: self._create_mongo(url, entry))
+        self._names["mongo"] = url
+        return entry.client
+
+    async def get_redis_client(self, config: DatabaseConfig) -> Any:
+        """Get the pooled redis.asyncio client for a Redis target"""
+        url = await self.get_connection_string(config)
+        entry = await self._acquire(url, "redis", lambda entry: self._create_redis(url))
+        self._names["redis"] = url
+        return entry.client
 
     def get_engine(self, name: str = "default") -> Any:
-        """Get SQLAlchemy engine"""
-        return self._engines.get(name)
-        
+        """Get the async SQLAlchemy engine last connected under a database name"""
+        entry = self._pools.get(self._names.get(name, ""))
+        if entry and entry.kind == "sql":
+            entry.last_used = time.monotonic()
+            return entry.client
+        return None
+
     def get_client(self, type_key: str = "mongo") -> Any:
-        """Get native client (mongo, redis, etc)"""
-        return self._connections.get(type_key)
+        """Get native async client (mongo, redis) last connected"""
+        entry = self._pools.get(self._names.get(type_key, ""))
+        if entry:
+            entry.last_used = time.monotonic()
+            return entry.client
+        return None
+
+    # --- Registry ---
+
+    async def _acquire(self, key: str, kind: str, factory) -> PoolEntry:
+        """Return a healthy pool for ``key``, creating it within the global cap if needed"""
+        async with self._lock:
+            await self._evict_idle()
+            entry = self._pools.get(key)
+            if entry is None:
+                max_connections = self._pool_capacity(kind, key)
+                self._reserve(max_connections)
+                entry = PoolEntry(key=key, kind=kind, client=None, max_connections=max_connections)
+                entry.client = factory(entry)
+                self._track_checkouts(entry)
+                try:
+                    await self._ping(entry)
+                except Exception:
+                    await self._close(entry)
+                    raise
+                self._pools[key] = entry
+                logger.info(f"Opened {kind} pool ({max_connections} max) - {self.open_capacity()}/{self.max_total_connections} reserved")
+            elif time.monotonic() - entry.last_health_check > self.health_check_interval:
+                try:
+                    await self._ping(entry)
+                except Exception as e:
+                    # Drop the broken pool; the next call reconnects from scratch
+                    logger.warning(f"Health check failed for {kind} pool, closing it: {e}")
+                    self._pools.pop(key, None)
+                    await self._close(entry)
+                    raise
+            entry.last_used = time.monotonic()
+            return entry
+
+    def _pool_capacity(self, kind: str, key: str) -> int:
+        if kind == "sql" and key.startswith("sqlite"):
+            # File-backed SQLite opens one connection per checkout and needs no pool
+            return 1
+        return self.pool_size + self.max_overflow
+
+    def open_capacity(self) -> int:
+        """Connections reserved by open pools (their maximum sizes)"""
+        return sum(entry.max_connections for entry in self._pools.values())
+
+    def _reserve(self, needed: int):
+        """Make room under the global cap by evicting least-recently-used idle pools"""
+        if self.open_capacity() + needed <= self.max_total_connections:
+            return
+        for entry in sorted(self._pools.values(), key=lambda e: e.last_used):
+            if entry.in_use() == 0:
+                self._pools.pop(entry.key, None)
+                task = asyncio.create_task(self._close(entry))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+                logger.info(f"Evicted idle {entry.kind} pool to stay under the connection cap")
+                if self.open_capacity() + needed <= self.max_total_connections:
+                    return
+        raise ConnectionLimitError(
+            f"Connection cap reached ({self.open_capacity()}/{self.max_total_connections} reserved)"
+        )
+
+    async def _evict_idle(self):
+        now = time.monotonic()
+        for entry in list(self._pools.values()):
+            if now - entry.last_used > self.idle_timeout and entry.in_use() == 0:
+                self._pools.pop(entry.key, None)
+                await self._close(entry)
+                logger.info(f"Evicted {entry.kind} pool idle for {int(now - entry.last_used)}s")
+
+    async def evict_idle(self):
+        """Close pools idle longer than idle_timeout (also runs on every acquire)"""
+        async with self._lock:
+            await self._evict_idle()
+
+    async def close_all(self):
+        """Close every pool"""
+        async with self._lock:
+            entries, self._pools = list(self._pools.values()), {}
+            self._names.clear()
+        for entry in entries:
+            await self._close(entry)
+        if self._closing:
+            await asyncio.gather(*list(self._closing), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool registry overview for monitoring"""
+        now = time.monotonic()
+        return {
+            "pools": len(self._pools),
+            "reserved_connections": self.open_capacity(),
+            "max_total_connections": self.max_total_connections,
+            "targets": [
+                {
+                    "kind": entry.kind,
+                    "max_connections": entry.max_connections,
+                    "in_use": entry.in_use(),
+                    "idle_seconds": round(now - entry.last_used, 1),
+                }
+                for entry in self._pools.values()
+            ],
+        }
+
+    # --- Drivers ---
+
+    def _create_sql(self, url: str) -> Any:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        if url.startswith("sqlite"):
+            return create_async_engine(url)
+        return create_async_engine(
+            url,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=30,
+            pool_recycle=1800,
+            pool_pre_ping=True
+        )
+
+    def _create_mongo(self, url: str, entry: PoolEntry) -> Any:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from pymongo import monitoring
+
+        class CheckoutListener(monitoring.ConnectionPoolListener):
+            """Counts checked-out connections; pymongo only accepts pool listeners at construction"""
+
+            def connection_checked_out(self, event):
+                entry.checked_out += 1
+
+            def connection_checked_in(self, event):
+                entry.checked_out = max(0, entry.checked_out - 1)
+
+            # The remaining pool events are not needed for eviction decisions
+            def pool_created(self, event): pass
+            def pool_ready(self, event): pass
+            def pool_cleared(self, event): pass
+            def pool_closed(self, event): pass
+            def connection_created(self, event): pass
+            def connection_ready(self, event): pass
+            def connection_closed(self, event): pass
+            def connection_check_out_started(self, event): pass
+            def connection_check_out_failed(self, event): pass
+
+        return AsyncIOMotorClient(
+            url,
+            maxPoolSize=self.pool_size + self.max_overflow,
+            maxIdleTimeMS=int(self.idle_timeout * 1000),
+            serverSelectionTimeoutMS=5000,
+            event_listeners=[CheckoutListener()]
+        )
+
+    def _create_redis(self, url: str) -> Any:
+        import redis.asyncio as redis
+
+        return redis.from_url(
+            url,
+            decode_responses=True,
+            max_connections=self.pool_size + self.max_overflow,
+            socket_connect_timeout=5
+        )
+
+    def _track_checkouts(self, entry: PoolEntry):
+        """Count checked-out connections so busy pools are never evicted (works for every pool class)"""
+        if entry.kind == "sql":
+            from sqlalchemy import event
+
+            def on_checkout(*args):
+                entry.checked_out += 1
+
+            def on_checkin(*args):
+                entry.checked_out = max(0, entry.checked_out - 1)
+
+            event.listen(entry.client.sync_engine, "checkout", on_checkout)
+            event.listen(entry.client.sync_engine, "checkin", on_checkin)
+        elif entry.kind == "redis":
+            # redis.asyncio has no pool events, so wrap the pool's own checkout/checkin
+            pool = entry.client.connection_pool
+            get_connection, release = pool.get_connection, pool.release
+
+            async def tracked_get_connection(*args, **kwargs):
+                connection = await get_connection(*args, **kwargs)
+                entry.checked_out += 1
+                return connection
+
+            async def tracked_release(connection):
+                entry.checked_out = max(0, entry.checked_out - 1)
+                await release(connection)
+
+            pool.get_connection, pool.release = tracked_get_connection, tracked_release
+        # MongoDB checkouts are counted by the listener installed in _create_mongo
+
+    async def _ping(self, entry: PoolEntry):
+        if entry.kind == "sql":
+            from sqlalchemy import text
+            async with entry.client.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        elif entry.kind == "mongo":
+            await entry.client.admin.command('ping')
+        elif entry.kind == "redis":
+            await entry.client.ping()
+        entry.last_health_check = time.monotonic()
+
+    async def _close(self, entry: PoolEntry):
+        try:
+            if entry.kind == "sql":
+                await entry.client.dispose()
+            elif entry.kind == "mongo":
+                entry.client.close()
+            elif entry.kind == "redis":
+                await entry.client.aclose() if hasattr(entry.client, "aclose") else await entry.client.close()
+        except Exception as e:
+            logger.debug(f"Error closing {entry.kind} pool: {e}")
@@ -1,28 +1,21 @@
 """
 Entity code generator
 """
+import asyncio
+import hashlib
+import json
 import logging
+import os
+import re
+from collections import deque
+from pathlib import Path
 from typing import List, Dict, Optional, Any
 
 from dto.v1.schemas.generation import EntityDefinition
 
 logger = logging.getLogger(__name__)
 
-class EntityGenerator:
-    """Generates code from entity definitions"""
-    
-    def __init__(self, orchestrator):
-        self.orchestrator = orchestrator # Type: Orchestrator
-        
-    async def generate_models(self, entities: List[EntityDefinition], language: str, framework: Optional[str] = None, context: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
-        """Generate model code for entities with validations and relationships"""
-        results = {}
-        
-        context = context or {}
-        project_description = context.get("description", "Not provided")
-        project_requirements = context.get("requirements", "Not provided")
-        
-        prompt_template = """
+MODEL_PROMPT = """
         Generate a {language} data model for the following entity definition.
         Framework: {framework}
         
@@ -31,6 +24,9 @@ class EntityGenerator:
         Requirements: {project_requirements}
         -----------------------
         
+        Related entities (schema summary):
+        {schema_summary}
+        
         Entity Name: {name}
         Table Name: {table_name}
         
@@ -51,68 +47,392 @@ class EntityGenerator:
         - Use standard ORM annotations if applicable
         - Include audit fields if specified (CreatedAt, UpdatedAt, etc.)
         """
+
+BATCH_MODEL_PROMPT = """
+        Generate {language} data models for the {count} related entity definitions below.
+        Framework: {framework}
+        
+        --- PROJECT CONTEXT ---
+        Description: {project_description}
+        Requirements: {project_requirements}
+        -----------------------
+        
+        Other referenced entities (schema summary, do not generate these):
+        {schema_summary}
+        
+        {entities}
         
+        Requirements:
+        - Include all fields with correct types
+        - Implement all validation rules
+        - Include relationship mappings (OneToMany, ManyToOne, etc.) consistently on both sides
+        - Follow {language} best practices
+        - Use standard ORM annotations if applicable
+        - Include audit fields if specified (CreatedAt, UpdatedAt, etc.)
+        
+        Output format: for EACH entity emit a line `=== ENTITY: <Entity Name> ===`
+        followed by that entity's complete code. Do not merge entities into one section.
+        """
+
+ENTITY_BLOCK = """
+        --- Entity: {name} (table {table_name}) ---
+        Fields:
+        {fields}
+        Validations:
+        {validations}
+        Relationships:
+        {relationships}
+        """
+
+SECTION_MARKER = re.compile(r'^[ \t#*]*=+\s*ENTITY:\s*([A-Za-z_][\w]*)\s*=+[ \t*]*$', re.MULTILINE | re.IGNORECASE)
+
+
+class EntityGenerator:
+    """Generates code from entity definitions"""
+    
+    def __init__(
+        self,
+        orchestrator,
+        batch_size: int = 5,
+        max_concurrency: int = 4,
+        cache_path: Optional[str] = "storage/entity_generation_cache.json"
+    ):
+        self.orchestrator = orchestrator # Type: Orchestrator
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.cache_path = Path(cache_path) if cache_path else None
+        # "<language>:<framework>:<project digest>:<entity>" -> {"fingerprint", "code"}
+        self._cache: Dict[str, Dict[str, str]] = self._load_cache()
+        
+    async def generate_models(
+        self,
+        entities: List[EntityDefinition],
+        language: str,
+        framework: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+        force: bool = False
+    ) -> Dict[str, str]:
+        """
+        Generate model code for entities with validations and relationships.
+        Related entities are batched into one prompt, batches run concurrently, and
+        entities whose definition is unchanged since the last run are served from cache
+        unless ``force`` is set.
+        """
+        context = context or {}
+        results: Dict[str, str] = {}
+        
+        scope = self._cache_scope(language, framework, context)
+        pending = []
         for entity in entities:
-            fields_desc = "\n".join([
-                f"- {f.name} ({f.type}{'(' + str(f.length) + ')' if f.length else ''}): "
-                f"{f.description or ''} "
-                f"{'(PK)' if f.primary_key else ''} "
-                f"{'(FK: ' + f.foreign_key + ')' if f.foreign_key else ''} "
-                f"{'(Unique)' if f.unique else ''} "
-                f"{'(Nullable)' if f.nullable else 'Required'}"
-                for f in entity.fields
-            ])
+            cached = self._cache.get(f"{scope}:{entity.name}")
+            if not force and cached and cached.get("fingerprint") == self._fingerprint(entity):
+                results[entity.name] = cached["code"]
+            else:
+                pending.append(entity)
+        
+        if pending:
+            logger.info(
+                f"Generating models for {len(pending)}/{len(entities)} entities "
+                f"({len(entities) - len(pending)} unchanged, served from cache)"
+            )
+            # Built once and shared by every batch prompt
+            summaries = {entity.name: self._summarize_entity(entity) for entity in entities}
+            references = self._references(entities)
+            groups = self._group_entities(pending, references)
+            semaphore = asyncio.Semaphore(self.max_concurrency)
             
-            # Format validations
-            validations_desc = []
-            for field in entity.fields:
-                if field.validations:
-                    field_validations = ", ".join([f"{v.type}{'=' + str(v.value) if v.value else ''}" for v in field.validations])
-                    validations_desc.append(f"- {field.name}: {field_validations}")
-            validations_str = "\n".join(validations_desc) if validations_desc else "None"
+            async def run_group(group: List[EntityDefinition]) -> Dict[str, str]:
+                async with semaphore:
+                    return await self._generate_model_group(group, summaries, references, language, framework, context)
             
-            # Format relationships
-            relationships_desc = []
-            for rel in entity.relationships:
-                rel_type = rel.get('type', 'Unknown')
-                target = rel.get('target_entity', 'Unknown')
-                fk = rel.get('foreign_key', rel.get('mapped_by', ''))
-                relationships_desc.append(f"- {rel_type} -> {target} (via {fk})")
-            relationships_str = "\n".join(relationships_desc) if relationships_desc else "None"
+            # One failed batch must not discard the batches that succeeded
+            outcomes = await asyncio.gather(*(run_group(group) for group in groups), return_exceptions=True)
+            for group, generated in zip(groups, outcomes):
+                if isinstance(generated, Exception):
+                    logger.error(f"Model generation failed for {', '.join(e.name for e in group)}: {generated}")
+                    continue
+                results.update(generated)
             
-            prompt = prompt_template.format(
-                language=language,
-                framework=framework or "Standard",
-                project_description=project_description,
-                project_requirements=project_requirements,
+            for entity in pending:
+                if results.get(entity.name):
+                    self._cache[f"{scope}:{entity.name}"] = {
+                        "fingerprint": self._fingerprint(entity),
+                        "code": results[entity.name]
+                    }
+            self._save_cache()
+        
+        # Preserve the caller's entity order
+        return {entity.name: results.get(entity.name, "") for entity in entities}
+
+    # --- Model generation pipeline ---
+
+    async def _generate_model_group(
+        self,
+        group: List[EntityDefinition],
+        summaries: Dict[str, str],
+        references: Dict[str, List[str]],
+        language: str,
+        framework: Optional[str],
+        context: Dict[str, Any]
+    ) -> Dict[str, str]:
+        """Generate one batch; entities missing from a batched answer are retried one by one"""
+        if len(group) == 1:
+            return {group[0].name: await self._generate_single_model(group[0], summaries, references, language, framework, context)}
+        
+        result = await self.orchestrator.universal_agent.generate_code(
+            requirements=self._batch_prompt(group, summaries, references, language, framework, context),
+            language=language,
+            framework=framework,
+            context_data=self._agent_context(context)
+        )
+        sections = self._split_sections(result.get("solution", ""))
+        
+        generated = {}
+        for entity in group:
+            code = sections.get(entity.name)
+            if not code:
+                logger.warning(f"Batched generation omitted {entity.name}, regenerating it separately")
+                code = await self._generate_single_model(entity, summaries, references, language, framework, context)
+            generated[entity.name] = code
+        return generated
+
+    async def _generate_single_model(
+        self,
+        entity: EntityDefinition,
+        summaries: Dict[str, str],
+        references: Dict[str, List[str]],
+        language: str,
+        framework: Optional[str],
+        context: Dict[str, Any]
+    ) -> str:
+        fields_str, validations_str, relationships_str = self._describe_entity(entity)
+        prompt = MODEL_PROMPT.format(
+            language=language,
+            framework=framework or "Standard",
+            project_description=context.get("description", "Not provided"),
+            project_requirements=context.get("requirements", "Not provided"),
+            schema_summary=self._related_summary([entity], summaries, references),
+            name=entity.name,
+            table_name=entity.table_name,
+            fields=fields_str,
+            validations=validations_str,
+            relationships=relationships_str
+        )
+        
+        # Use the universal agent to generate the code
+        result = await self.orchestrator.universal_agent.generate_code(
+            requirements=prompt,
+            language=language,
+            framework=framework,
+            context_data=self._agent_context(context)
+        )
+        
+        # Extract code from result
+        return result.get("solution", "")
+
+    def _batch_prompt(
+        self,
+        group: List[EntityDefinition],
+        summaries: Dict[str, str],
+        references: Dict[str, List[str]],
+        language: str,
+        framework: Optional[str],
+        context: Dict[str, Any]
+    ) -> str:
+        blocks = []
+        for entity in group:
+            fields_str, validations_str, relationships_str = self._describe_entity(entity)
+            blocks.append(ENTITY_BLOCK.format(
                 name=entity.name,
                 table_name=entity.table_name,
-                fields=fields_desc,
+                fields=fields_str,
                 validations=validations_str,
                 relationships=relationships_str
-            )
-            
-            # Use the universal agent to generate the code
-            # Pass full context for enhanced prompt building
-            full_context = {
-                "project_name": context.get("project_name", ""),
-                "description": context.get("description", ""),
-                "security": context.get("security", {}),
-                "database": context.get("database", {}),
-                "kubernetes": context.get("kubernetes", {})
-            }
-            result = await self.orchestrator.universal_agent.generate_code(
-                requirements=prompt,
-                language=language,
-                framework=framework,
-                context_data=full_context
-            )
-            
-            # Extract code from result
-            code = result.get("solution", "")
-            results[entity.name] = code
-            
-        return results
+            ))
+        
+        return BATCH_MODEL_PROMPT.format(
+            count=len(group),
+            language=language,
+            framework=framework or "Standard",
+            project_description=context.get("description", "Not provided"),
+            project_requirements=context.get("requirements", "Not provided"),
+            schema_summary=self._related_summary(group, summaries, references),
+            entities="\n".join(blocks)
+        )
+
+    @staticmethod
+    def _split_sections(solution: str) -> Dict[str, str]:
+        """Split a batched answer on its ``=== ENTITY: Name ===`` markers"""
+        parts = SECTION_MARKER.split(solution)
+        # parts = [preamble, name1, body1, name2, body2, ...]
+        return {
+            parts[i].strip(): parts[i + 1].strip()
+            for i in range(1, len(parts) - 1, 2)
+            if parts[i + 1].strip()
+        }
+
+    def _group_entities(self, pending: List[EntityDefinition], references: Dict[str, List[str]]) -> List[List[EntityDefinition]]:
+        """
+        Batch pending entities so related ones share a prompt: walk each connected
+        component of the relationship graph breadth-first, cut it into batches of
+        ``batch_size``, then pack leftover small batches together.
+        """
+        pending_names = {entity.name for entity in pending}
+        by_name = {entity.name: entity for entity in pending}
+        neighbours = {name: set() for name in pending_names}
+        for name, targets in references.items():
+            for target in targets:
+                if name in pending_names and target in pending_names:
+                    neighbours[name].add(target)
+                    neighbours[target].add(name)
+        
+        groups, leftovers, seen = [], [], set()
+        for entity in pending:
+            if entity.name in seen:
+                continue
+            component, queue = [], deque([entity.name])
+            seen.add(entity.name)
+            while queue:
+                name = queue.popleft()
+                component.append(by_name[name])
+                for other in sorted(neighbours[name] - seen):
+                    seen.add(other)
+                    queue.append(other)
+            for i in range(0, len(component), self.batch_size):
+                chunk = component[i:i + self.batch_size]
+                (groups if len(chunk) == self.batch_size else leftovers).append(chunk)
+        
+        # First-fit pack the partial batches (mostly isolated tables)
+        packed: List[List[EntityDefinition]] = []
+        for chunk in sorted(leftovers, key=len, reverse=True):
+            for batch in packed:
+                if len(batch) + len(chunk) <= self.batch_size:
+                    batch.extend(chunk)
+                    break
+            else:
+                packed.append(list(chunk))
+        return groups + packed
+
+    @staticmethod
+    def _references(entities: List[EntityDefinition]) -> Dict[str, List[str]]:
+        """Entity name -> entity names it points at through relationships or foreign keys"""
+        table_to_name = {(e.table_name or e.name).lower(): e.name for e in entities}
+        references = {}
+        for entity in entities:
+            names = [rel.get('target_entity') for rel in entity.relationships if rel.get('target_entity')]
+            for field in entity.fields:
+                if field.foreign_key:
+                    target = table_to_name.get(field.foreign_key.split('.')[0].lower())
+                    if target:
+                        names.append(target)
+            references[entity.name] = list(dict.fromkeys(n for n in names if n != entity.name))
+        return references
+
+    @staticmethod
+    def _related_summary(group: List[EntityDefinition], summaries: Dict[str, str], references: Dict[str, List[str]]) -> str:
+        """Compact schema lines for the entities a batch references (not the whole schema)"""
+        group_names = {entity.name for entity in group}
+        related = []
+        for entity in group:
+            for name in references.get(entity.name, []):
+                if name not in group_names and name in summaries and name not in related:
+                    related.append(name)
+        return "\n".join(summaries[name] for name in related) if related else "None"
+
+    @staticmethod
+    def _summarize_entity(entity: EntityDefinition) -> str:
+        """One-line schema summary, e.g. ``Order(orders): id:integer PK, user_id:integer FK->users.id``"""
+        fields = []
+        for f in entity.fields:
+            parts = [f"{f.name}:{f.type}"]
+            if f.primary_key:
+                parts.append("PK")
+            if f.foreign_key:
+                parts.append(f"FK->{f.foreign_key}")
+            fields.append(" ".join(parts))
+        return f"- {entity.name}({entity.table_name or entity.name}): {', '.join(fields)}"
+
+    @staticmethod
+    def _describe_entity(entity: EntityDefinition):
+        """Fields, validations and relationships sections of a model prompt"""
+        fields_desc = "\n".join([
+            f"- {f.name} ({f.type}{'(' + str(f.length) + ')' if f.length else ''}): "
+            f"{f.description or ''} "
+            f"{'(PK)' if f.primary_key else ''} "
+            f"{'(FK: ' + f.foreign_key + ')' if f.foreign_key else ''} "
+            f"{'(Unique)' if f.unique else ''} "
+            f"{'(Nullable)' if f.nullable else 'Required'}"
+            for f in entity.fields
+        ])
+        
+        # Format validations
+        validations_desc = []
+        for field in entity.fields:
+            if field.validations:
+                field_validations = ", ".join([f"{v.type}{'=' + str(v.value) if v.value else ''}" for v in field.validations])
+                validations_desc.append(f"- {field.name}: {field_validations}")
+        validations_str = "\n".join(validations_desc) if validations_desc else "None"
+        
+        # Format relationships
+        relationships_desc = []
+        for rel in entity.relationships:
+            rel_type = rel.get('type', 'Unknown')
+            target = rel.get('target_entity', 'Unknown')
+            fk = rel.get('foreign_key', rel.get('mapped_by', ''))
+            relationships_desc.append(f"- {rel_type} -> {target} (via {fk})")
+        relationships_str = "\n".join(relationships_desc) if relationships_desc else "None"
+        
+        return fields_desc, validations_str, relationships_str
+
+    @staticmethod
+    def _agent_context(context: Dict[str, Any]) -> Dict[str, Any]:
+        # Pass full context for enhanced prompt building
+        return {
+            "project_name": context.get("project_name", ""),
+            "description": context.get("description", ""),
+            "security": context.get("security", {}),
+            "database": context.get("database", {}),
+            "kubernetes": context.get("kubernetes", {})
+        }
+
+    # --- Incremental regeneration cache ---
+
+    @staticmethod
+    def _fingerprint(entity: EntityDefinition) -> str:
+        return hashlib.sha256(entity.model_dump_json().encode()).hexdigest()
+
+    @staticmethod
+    def _cache_scope(language: str, framework: Optional[str], context: Dict[str, Any]) -> str:
+        """Cached code is only valid for the same target stack and the project context sent to the agent"""
+        project = json.dumps(
+            [EntityGenerator._agent_context(context), context.get("requirements", "")],
+            sort_keys=True,
+            default=str
+        )
+        digest = hashlib.sha256(project.encode()).hexdigest()[:16]
+        return f"{language}:{framework or 'Standard'}:{digest}"
+
+    def _load_cache(self) -> Dict[str, Dict[str, str]]:
+        if not self.cache_path or not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable entity generation cache {self.cache_path}: {e}")
+            return {}
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(self._cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.warning(f"Could not persist entity generation cache: {e}")
 
     async def generate_api(self, entities: List[EntityDefinition], language: str, framework: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
         """Generate API endpoints for entities"""
@@ -1,72 +1,149 @@
 """
 Database Explorer Service
 Provides deep introspection and data sampling for project-specific databases.
+Uses pooled async engines, cached table metadata, keyset pagination over primary
+keys and planner-statistics row estimates so browsing never blocks the event loop.
 """
+import base64
+import json
 import logging
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
 from typing import List, Dict, Any, Optional
-from sqlalchemy import text, inspect
+
+from sqlalchemy import text, inspect, select, table, column, tuple_, and_, or_, func, literal_column
 from services.database.connection_manager import DatabaseConnectionManager
 
 logger = logging.getLogger(__name__)
 
+
 class DatabaseExplorerService:
-    def __init__(self, connection_manager: DatabaseConnectionManager):
+    def __init__(self, connection_manager: DatabaseConnectionManager, metadata_ttl: float = 60.0):
         self.conn_manager = connection_manager
+        self.metadata_ttl = metadata_ttl
+        # engine URL -> {"tables": [...], "loaded_at": float, "columns": {...}, "pks": {...}}
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+
+    # --- Metadata cache ---
+
+    def _metadata_for(self, engine) -> Dict[str, Any]:
+        key = str(engine.url)
+        entry = self._metadata.get(key)
+        if entry is None or time.monotonic() - entry["loaded_at"] > self.metadata_ttl:
+            entry = {"tables": None, "loaded_at": time.monotonic(), "columns": {}, "pks": {}}
+            self._metadata[key] = entry
+        return entry
+
+    async def invalidate(self, config: Any):
+        """Drop cached metadata for a database (e.g. after DDL)"""
+        engine = await self._get_engine(config)
+        self._metadata.pop(str(engine.url), None)
+
+    async def _table_names(self, engine) -> List[str]:
+        meta = self._metadata_for(engine)
+        if meta["tables"] is None:
+            async with engine.connect() as conn:
+                meta["tables"] = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+        return meta["tables"]
+
+    async def _validate_table(self, engine, table_name: str):
+        # SECURITY: Validate table name against schema to prevent injection
+        if table_name not in await self._table_names(engine):
+            raise ValueError(f"Invalid table name: {table_name}")
+
+    async def _columns(self, engine, table_name: str) -> List[Dict[str, Any]]:
+        meta = self._metadata_for(engine)
+        if table_name not in meta["columns"]:
+            async with engine.connect() as conn:
+                def reflect(sync_conn):
+                    inspector = inspect(sync_conn)
+                    return (
+                        inspector.get_columns(table_name),
+                        inspector.get_pk_constraint(table_name).get("constrained_columns", [])
+                    )
+                meta["columns"][table_name], meta["pks"][table_name] = await conn.run_sync(reflect)
+        return meta["columns"][table_name]
+
+    async def _primary_key(self, engine, table_name: str) -> List[str]:
+        await self._columns(engine, table_name)
+        return self._metadata_for(engine)["pks"][table_name]
+
+    # --- Public API ---
 
     async def list_tables(self, config: Any) -> List[str]:
         """List all tables in the database"""
         engine = await self._get_engine(config)
-        inspector = inspect(engine)
-        return inspector.get_table_names()
+        return list(await self._table_names(engine))
 
     async def get_table_schema(self, config: Any, table_name: str) -> List[Dict[str, Any]]:
         """Get detailed schema for a specific table with validation"""
         engine = await self._get_engine(config)
-        
-        # SECURITY: Validate table name
-        inspector = inspect(engine)
-        if table_name not in inspector.get_table_names():
-            raise ValueError(f"Invalid table name: {table_name}")
-            
-        columns = inspector.get_columns(table_name)
-        
+        await self._validate_table(engine, table_name)
+
         # Convert types to string for JSON serialization
-        for col in columns:
-            col['type'] = str(col['type'])
-        return columns
+        return [{**col, 'type': str(col['type'])} for col in await self._columns(engine, table_name)]
 
     async def get_table_data(
-        self, 
-        config: Any, 
-        table_name: str, 
-        limit: int = 50, 
-        offset: int = 0
+        self,
+        config: Any,
+        table_name: str,
+        limit: int = 50,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        exact_count: bool = False
     ) -> Dict[str, Any]:
-        """Fetch sample data from a table with strict validation"""
+        """
+        Fetch a page of rows with strict validation.
+        Tables with a primary key are paged by keyset: pass the returned ``next_cursor``
+        to continue. ``offset`` is honoured only when no cursor is given. The total
+        is a planner estimate unless ``exact_count`` is requested.
+        """
         engine = await self._get_engine(config)
-        
-        # SECURITY: Validate table name against schema to prevent injection
-        inspector = inspect(engine)
-        if table_name not in inspector.get_table_names():
-            raise ValueError(f"Invalid table name: {table_name}")
-            
-        query = text(f"SELECT * FROM {table_name} LIMIT :limit OFFSET :offset")
-        
-        with engine.connect() as conn:
-            result = conn.execute(query, {"limit": limit, "offset": offset})
-            columns = result.keys()
-            data = [dict(zip(columns, row)) for row in result]
-            
-            # Get total count
-            count_query = text(f"SELECT COUNT(*) FROM {table_name}")
-            total_count = conn.execute(count_query).scalar()
-            
+        await self._validate_table(engine, table_name)
+
+        columns = await self._columns(engine, table_name)
+        pk = await self._primary_key(engine, table_name)
+        col_types = {col['name']: col['type'] for col in columns}
+        tbl = table(table_name, *(column(col['name'], col['type']) for col in columns))
+
+        query = select(literal_column("*")).select_from(tbl)
+        keyset = bool(pk) and (cursor is not None or offset == 0)
+        if keyset:
+            pk_cols = [tbl.c[name] for name in pk]
+            if cursor:
+                raw_values = self._decode_cursor(cursor)
+                if len(raw_values) != len(pk):
+                    raise ValueError("Invalid pagination cursor")
+                values = [self._coerce(v, col_types[name]) for name, v in zip(pk, raw_values)]
+                query = query.where(self._after(pk_cols, values, engine.dialect.name))
+            query = query.order_by(*pk_cols).limit(limit)
+        else:
+            query = query.limit(limit).offset(offset)
+
+        async with engine.connect() as conn:
+            result = await conn.execute(query)
+            result_columns = list(result.keys())
+            data = [dict(row._mapping) for row in result]
+
+            if exact_count:
+                total_count = (await conn.execute(select(func.count()).select_from(tbl))).scalar()
+            else:
+                total_count = await self._estimate_count(conn, table_name)
+
+        next_cursor = None
+        if keyset and len(data) == limit:
+            next_cursor = self._encode_cursor([data[-1][name] for name in pk])
+
         return {
-            "columns": list(columns),
+            "columns": result_columns,
             "rows": data,
             "total_count": total_count,
+            "count_is_estimate": not exact_count,
             "limit": limit,
-            "offset": offset
+            "offset": offset if not keyset else None,
+            "next_cursor": next_cursor
         }
 
     async def execute_query(self, config: Any, query_str: str) -> Dict[str, Any]:
@@ -74,22 +151,91 @@ class DatabaseExplorerService:
         # Basic SQL safety check: only allow SELECT
         if not query_str.strip().lower().startswith("select"):
             raise ValueError("Only SELECT queries are allowed for exploration.")
-            
+
         engine = await self._get_engine(config)
-        with engine.connect() as conn:
-            result = conn.execute(text(query_str))
+        async with engine.connect() as conn:
+            result = await conn.execute(text(query_str))
             if result.returns_rows:
                 columns = result.keys()
                 data = [dict(zip(columns, row)) for row in result]
                 return {"columns": list(columns), "rows": data}
             return {"message": "Query executed successfully, no rows returned."}
 
+    # --- Helpers ---
+
+    async def _estimate_count(self, conn, table_name: str) -> Optional[int]:
+        """Row estimate from planner statistics; None when the dialect keeps none"""
+        dialect = conn.dialect.name
+        try:
+            if dialect == "postgresql":
+                estimate = (await conn.execute(
+                    text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(quote_ident(:name))"),
+                    {"name": table_name}
+                )).scalar()
+                # -1 means the table has never been analyzed
+                return estimate if estimate is not None and estimate >= 0 else None
+            if dialect in ("mysql", "mariadb"):
+                return (await conn.execute(
+                    text("SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name"),
+                    {"name": table_name}
+                )).scalar()
+            if dialect == "mssql":
+                return (await conn.execute(
+                    text("SELECT SUM(row_count) FROM sys.dm_db_partition_stats WHERE object_id = OBJECT_ID(:name) AND index_id < 2"),
+                    {"name": table_name}
+                )).scalar()
+        except Exception as e:
+            logger.debug(f"Row estimate unavailable for {table_name}: {e}")
+        return None
+
+    @staticmethod
+    def _after(pk_cols, values, dialect: str):
+        """Keyset predicate: rows strictly after the cursor in primary-key order"""
+        if len(pk_cols) == 1:
+            return pk_cols[0] > values[0]
+        if dialect != "mssql":
+            return tuple_(*pk_cols) > tuple_(*values)
+        # SQL Server has no row-value comparison; expand lexicographically
+        clauses = []
+        for i, col in enumerate(pk_cols):
+            equal_prefix = [pk_cols[j] == values[j] for j in range(i)]
+            clauses.append(and_(*equal_prefix, col > values[i]))
+        return or_(*clauses)
+
+    @staticmethod
+    def _encode_cursor(values: List[Any]) -> str:
+        payload = json.dumps(values, default=str).encode()
+        return base64.urlsafe_b64encode(payload).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> List[Any]:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except Exception:
+            raise ValueError("Invalid pagination cursor")
+        if not isinstance(values, list):
+            raise ValueError("Invalid pagination cursor")
+        return values
+
+    @staticmethod
+    def _coerce(value: Any, sql_type: Any) -> Any:
+        """Restore a cursor value to the column's Python type (JSON keeps only primitives)"""
+        if value is None:
+            return None
+        try:
+            python_type = sql_type.python_type
+        except NotImplementedError:
+            return value
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is date:
+            return date.fromisoformat(value)
+        if python_type in (int, float, Decimal, uuid.UUID):
+            return python_type(value)
+        return value
+
     async def _get_engine(self, config: Any):
-        """Helper to get or establish a connection engine"""
-        engine = self.conn_manager.get_engine(config.database_name)
-        if not engine:
-            await self.conn_manager.connect(config)
-            engine = self.conn_manager.get_engine(config.database_name)
-        return engine
+        """Helper to get the pooled async engine for a connection"""
+        return await self.conn_manager.get_async_engine(config)
 
 database_explorer = None # Initialized in main or dependency injection
@@ -2,7 +2,7 @@
 Database schema analyzer for reverse engineering entities
 """
 import logging
-from typing import List, Dict
+from typing import Any, List, Dict, Tuple
 
 from dto.v1.schemas.enums import DatabaseType
 from dto.v1.schemas.generation import EntityDefinition, EntityField, ValidationRule, DatabaseConfig
@@ -15,6 +15,8 @@ class SchemaAnalyzer:
     
     def __init__(self, connection_manager: DatabaseConnectionManager):
         self.conn_manager = connection_manager
+        # engine URL -> (schema fingerprint, entities)
+        self._schema_cache: Dict[str, Tuple[str, List[EntityDefinition]]] = {}
         
     async def analyze(self, config: DatabaseConfig) -> List[EntityDefinition]:
         """Analyze database and return entity definitions"""
@@ -28,103 +30,109 @@ class SchemaAnalyzer:
     async def _analyze_sql(self, config: DatabaseConfig) -> List[EntityDefinition]:
         """Analyze SQL database schema with relationships and indexes"""
         try:
-            from sqlalchemy import inspect
+            engine = await self.conn_manager.get_async_engine(config)
+            return await self._analyze_engine(engine)
             
-            engine = self.conn_manager.get_engine(config.database_name or "default")
-            if not engine:
-                if not await self.conn_manager.connect(config):
-                    raise ConnectionError("Could not connect to database")
-                engine = self.conn_manager.get_engine(config.database_name or "default")
-                
-            inspector = inspect(engine)
-            entities = []
-            relationships_map = {}  # Track relationships for later processing
+        except ImportError:
+            logger.error("SQLAlchemy not installed")
+            return []
+        except Exception as e:
+            logger.error(f"Schema analysis failed: {e}")
+            raise
+
+    async def _analyze_engine(self, engine) -> List[EntityDefinition]:
+        """Reflect the schema in bulk, reusing cached entities while the schema fingerprint is unchanged"""
+        from services.database.catalog import CatalogReader
+        
+        cache_key = engine.url.render_as_string(hide_password=True)
+        reader = CatalogReader()
+        # The catalog reader is sync; run_sync drives it over the pooled async connection
+        async with engine.connect() as conn:
+            fingerprint = await conn.run_sync(reader.fingerprint)
+            cached = self._schema_cache.get(cache_key)
+            if fingerprint and cached and cached[0] == fingerprint:
+                logger.info(f"Schema unchanged (fingerprint {fingerprint[:12]}), using cached analysis")
+                return [entity.model_copy(deep=True) for entity in cached[1]]
+            snapshot = await conn.run_sync(reader.read)
+        
+        logger.info(f"Reflected {len(snapshot)} tables with {reader.queries_issued} catalog queries")
+        entities = self._build_entities(snapshot)
+        if fingerprint:
+            self._schema_cache[cache_key] = (fingerprint, [entity.model_copy(deep=True) for entity in entities])
+        return entities
+
+    def _build_entities(self, snapshot: Dict[str, Dict[str, Any]]) -> List[EntityDefinition]:
+        """Turn a catalog snapshot into entity definitions"""
+        entities = []
+        relationships_map = {}  # Track relationships for later processing
+        
+        for table_name, table in snapshot.items():
+            fields = []
+            primary_keys = table['pk']
             
-            for table_name in inspector.get_table_names():
-                fields = []
-                columns = inspector.get_columns(table_name)
-                pk_constraint = inspector.get_pk_constraint(table_name)
-                primary_keys = pk_constraint.get('constrained_columns', [])
+            # Get foreign keys
+            fk_map = {}
+            table_relationships = []
+            for fk in table['fks']:
+                for i, col in enumerate(fk['constrained_columns']):
+                    fk_map[col] = f"{fk['referred_table']}.{fk['referred_columns'][i]}"
+                    # Track relationship
+                    table_relationships.append({
+                        "type": "ManyToOne",
+                        "target_entity": self._table_to_class_name(fk['referred_table']),
+                        "foreign_key": col
+                    })
+            
+            # Get indexes for performance insights
+            unique_columns = set()
+            for idx in table['indexes']:
+                if idx.get('unique'):
+                    unique_columns.update(idx['column_names'])
+            
+            for col in table['columns']:
+                # Map SQL types to our generic types
+                generic_type = self._map_sql_type(col['type'])
                 
-                # Get foreign keys
-                fks = inspector.get_foreign_keys(table_name)
-                fk_map = {}
-                table_relationships = []
-                for fk in fks:
-                    for i, col in enumerate(fk['constrained_columns']):
-                        fk_map[col] = f"{fk['referred_table']}.{fk['referred_columns'][i]}"
-                        # Track relationship
-                        table_relationships.append({
-                            "type": "ManyToOne",
-                            "target_entity": self._table_to_class_name(fk['referred_table']),
-                            "foreign_key": col
-                        })
+                is_pk = col['name'] in primary_keys
+                is_unique = col['name'] in unique_columns
+                length = col.get('length')
                 
-                # Get indexes for performance insights
-                indexes = inspector.get_indexes(table_name)
-                unique_columns = set()
-                for idx in indexes:
-                    if idx.get('unique'):
-                        unique_columns.update(idx['column_names'])
+                field = EntityField(
+                    name=col['name'],
+                    type=generic_type,
+                    length=length,
+                    nullable=col['nullable'],
+                    unique=is_unique,
+                    primary_key=is_pk,
+                    auto_increment=bool(col.get('autoincrement', False)) if is_pk else False,
+                    foreign_key=fk_map.get(col['name']),
+                    default_value=col.get('default'),
+                    description=col.get('comment')
+                )
                 
-                for col in columns:
-                    field_type = str(col['type'])
-                    
-                    # Map SQLAlchemy types to our generic types
-                    generic_type = self._map_sql_type(field_type)
-                    
-                    is_pk = col['name'] in primary_keys
-                    is_fk = col['name'] in fk_map
-                    is_unique = col['name'] in unique_columns
-                    
-                    # Extract length from type if available
-                    length = None
-                    if hasattr(col['type'], 'length'):
-                        length = col['type'].length
+                # Add enhanced validations
+                if not col['nullable'] and not is_pk:
+                    field.validations.append(ValidationRule(type="required", message=f"{col['name']} is required"))
+                if length and generic_type == 'string':
+                    field.validations.append(ValidationRule(type="max", value=length, message=f"{col['name']} must be at most {length} characters"))
+                if is_unique:
+                    field.validations.append(ValidationRule(type="unique", message=f"{col['name']} must be unique"))
                     
-                    field = EntityField(
-                        name=col['name'],
-                        type=generic_type,
-                        length=length,
-                        nullable=col['nullable'],
-                        unique=is_unique,
-                        primary_key=is_pk,
-                        auto_increment=col.get('autoincrement', False) if is_pk else False,
-                        foreign_key=fk_map.get(col['name']),
-                        default_value=col.get('default'),
-                        description=col.get('comment')
-                    )
-                    
-                    # Add enhanced validations
-                    if not col['nullable'] and not is_pk:
-                        field.validations.append(ValidationRule(type="required", message=f"{col['name']} is required"))
-                    if length and generic_type == 'string':
-                        field.validations.append(ValidationRule(type="max", value=length, message=f"{col['name']} must be at most {length} characters"))
-                    if is_unique:
-                        field.validations.append(ValidationRule(type="unique", message=f"{col['name']} must be unique"))
-                        
-                    fields.append(field)
-                    
-                entity = EntityDefinition(
-                    name=self._table_to_class_name(table_name),
-                    table_name=table_name,
-                    fields=fields,
-                    relationships=table_relationships
-                )
-                entities.append(entity)
-                relationships_map[table_name] = table_relationships
+                fields.append(field)
                 
-            # Detect OneToMany relationships (inverse of ManyToOne)
-            self._detect_inverse_relationships(entities, relationships_map)
+            entity = EntityDefinition(
+                name=self._table_to_class_name(table_name),
+                table_name=table_name,
+                fields=fields,
+                relationships=table_relationships
+            )
+            entities.append(entity)
+            relationships_map[table_name] = table_relationships
             
-            return entities
-            
-        except ImportError:
-            logger.error("SQLAlchemy not installed")
-            return []
-        except Exception as e:
-            logger.error(f"Schema analysis failed: {e}")
-            raise
+        # Detect OneToMany relationships (inverse of ManyToOne)
+        self._detect_inverse_relationships(entities, relationships_map)
+        
+        return entities
 
     def _map_sql_type(self, sql_type: str) -> str:
         """Map SQL type to generic type"""
@@ -179,21 +187,16 @@ class SchemaAnalyzer:
             return []
         
         try:
-            client = self.conn_manager.get_client("mongo")
-            if not client:
-                if not await self.conn_manager.connect(config):
-                    raise ConnectionError("Could not connect to MongoDB")
-                client = self.conn_manager.get_client("mongo")
-            
+            client = await self.conn_manager.get_mongo_client(config)
             db = client[config.database_name]
             entities = []
             
             # Analyze each collection
-            for collection_name in db.list_collection_names():
+            for collection_name in await db.list_collection_names():
                 collection = db[collection_name]
                 
                 # Sample documents to infer schema
-                sample_docs = list(collection.find().limit(100))
+                sample_docs = await collection.find().limit(100).to_list(length=100)
                 if not sample_docs:
                     continue
                 
@@ -1,4 +1,5 @@
 from .credential_manager import GitCredentialManager
 from .repository_manager import RepositoryManager
+from .change_set import ChangeSetTracker, get_change_tracker
 
-__all__ = ["GitCredentialManager", "RepositoryManager"]
+__all__ = ["GitCredentialManager", "RepositoryManager", "ChangeSetTracker", "get_change_tracker"]
@@ -0,0 +1,57 @@
+"""
+Change-set tracker
+Editing services record the files they touch so Git staging can be scoped to
+those paths instead of rescanning the whole working tree.
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, Optional, Set, Union
+
+PathLike = Union[str, Path]
+
+
+class ChangeSetTracker:
+    """Process-wide set of absolute paths written, renamed or deleted since the last commit"""
+
+    def __init__(self):
+        self._paths: Set[str] = set()
+        # Editors write from worker threads as well as the event loop
+        self._lock = threading.Lock()
+
+    def record(self, *paths: PathLike):
+        """Record changed files or directories (absolute, or relative to the CWD)"""
+        with self._lock:
+            self._paths.update(os.path.abspath(str(path)) for path in paths)
+
+    def take(self, repo_path: PathLike) -> Set[str]:
+        """Remove and return the recorded paths inside ``repo_path``, relative to it"""
+        root = os.path.abspath(str(repo_path))
+        prefix = root.rstrip(os.sep) + os.sep
+        with self._lock:
+            inside = {path for path in self._paths if path.startswith(prefix)}
+            self._paths -= inside
+        return {os.path.relpath(path, root) for path in inside}
+
+    def restore(self, repo_path: PathLike, relative_paths: Iterable[str]):
+        """Put paths back (e.g. after a failed commit) so the next push picks them up"""
+        root = os.path.abspath(str(repo_path))
+        self.record(*(os.path.join(root, path) for path in relative_paths))
+
+    def pending(self, repo_path: Optional[PathLike] = None) -> int:
+        with self._lock:
+            if repo_path is None:
+                return len(self._paths)
+            prefix = os.path.abspath(str(repo_path)).rstrip(os.sep) + os.sep
+            return sum(1 for path in self._paths if path.startswith(prefix))
+
+
+_tracker: Optional[ChangeSetTracker] = None
+
+
+def get_change_tracker() -> ChangeSetTracker:
+    """Shared tracker used by the editing services and GitSyncService"""
+    global _tracker
+    if _tracker is None:
+        _tracker = ChangeSetTracker()
+    return _tracker
@@ -1,17 +1,27 @@
 """
 Git Sync Service
 Handles Git operations for project management with non-blocking async execution.
+Clones can be shallow (--depth), partial (--filter=blob:none) and/or borrow
+objects from a local bare mirror per upstream (--reference), which later syncs
+refresh incrementally.
 """
+import asyncio
+import hashlib
 import logging
 import os
+import re
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Set
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from core.utils.subprocess import run_command_async
+from services.git.change_set import get_change_tracker
 
 logger = logging.getLogger(__name__)
 
+# Paths per `git add` / `git rm` invocation (keeps argv well under ARG_MAX)
+STAGE_BATCH = 500
+
 
 class GitSyncService:
     """Handles Git clone, pull, push operations asynchronously"""
@@ -20,6 +30,19 @@ class GitSyncService:
         # Load Git user configuration from environment
         self.git_user_name = os.getenv("GIT_USER_NAME", "AI Orchestrator")
         self.git_user_email = os.getenv("GIT_USER_EMAIL", "ai-orchestrator@example.com")
+        
+        # Clone strategy defaults (overridable per call)
+        self.clone_depth = int(os.getenv("GIT_CLONE_DEPTH", "0")) or None
+        self.clone_filter = os.getenv("GIT_CLONE_FILTER", "") or None
+        mirror_root = os.getenv("GIT_MIRROR_CACHE", "storage/git_mirrors")
+        self.mirror_root = Path(mirror_root) if mirror_root else None
+        self._mirror_locks: Dict[str, asyncio.Lock] = {}
+        
+        # Push pipeline: per-repo serialization and commit batching windows
+        self.commit_window = float(os.getenv("GIT_COMMIT_WINDOW_SECONDS", "0"))
+        self._repo_locks: Dict[str, asyncio.Lock] = {}
+        self._pending_batches: Dict[tuple, Dict[str, Any]] = {}
+        self._fast_index_repos: Set[str] = set()
     
     async def _configure_git_user(self, local_path: str):
         """Configure Git user for a repository asynchronously"""
@@ -36,33 +59,112 @@ class GitSyncService:
         except Exception as e:
             logger.warning(f"Failed to configure Git user: {e}")
     
+    @staticmethod
+    def _authenticated_url(repo_url: str, credentials: Optional[Dict[str, str]] = None) -> str:
+        url = repo_url
+        if credentials and credentials.get("token"):
+            if "https://" in url:
+                url = url.replace("https://", f"https://{credentials['token']}@")
+        return url
+
+    def _mirror_path(self, repo_url: str) -> Path:
+        """One bare mirror per upstream, named by the credential-free URL"""
+        clean = re.sub(r"^(https?://)[^@/]+@", r"\1", repo_url).rstrip("/")
+        if clean.endswith(".git"):
+            clean = clean[:-4]
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", clean.rsplit("/", 1)[-1])[:40]
+        return self.mirror_root / f"{name}-{hashlib.sha256(clean.encode()).hexdigest()[:16]}.git"
+
+    async def _refresh_mirror(self, repo_url: str, credentials: Optional[Dict[str, str]] = None) -> Optional[Path]:
+        """Create or incrementally fetch the bare mirror of an upstream; None if unavailable"""
+        mirror = self._mirror_path(repo_url)
+        lock = self._mirror_locks.setdefault(str(mirror), asyncio.Lock())
+        url = self._authenticated_url(repo_url, credentials)
+        
+        async with lock:
+            if not (mirror / "HEAD").exists():
+                mirror.parent.mkdir(parents=True, exist_ok=True)
+                logger.info(f"Creating mirror cache for {repo_url} at {mirror}")
+                code, _, stderr = await run_command_async(
+                    ["git", "clone", "--mirror", url, str(mirror)],
+                    timeout=1800
+                )
+                if code != 0:
+                    logger.warning(f"Mirror clone failed, falling back to a direct clone: {stderr}")
+                    return None
+                # Clones borrow objects from the mirror: keep the token out of its config
+                # and never let gc prune objects a borrower may still reference
+                await run_command_async(["git", "-C", str(mirror), "remote", "set-url", "origin", repo_url], timeout=10)
+                await run_command_async(["git", "-C", str(mirror), "config", "gc.pruneExpire", "never"], timeout=10)
+                await run_command_async(["git", "-C", str(mirror), "config", "gc.auto", "0"], timeout=10)
+            else:
+                code, _, stderr = await run_command_async(
+                    ["git", "-C", str(mirror), "fetch", "--prune", url, "+refs/*:refs/*"],
+                    timeout=600
+                )
+                if code != 0:
+                    # A stale mirror is still a valid reference; the clone/pull fetches the rest
+                    logger.warning(f"Mirror refresh failed for {repo_url}: {stderr}")
+        return mirror
+
+    def _mirror_for(self, local_path: str) -> Optional[Path]:
+        """The mirror a working clone borrows objects from, if any"""
+        alternates = Path(local_path) / ".git" / "objects" / "info" / "alternates"
+        if not alternates.exists() or not self.mirror_root:
+            return None
+        for line in alternates.read_text().splitlines():
+            objects_dir = Path(line.strip())
+            if objects_dir.name == "objects" and objects_dir.parent.parent.resolve() == self.mirror_root.resolve():
+                return objects_dir.parent
+        return None
+
     async def clone_repository(
         self,
         repo_url: str,
         local_path: str,
         branch: str = "main",
-        credentials: Optional[Dict[str, str]] = None
+        credentials: Optional[Dict[str, str]] = None,
+        depth: Optional[int] = None,
+        filter: Optional[str] = None,
+        use_mirror: Optional[bool] = None
     ) -> Dict[str, Any]:
-        """Clone a Git repository asynchronously"""
+        """
+        Clone a Git repository asynchronously.
+        ``depth`` makes a shallow clone, ``filter`` a partial clone (e.g. "blob:none"),
+        and ``use_mirror`` borrows objects from the local mirror of the upstream. When
+        not given, they default to GIT_CLONE_DEPTH / GIT_CLONE_FILTER and to using the
+        mirror for full-history clones.
+        """
         try:
             local_path_obj = Path(local_path)
             local_path_obj.mkdir(parents=True, exist_ok=True)
             
+            depth = depth if depth is not None else self.clone_depth
+            filter = filter if filter is not None else self.clone_filter
+            if use_mirror is None:
+                use_mirror = self.mirror_root is not None and not depth
+            
             # Use credentials if provided
-            url = repo_url
-            if credentials and credentials.get("token"):
-                if "https://" in url:
-                    url = url.replace("https://", f"https://{credentials['token']}@")
+            url = self._authenticated_url(repo_url, credentials)
             
             # Clone command
             cmd = [
                 "git", "clone",
-                "--branch", branch,
-                url,
-                str(local_path)
+                "--branch", branch
             ]
-            
-            logger.info(f"Cloning repository from {repo_url} to {local_path}")
+            if depth:
+                cmd += ["--depth", str(depth)]
+            if filter:
+                cmd += [f"--filter={filter}"]
+            mirror = await self._refresh_mirror(repo_url, credentials) if use_mirror and self.mirror_root else None
+            if mirror:
+                cmd += ["--reference-if-able", str(mirror)]
+            cmd += [url, str(local_path)]
+            
+            logger.info(
+                f"Cloning repository from {repo_url} to {local_path}"
+                f" (depth={depth or 'full'}, filter={filter or 'none'}, mirror={'yes' if mirror else 'no'})"
+            )
             
             code, stdout, stderr = await run_command_async(
                 cmd,
@@ -83,8 +185,8 @@ class GitSyncService:
             # Get commit hash
             commit_hash = await self._get_current_commit(local_path)
             
-            # Count files
-            files_count = sum(1 for _ in Path(local_path).rglob('*') if _.is_file())
+            # Count tracked files from the index instead of walking the tree
+            files_count = await self._count_tracked_files(local_path)
             
             logger.info(f"Successfully cloned repository. Commit: {commit_hash}, Files: {files_count}")
             
@@ -93,7 +195,10 @@ class GitSyncService:
                 "local_path": local_path,
                 "commit_hash": commit_hash,
                 "files_count": files_count,
-                "branch": branch
+                "branch": branch,
+                "shallow": bool(depth),
+                "partial": bool(filter),
+                "mirror": str(mirror) if mirror else None
             }
             
         except Exception as e:
@@ -104,9 +209,31 @@ class GitSyncService:
                 "message": "Failed to clone repository"
             }
     
+    async def _refresh_borrowed_mirror(self, local_path: str):
+        """Bring the mirror a clone borrows from up to date before fetching into the clone"""
+        if not self._mirror_for(local_path):
+            return
+        code, remote_url, _ = await run_command_async(
+            ["git", "-C", local_path, "remote", "get-url", "origin"], timeout=10
+        )
+        if code == 0 and remote_url.strip():
+            await self._refresh_mirror(remote_url.strip())
+    
+    async def _count_tracked_files(self, local_path: str) -> int:
+        code, stdout, _ = await run_command_async(["git", "-C", local_path, "ls-files", "-z"], timeout=60)
+        if code != 0:
+            return 0
+        return len([name for name in stdout.split("\0") if name])
+    
     async def pull_latest(self, local_path: str) -> Dict[str, Any]:
-        """Pull latest changes asynchronously"""
+        """
+        Pull latest changes asynchronously. Clones backed by a mirror refresh it
+        first, so the pull itself only transfers what the mirror does not have;
+        shallow and partial clones keep their depth and filter.
+        """
         try:
+            await self._refresh_borrowed_mirror(local_path)
+            
             code, stdout, stderr = await run_command_async(
                 ["git", "-C", local_path, "pull"],
                 timeout=60
@@ -137,40 +264,112 @@ class GitSyncService:
         self,
         local_path: str,
         branch: str = "main",
-        commit_message: str = "Update from AI Orchestrator"
+        commit_message: str = "Update from AI Orchestrator",
+        paths: Optional[List[str]] = None,
+        batch_window: Optional[float] = None
     ) -> Dict[str, Any]:
-        """Add, commit, and push changes asynchronously"""
+        """
+        Stage, commit, and push changes asynchronously.
+        Only the change set is staged: ``paths`` plus whatever the editing services
+        recorded for this repository (expanded by a ``git status`` limited to those
+        paths), falling back to a full ``git status`` when nothing is known. With a
+        ``batch_window`` (seconds, default GIT_COMMIT_WINDOW_SECONDS), pushes arriving
+        within the window share one commit and one push.
+        """
+        window = batch_window if batch_window is not None else self.commit_window
+        if not window:
+            return await self._commit_and_push(local_path, branch, [commit_message], set(paths or []))
+        
+        key = (os.path.abspath(local_path), branch)
+        batch = self._pending_batches.get(key)
+        if batch is None:
+            batch = {"messages": [], "paths": set(), "future": asyncio.get_running_loop().create_future()}
+            self._pending_batches[key] = batch
+            asyncio.create_task(self._flush_batch(key, local_path, branch, window))
+        batch["messages"].append(commit_message)
+        batch["paths"].update(paths or [])
+        # shield: one waiter being cancelled must not cancel the shared result
+        return await asyncio.shield(batch["future"])
+    
+    async def _flush_batch(self, key, local_path: str, branch: str, window: float):
+        await asyncio.sleep(window)
+        batch = self._pending_batches.pop(key)
         try:
-            # Add
-            await run_command_async(["git", "-C", local_path, "add", "."], timeout=30)
-            
-            # Check status
-            code, stdout, stderr = await run_command_async(["git", "-C", local_path, "status", "--porcelain"], timeout=10)
-            
-            if code != 0:
-                logger.error(f"Git status failed: {stderr}")
-                return {
-                    "success": False,
-                    "error": stderr,
-                    "message": "Failed to get git status"
-                }
-
-            if not stdout.strip():
-                return {"success": True, "message": "No changes to commit", "committed": False}
-            
-            # Commit
-            commit_code, _, commit_stderr = await run_command_async(["git", "-C", local_path, "commit", "-m", commit_message], timeout=30)
-            if commit_code != 0:
-                logger.error(f"Git commit failed: {commit_stderr}")
+            result = await self._commit_and_push(local_path, branch, batch["messages"], batch["paths"])
+        except Exception as e:
+            result = {"success": False, "error": str(e), "message": "Failed to push changes"}
+        batch["future"].set_result({**result, "batched_updates": len(batch["messages"])})
+    
+    async def _commit_and_push(
+        self,
+        local_path: str,
+        branch: str,
+        messages: List[str],
+        paths: Set[str]
+    ) -> Dict[str, Any]:
+        """Scoped stage -> commit (from the index tree) -> push, serialized per repository"""
+        lock = self._repo_locks.setdefault(os.path.abspath(local_path), asyncio.Lock())
+        async with lock:
+            tracker = get_change_tracker()
+            recorded = set(paths) | tracker.take(local_path)
+            change_set = set(recorded)
+            try:
+                await self._enable_fast_index(local_path)
+                
+                # Stage: status over the recorded paths picks up files inside recorded
+                # directories and both sides of renames; only an empty change set
+                # needs a scan of the whole working tree
+                code, status_paths, stderr = await self._status_paths(local_path, sorted(change_set))
+                if code != 0:
+                    logger.error(f"Git status failed: {stderr}")
+                    if not change_set:
+                        return {
+                            "success": False,
+                            "error": stderr,
+                            "message": "Failed to get git status"
+                        }
+                else:
+                    change_set |= status_paths
+                code, stderr = await self._stage_paths(local_path, sorted(change_set))
+                if code != 0:
+                    raise RuntimeError(f"Failed to stage changes: {stderr}")
+                
+                # Commit straight from the index tree: unlike `git commit`, this does not
+                # refresh stat data for every tracked file
+                code, tree, stderr = await run_command_async(["git", "-C", local_path, "write-tree"], timeout=30)
+                if code != 0:
+                    raise RuntimeError(stderr)
+                # Fails on an unborn HEAD; update-ref then insists HEAD still does not exist
+                head_code, head, _ = await run_command_async(
+                    ["git", "-C", local_path, "log", "-1", "--format=%H %T", "HEAD"], timeout=10
+                )
+                parent, head_tree = head.split() if head_code == 0 else (None, None)
+                if head_tree == tree.strip():
+                    return {"success": True, "message": "No changes to commit", "committed": False}
+                
+                commit_code, commit_hash, commit_stderr = await self._commit_tree(
+                    local_path, tree.strip(), self._batch_message(messages), parent
+                )
+                if commit_code != 0:
+                    logger.error(f"Git commit failed: {commit_stderr}")
+                    tracker.restore(local_path, recorded)
+                    return {
+                        "success": False,
+                        "error": commit_stderr,
+                        "message": "Failed to commit changes"
+                    }
+            except Exception as e:
+                tracker.restore(local_path, recorded)
+                logger.error(f"Git push error: {e}")
                 return {
                     "success": False,
-                    "error": commit_stderr,
-                    "message": "Failed to commit changes"
+                    "error": str(e),
+                    "message": "Failed to push changes"
                 }
             
             # Push to remote
             push_code, push_stdout, push_stderr = await run_command_async(
-                ["git", "-C", local_path, "push", "origin", branch],
+                ["git", "-C", local_path, "push", "origin", f"HEAD:{branch}"],
                 timeout=120
             )
             
@@ -179,29 +378,122 @@ class GitSyncService:
                 return {
                     "success": False,
                     "error": push_stderr,
-                    "message": "Failed to push to remote"
+                    "message": "Failed to push to remote",
+                    "committed": True,
+                    "commit_hash": commit_hash
                 }
             
-            # Get new commit hash
-            commit_hash = await self._get_current_commit(local_path)
-            
-            logger.info(f"Successfully pushed changes to {branch}")
+            logger.info(f"Successfully pushed {len(change_set)} changed path(s) to {branch}")
             
             return {
                 "success": True,
                 "message": "Changes pushed successfully",
                 "committed": True,
                 "commit_hash": commit_hash,
-                "branch": branch
-            }
-            
-        except Exception as e:
-            logger.error(f"Git push error: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "message": "Failed to push changes"
+                "branch": branch,
+                "paths_staged": len(change_set)
             }
+    
+    async def _enable_fast_index(self, local_path: str):
+        """Once per repository: index v4 plus the untracked cache keep index refreshes cheap on big trees"""
+        key = os.path.abspath(local_path)
+        if key in self._fast_index_repos:
+            return
+        await run_command_async(["git", "-C", local_path, "config", "feature.manyFiles", "true"], timeout=10)
+        await run_command_async(["git", "-C", local_path, "config", "core.untrackedCache", "true"], timeout=10)
+        self._fast_index_repos.add(key)
+    
+    async def _status_paths(self, local_path: str, pathspec: Optional[List[str]] = None):
+        """
+        Working-tree change set from `git status --porcelain=v2 -z` (renames contribute
+        both paths), limited to ``pathspec`` when given. v2 entries start with a type
+        tag, so output stripping is harmless.
+        """
+        if not pathspec:
+            return await self._status_chunk(local_path, [])
+        paths: Set[str] = set()
+        for i in range(0, len(pathspec), STAGE_BATCH):
+            code, chunk_paths, stderr = await self._status_chunk(local_path, pathspec[i:i + STAGE_BATCH])
+            if code != 0:
+                return code, paths, stderr
+            paths |= chunk_paths
+        return 0, paths, ""
+    
+    async def _status_chunk(self, local_path: str, pathspec: List[str]):
+        cmd = ["git", "--literal-pathspecs", "-C", local_path, "status", "--porcelain=v2", "-z", "--untracked-files=all"]
+        code, stdout, stderr = await run_command_async(cmd + (["--", *pathspec] if pathspec else []), timeout=60)
+        paths: Set[str] = set()
+        if code != 0:
+            return code, paths, stderr
+        # Number of space-separated fields before the path, per entry type
+        fields_before_path = {"1": 8, "2": 9, "u": 10, "?": 1}
+        entries = iter(stdout.split("\0"))
+        for entry in entries:
+            count = fields_before_path.get(entry[:1])
+            if count is None:
+                continue
+            parts = entry.split(" ", count)
+            if len(parts) > count:
+                paths.add(parts[count])
+            if entry[0] == "2":
+                paths.add(next(entries, ""))
+        paths.discard("")
+        return code, paths, stderr
+    
+    async def _stage_paths(self, local_path: str, paths: List[str]):
+        """Stage exactly ``paths``: add what exists (minus ignored files), drop what was deleted"""
+        root = Path(local_path)
+        existing = [p for p in paths if (root / p).exists() or (root / p).is_symlink()]
+        missing = [p for p in paths if p not in set(existing)]
+        
+        for i in range(0, len(existing), STAGE_BATCH):
+            chunk = existing[i:i + STAGE_BATCH]
+            # check-ignore exits 1 when nothing is ignored
+            code, ignored, _ = await run_command_async(["git", "-C", local_path, "check-ignore", "--", *chunk], timeout=30)
+            ignored_set = set(ignored.splitlines()) if code == 0 else set()
+            chunk = [p for p in chunk if p not in ignored_set]
+            if chunk:
+                code, _, stderr = await run_command_async(["git", "-C", local_path, "add", "-A", "--", *chunk], timeout=60)
+                if code != 0:
+                    return code, stderr
+        
+        for i in range(0, len(missing), STAGE_BATCH):
+            code, _, stderr = await run_command_async(
+                ["git", "-C", local_path, "rm", "-r", "-q", "--cached", "--ignore-unmatch", "--", *missing[i:i + STAGE_BATCH]],
+                timeout=60
+            )
+            if code != 0:
+                return code, stderr
+        return 0, ""
+    
+    async def _commit_tree(self, local_path: str, tree: str, message: str, parent: Optional[str]):
+        """
+        commit-tree + update-ref; returns (code, commit_hash, stderr). HEAD only moves
+        if it still points at ``parent`` (or is still unborn), so a commit made by
+        something else in the meantime fails this one instead of being overwritten.
+        """
+        cmd = ["git", "-C", local_path, "commit-tree", tree, "-m", message]
+        if parent:
+            cmd += ["-p", parent]
+        code, commit_hash, stderr = await run_command_async(cmd, timeout=30)
+        if code != 0:
+            return code, "", stderr
+        commit_hash = commit_hash.strip()
+        # An empty old value means "must not exist yet"
+        code, _, stderr = await run_command_async(
+            ["git", "-C", local_path, "update-ref", "-m", f"commit: {message.splitlines()[0]}", "HEAD", commit_hash, parent or ""],
+            timeout=10
+        )
+        if code != 0:
+            stderr = f"HEAD moved while committing, nothing was committed: {stderr}"
+        return code, commit_hash, stderr
+    
+    @staticmethod
+    def _batch_message(messages: List[str]) -> str:
+        unique = list(dict.fromkeys(m for m in messages if m))
+        if len(unique) <= 1:
+            return unique[0] if unique else "Update from AI Orchestrator"
+        return f"Batch of {len(messages)} updates\n\n" + "\n".join(f"- {m}" for m in unique)
 
     async def list_branches(self, local_path: str) -> Dict[str, Any]:
         """List all branches asynchronously and return parsed data"""
@@ -348,6 +640,7 @@ class GitSyncService:
     async def fetch_remote(self, local_path: str) -> Dict[str, Any]:
         """Fetch from remote asynchronously"""
         try:
+            await self._refresh_borrowed_mirror(local_path)
             code, stdout, stderr = await run_command_async(["git", "-C", local_path, "fetch", "origin"], timeout=60)
             return {"success": code == 0, "message": "Fetched successfully" if code == 0 else "Fetch failed", "error": stderr if code != 0 else None}
         except Exception as e:
@@ -0,0 +1,301 @@
+"""
+Diagnostics Engine - Incremental, local-first diagnostics for the browser IDE
+Runs instant local checks on every edit and limits LLM review to changed regions
+"""
+
+import ast
+import difflib
+import hashlib
+import logging
+import time
+import warnings
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pyflakes import api as pyflakes_api
+    PYFLAKES_AVAILABLE = True
+except ImportError:
+    PYFLAKES_AVAILABLE = False
+
+
+# Region of the current document as 1-indexed, inclusive (start_line, end_line)
+Region = Tuple[int, int]
+
+
+@dataclass
+class DocumentState:
+    """Per-document analysis state"""
+    local_hash: Optional[str] = None
+    local_diagnostics: List[Dict[str, Any]] = field(default_factory=list)
+    # Lines of the version last reviewed by the LLM and the findings for it
+    analyzed_lines: List[str] = field(default_factory=list)
+    ai_diagnostics: List[Dict[str, Any]] = field(default_factory=list)
+    last_llm_call: float = 0.0
+    llm_in_flight: bool = False
+
+
+class _CollectingReporter:
+    """Minimal pyflakes reporter that collects messages as diagnostics"""
+
+    def __init__(self):
+        self.diagnostics: List[Dict[str, Any]] = []
+
+    def unexpectedError(self, filename, msg):
+        self.diagnostics.append(_diagnostic(str(msg), "Error", 1, 0, 0, "pyflakes"))
+
+    def syntaxError(self, filename, msg, lineno, offset, text):
+        # Syntax errors are reported by the ast stage already
+        pass
+
+    def flake(self, message):
+        col = getattr(message, "col", 0) or 0
+        text = message.message % message.message_args
+        self.diagnostics.append(
+            _diagnostic(text, "Warning", message.lineno, col, col + 1, "pyflakes")
+        )
+
+
+def _diagnostic(
+    message: str,
+    severity: str,
+    line: int,
+    start: int,
+    end: int,
+    source: str
+) -> Dict[str, Any]:
+    return {
+        "message": message,
+        "severity": severity,
+        "line": line,
+        "start": start,
+        "end": end,
+        "source": source
+    }
+
+
+class DiagnosticsEngine:
+    """
+    Two-stage diagnostics engine
+
+    Stage 1 (local) runs on every request: syntax errors via ``ast`` and
+    pyflakes-style checks, cached by content hash.
+    Stage 2 (LLM) is optional and rate-limited per document. Only regions that
+    changed since the last reviewed version are sent to the model; findings for
+    unchanged regions are carried over with their line numbers remapped.
+    """
+
+    def __init__(
+        self,
+        llm_min_interval: float = 15.0,
+        context_lines: int = 3,
+        max_documents: int = 512
+    ):
+        self.llm_min_interval = llm_min_interval
+        self.context_lines = context_lines
+        self.max_documents = max_documents
+        self._documents: Dict[str, DocumentState] = {}
+
+    def _state(self, document_id: str) -> DocumentState:
+        state = self._documents.pop(document_id, None)
+        if state is None:
+            state = DocumentState()
+            if len(self._documents) >= self.max_documents:
+                # Evict the least recently used document
+                self._documents.pop(next(iter(self._documents)))
+        self._documents[document_id] = state
+        return state
+
+    def forget(self, document_id: str) -> None:
+        """Drop cached state for a document (e.g. on close or delete)"""
+        self._documents.pop(document_id, None)
+
+    # --- Stage 1: local checks ---
+
+    def local_diagnostics(self, document_id: str, code: str, language: str) -> List[Dict[str, Any]]:
+        """Instant local diagnostics, cached while the content is unchanged"""
+        state = self._state(document_id)
+        content_hash = hashlib.sha1(f"{language}\0{code}".encode("utf-8", "replace")).hexdigest()
+        if state.local_hash == content_hash:
+            return list(state.local_diagnostics)
+
+        if language == "python":
+            diagnostics = self._check_python(code, document_id)
+        else:
+            diagnostics = []
+
+        state.local_hash = content_hash
+        state.local_diagnostics = diagnostics
+        return list(diagnostics)
+
+    def _check_python(self, code: str, filename: str) -> List[Dict[str, Any]]:
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                tree = ast.parse(code, filename=filename)
+        except SyntaxError as e:
+            line = e.lineno or 1
+            start = max((e.offset or 1) - 1, 0)
+            end = (e.end_offset - 1) if getattr(e, "end_offset", None) else start + 1
+            return [_diagnostic(e.msg, "Error", line, start, max(end, start + 1), "syntax")]
+
+        diagnostics = [
+            _diagnostic(str(w.message), "Warning", getattr(w, "lineno", 1) or 1, 0, 1, "syntax")
+            for w in caught
+            if issubclass(w.category, SyntaxWarning)
+        ]
+
+        if PYFLAKES_AVAILABLE:
+            reporter = _CollectingReporter()
+            pyflakes_api.check(code, filename, reporter)
+            diagnostics.extend(reporter.diagnostics)
+        else:
+            diagnostics.extend(self._check_unused_imports(tree))
+        return diagnostics
+
+    def _check_unused_imports(self, tree: ast.AST) -> List[Dict[str, Any]]:
+        """Fallback for the most common pyflakes finding when pyflakes is not installed"""
+        imported: Dict[str, ast.AST] = {}
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+                    continue
+                for alias in node.names:
+                    if alias.name == "*":
+                        continue
+                    name = alias.asname or alias.name.split(".")[0]
+                    imported[name] = node
+
+        used = set()
+        exported = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                used.add(node.id)
+            elif isinstance(node, ast.Attribute):
+                root = node
+                while isinstance(root, ast.Attribute):
+                    root = root.value
+                if isinstance(root, ast.Name):
+                    used.add(root.id)
+            elif isinstance(node, ast.Assign):
+                if any(isinstance(t, ast.Name) and t.id == "__all__" for t in node.targets):
+                    if isinstance(node.value, (ast.List, ast.Tuple)):
+                        exported.update(
+                            elt.value for elt in node.value.elts
+                            if isinstance(elt, ast.Constant) and isinstance(elt.value, str)
+                        )
+
+        return [
+            _diagnostic(
+                f"'{name}' imported but unused", "Warning",
+                node.lineno, node.col_offset, node.end_col_offset or node.col_offset + 1,
+                "pyflakes"
+            )
+            for name, node in imported.items()
+            if name not in used and name not in exported
+        ]
+
+    # --- Stage 2: incremental LLM review ---
+
+    def carried_ai_diagnostics(self, document_id: str, lines: List[str]) -> List[Dict[str, Any]]:
+        """LLM findings from the last review that still apply, remapped to the current lines"""
+        state = self._state(document_id)
+        if not state.ai_diagnostics:
+            return []
+        line_map = self._line_map(state.analyzed_lines, lines)
+        carried = []
+        for diag in state.ai_diagnostics:
+            new_line = line_map.get(diag.get("line"))
+            if new_line is not None:
+                carried.append({**diag, "line": new_line})
+        return carried
+
+    def changed_regions(self, document_id: str, lines: List[str]) -> List[Region]:
+        """Regions of the current document that differ from the last reviewed version"""
+        state = self._state(document_id)
+        if not lines:
+            return []
+        if not state.analyzed_lines:
+            return [(1, len(lines))]
+
+        matcher = difflib.SequenceMatcher(None, state.analyzed_lines, lines, autojunk=False)
+        regions: List[Region] = []
+        for tag, _i1, _i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            # Pure deletions have an empty range; review the lines around the cut
+            start = max(j1 + 1 - self.context_lines, 1)
+            end = min(max(j2, j1 + 1) + self.context_lines, len(lines))
+            if regions and start <= regions[-1][1] + 1:
+                regions[-1] = (regions[-1][0], max(regions[-1][1], end))
+            else:
+                regions.append((start, end))
+        return regions
+
+    def llm_allowed(self, document_id: str) -> bool:
+        """Whether the per-document rate limit allows an LLM review now"""
+        state = self._state(document_id)
+        if state.llm_in_flight:
+            return False
+        return time.monotonic() - state.last_llm_call >= self.llm_min_interval
+
+    def begin_llm_review(self, document_id: str) -> None:
+        state = self._state(document_id)
+        state.llm_in_flight = True
+        state.last_llm_call = time.monotonic()
+
+    def end_llm_review(
+        self,
+        document_id: str,
+        lines: Optional[List[str]] = None,
+        regions: Optional[List[Region]] = None,
+        new_diagnostics: Optional[List[Dict[str, Any]]] = None
+    ) -> None:
+        """
+        Finish an LLM review. When ``lines`` is given the review succeeded and
+        becomes the new baseline; otherwise the baseline is kept so the same
+        regions are retried after the rate-limit window.
+        """
+        state = self._state(document_id)
+        state.llm_in_flight = False
+        if lines is None:
+            return
+
+        carried = self.carried_ai_diagnostics(document_id, lines)
+        fresh = []
+        for diag in new_diagnostics or []:
+            try:
+                line = int(diag.get("line", 0))
+            except (TypeError, ValueError):
+                continue
+            if any(start <= line <= end for start, end in regions or []):
+                fresh.append({**diag, "line": line, "source": "ai"})
+
+        # Carried findings inside re-reviewed regions are superseded by fresh ones
+        carried = [
+            d for d in carried
+            if not any(start <= d["line"] <= end for start, end in regions or [])
+        ]
+        state.analyzed_lines = list(lines)
+        state.ai_diagnostics = carried + fresh
+
+    @staticmethod
+    def render_regions(lines: List[str], regions: List[Region]) -> str:
+        """Render regions with absolute line numbers for the review prompt"""
+        blocks = []
+        for start, end in regions:
+            numbered = "\n".join(f"{n}: {lines[n - 1]}" for n in range(start, end + 1))
+            blocks.append(f"--- lines {start}-{end} ---\n{numbered}")
+        return "\n\n".join(blocks)
+
+    @staticmethod
+    def _line_map(old_lines: List[str], new_lines: List[str]) -> Dict[int, int]:
+        """Map 1-indexed old line numbers to new ones for lines in unchanged blocks"""
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        mapping: Dict[int, int] = {}
+        for block in matcher.get_matching_blocks():
+            for offset in range(block.size):
+                mapping[block.a + offset + 1] = block.b + offset + 1
+        return mapping
@@ -37,6 +37,8 @@ class EditorService:
     
     async def delete_file(self, workspace_id: str, file_path: str) -> Dict[str, Any]:
         """Delete file or directory"""
+        if self.intelligence:
+            self.intelligence.diagnostics.forget(f"{workspace_id}:{file_path}")
         return await self.fs.delete_file(workspace_id, file_path)
     
     async def list_files(self, workspace_id: str, directory: str = ".") -> List[Dict[str, Any]]:
@@ -110,9 +112,10 @@ class EditorService:
         self,
         workspace_id: str,
         file_path: str,
-        language: str = None
+        language: str = None,
+        include_ai: bool = True
     ) -> List[Dict[str, Any]]:
-        """Get code diagnostics"""
+        """Get code diagnostics (local checks always, AI review when rate limits allow)"""
         if not self.intelligence:
             return []
             
@@ -120,7 +123,9 @@ class EditorService:
         return await self.intelligence.get_diagnostics(
             code=file_data["content"],
             language=language or file_data["language"],
-            file_path=file_path
+            file_path=file_path,
+            include_ai=include_ai,
+            document_id=f"{workspace_id}:{file_path}"
         )
     
     async def ai_refactor(
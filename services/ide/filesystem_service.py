@@ -14,11 +14,19 @@ import asyncio
 from fastapi import HTTPException
 
 
+def _record_change(*paths):
+    """Tell the Git change-set tracker which files were touched"""
+    # Imported lazily: the services.git package imports core, which imports the IDE services
+    from services.git.change_set import get_change_tracker
+    get_change_tracker().record(*paths)
+
+
 class FileSystemService:
     """Complete file system service for browser IDE"""
     
     def __init__(self, base_path: str = "storage/workspaces"):
-        self.base_path = Path(base_path)
+        # Absolute, so the containment check in _resolve_path compares like with like
+        self.base_path = Path(base_path).resolve()
         self.base_path.mkdir(parents=True, exist_ok=True)
         
         # File size limits
@@ -199,6 +207,7 @@ class FileSystemService:
         # Write file
         async with aiofiles.open(full_path, 'w', encoding='utf-8') as f:
             await f.write(content)
+        _record_change(full_path)
         
         stat = full_path.stat()
         
@@ -231,6 +240,7 @@ class FileSystemService:
         else:
             full_path.unlink()
             message = "File deleted successfully"
+        _record_change(full_path)
         
         return {"message": message, "path": file_path}
     
@@ -293,6 +303,7 @@ class FileSystemService:
         
         # Rename/move
         old_full_path.rename(new_full_path)
+        _record_change(old_full_path, new_full_path)
         
         return {
             "old_path": old_path,
@@ -8,6 +8,8 @@ import logging
 import re
 from typing import List, Dict, Any, Optional
 
+from services.ide.diagnostics import DiagnosticsEngine
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,6 +25,7 @@ class IntelligenceService:
         """
         self.orchestrator = orchestrator
         self.default_model = "qwen2.5-coder:7b"
+        self.diagnostics = DiagnosticsEngine()
     
     async def get_completions(
         self,
@@ -135,37 +138,71 @@ Format: {{"signature": "...", "description": "...", "usage": "..."}}
         self,
         code: str,
         language: str,
-        file_path: str = "main.py"
+        file_path: str = "main.py",
+        include_ai: bool = True,
+        document_id: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Get code diagnostics (errors, warnings, hints)
         
+        Local checks run on every call. The LLM review only sees regions that
+        changed since the last reviewed version and is rate-limited per document;
+        findings for unchanged regions are served from cache.
+        
         Args:
             code: Full file content
             language: Programming language
             file_path: File path
+            include_ai: Whether the LLM stage may run for this call
+            document_id: Key for incremental state (defaults to file_path)
             
         Returns:
             List of diagnostic items
         """
+        doc_id = document_id or file_path
+        diagnostics = self.diagnostics.local_diagnostics(doc_id, code, language)
+        
+        lines = code.splitlines()
+        ai_diagnostics = self.diagnostics.carried_ai_diagnostics(doc_id, lines)
+        
+        # A file that does not parse gets nothing useful from a model review
+        has_syntax_error = any(d.get("source") == "syntax" and d["severity"] == "Error" for d in diagnostics)
+        if include_ai and not has_syntax_error and self.diagnostics.llm_allowed(doc_id):
+            regions = self.diagnostics.changed_regions(doc_id, lines)
+            if regions:
+                ai_diagnostics = await self._review_regions(doc_id, lines, regions, language, file_path)
+        
+        return diagnostics + ai_diagnostics
+
+    async def _review_regions(
+        self,
+        document_id: str,
+        lines: List[str],
+        regions: List[tuple],
+        language: str,
+        file_path: str
+    ) -> List[Dict[str, Any]]:
+        """Run the LLM diagnostics stage over the changed regions only"""
+        snippet = self.diagnostics.render_regions(lines, regions)
         prompt = f"""
-Analyze this {language} code for potential errors, warnings, and improvements:
+Analyze these changed regions of a {language} file for potential errors, warnings, and improvements:
 
 FILE: {file_path}
 
-CODE:
-{code}
+CHANGED REGIONS (each line is prefixed with its line number):
+{snippet}
 
-Find at least 3-5 issues or improvement opportunities.
+Only report issues located inside the regions shown.
 For each issue, specify:
 1. Message describing the issue
 2. Severity (Error, Warning, Information, Hint)
-3. Line number (1-indexed)
+3. Line number (1-indexed, as shown in the prefix)
 4. Character range (start and end)
 
 Respond ONLY with a JSON array of diagnostics.
 Format: {{"diagnostics": [{{"message": "...", "severity": "...", "line": 1, "start": 0, "end": 10}}]}}
 """
+        self.diagnostics.begin_llm_review(document_id)
         try:
             result = await self.orchestrator.run_inference(
                 prompt=prompt,
@@ -175,11 +212,19 @@ Format: {{"diagnostics": [{{"message": "...", "severity": "...", "line": 1, "sta
             
             content = result.get("output", "{}")
             data = self._parse_json_result(content)
-            return data.get("diagnostics", [])
+            found = data.get("diagnostics", [])
+            self.diagnostics.end_llm_review(
+                document_id,
+                lines=lines,
+                regions=regions,
+                new_diagnostics=found if isinstance(found, list) else []
+            )
             
         except Exception as e:
             logger.error(f"Intelligence diagnostics failed: {e}")
-            return []
+            self.diagnostics.end_llm_review(document_id)
+        
+        return self.diagnostics.carried_ai_diagnostics(document_id, lines)
 
     async def ai_refactor(
         self,
@@ -3,9 +3,11 @@ Terminal Service - Integrated terminal for browser IDE
 Provides PTY management and command execution in Docker containers
 """
 import asyncio
+import codecs
+import collections
 import os
 import sys
-from typing import Dict, Any, List, Optional
+from typing import Deque, Dict, Any, List, Optional
 from fastapi import WebSocket
 import logging
 import uuid
@@ -24,8 +26,24 @@ else:
     PTY_AVAILABLE = False
 
 
+# PTY output handling: reads grow from READ_SIZE_MIN up to READ_SIZE_MAX while
+# the shell keeps filling them, and output is coalesced for COALESCE_SECONDS
+# (or until FLUSH_BYTES are buffered) so each websocket frame carries a chunk.
+READ_SIZE_MIN = 4096
+READ_SIZE_MAX = 65536
+FLUSH_BYTES = 65536
+COALESCE_SECONDS = 0.01
+# Stop reading the PTY while this much output waits for a slow client; the
+# kernel buffer then blocks the shell instead of growing memory
+MAX_PENDING_BYTES = 1024 * 1024
+
+
 class TerminalSession:
-    """Represents a terminal session"""
+    """
+    Represents a terminal session.
+    The PTY master is non-blocking and watched by the event loop, so a session
+    costs no thread and no polling; ``read()`` awaits the next coalesced chunk.
+    """
     
     def __init__(self, session_id: str, workspace_id: str):
         self.session_id = session_id
@@ -34,6 +52,18 @@ class TerminalSession:
         self.master_fd: Optional[int] = None
         self.websocket: Optional[WebSocket] = None
         self.running = False
+        
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._read_size = READ_SIZE_MIN
+        self._buffer = bytearray()
+        self._chunks: Deque[bytes] = collections.deque()
+        self._pending = 0
+        self._data_ready = asyncio.Event()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._reading = False
+        self._eof = False
+        self._write_buffer = bytearray()
+        self._writing = False
     
     async def start(self, shell: str = "/bin/bash", cwd: Optional[str] = None):
         """Start terminal session"""
@@ -59,6 +89,9 @@ class TerminalSession:
                 env=os.environ.copy()
             )
             self.running = True
+            self._loop = asyncio.get_running_loop()
+            os.set_blocking(self.master_fd, False)
+            self._resume_reading()
         except Exception as e:
             logger.error(f"Failed to start terminal process: {e}")
             self.running = False
@@ -68,23 +101,107 @@ class TerminalSession:
     
     def _set_terminal_size(self, cols: int, rows: int):
         """Set terminal window size"""
-        if self.master_fd:
+        if self.master_fd is not None:
             size = struct.pack("HHHH", rows, cols, 0, 0)
             fcntl.ioctl(self.master_fd, termios.TIOCSWINSZ, size)
     
-    async def write(self, data: str):
-        """Write data to terminal"""
-        if self.master_fd and self.running:
-            os.write(self.master_fd, data.encode('utf-8'))
+    # --- Output (PTY -> client) ---
+    
+    def _resume_reading(self):
+        if not self._reading and not self._eof and self.master_fd is not None:
+            self._loop.add_reader(self.master_fd, self._on_readable)
+            self._reading = True
+    
+    def _pause_reading(self):
+        if self._reading:
+            self._loop.remove_reader(self.master_fd)
+            self._reading = False
+    
+    def _on_readable(self):
+        """Event loop callback: drain what the PTY has, adapting the read size"""
+        try:
+            data = os.read(self.master_fd, self._read_size)
+        except BlockingIOError:
+            return
+        except OSError:
+            # EIO: the shell exited and the slave side is closed
+            data = b''
+        
+        if not data:
+            self._on_eof()
+            return
+        
+        if len(data) == self._read_size:
+            self._read_size = min(self._read_size * 2, READ_SIZE_MAX)
+        elif len(data) < self._read_size // 4:
+            self._read_size = max(self._read_size // 2, READ_SIZE_MIN)
+        
+        self._buffer += data
+        if len(self._buffer) >= FLUSH_BYTES:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(COALESCE_SECONDS, self._flush)
+    
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._buffer:
+            chunk = bytes(self._buffer)
+            self._buffer.clear()
+            self._chunks.append(chunk)
+            self._pending += len(chunk)
+            self._data_ready.set()
+            if self._pending >= MAX_PENDING_BYTES:
+                self._pause_reading()
+    
+    def _on_eof(self):
+        self._pause_reading()
+        self._eof = True
+        self._flush()
+        self._data_ready.set()
     
     async def read(self) -> bytes:
-        """Read data from terminal"""
-        if self.master_fd and self.running:
-            try:
-                return os.read(self.master_fd, 1024)
-            except OSError:
+        """Read the next chunk of terminal output (b'' once the terminal is closed)"""
+        while not self._chunks:
+            if self._eof or not self.running or self.master_fd is None:
                 return b''
-        return b''
+            self._data_ready.clear()
+            await self._data_ready.wait()
+        chunk = self._chunks.popleft()
+        self._pending -= len(chunk)
+        if self._pending < MAX_PENDING_BYTES // 2:
+            self._resume_reading()
+        return chunk
+    
+    # --- Input (client -> PTY) ---
+    
+    async def write(self, data: str):
+        """Write data to terminal"""
+        if self.master_fd is None or not self.running:
+            return
+        self._write_buffer += data.encode('utf-8')
+        if not self._writing:
+            self._on_writable()
+    
+    def _on_writable(self):
+        """Write as much buffered input as the PTY accepts; wait for writability otherwise"""
+        try:
+            while self._write_buffer:
+                written = os.write(self.master_fd, self._write_buffer)
+                del self._write_buffer[:written]
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            logger.error(f"Error writing to terminal {self.session_id}: {e}")
+            self._write_buffer.clear()
+        
+        if self._write_buffer and not self._writing:
+            self._loop.add_writer(self.master_fd, self._on_writable)
+            self._writing = True
+        elif not self._write_buffer and self._writing:
+            self._loop.remove_writer(self.master_fd)
+            self._writing = False
     
     async def resize(self, cols: int, rows: int):
         """Resize terminal"""
@@ -101,11 +218,21 @@ class TerminalSession:
     async def stop(self):
         """Stop terminal session"""
         self.running = False
-        if self.process:
+        if self.master_fd is not None and self._loop:
+            self._pause_reading()
+            if self._writing:
+                self._loop.remove_writer(self.master_fd)
+                self._writing = False
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._data_ready.set()
+        if self.process and self.process.returncode is None:
             self.process.terminate()
             await self.process.wait()
-        if self.master_fd:
+        if self.master_fd is not None:
             os.close(self.master_fd)
+            self.master_fd = None
 
 
 class TerminalService:
@@ -156,12 +283,16 @@ class TerminalService:
     
     async def _read_from_terminal(self, session: TerminalSession, websocket: WebSocket):
         """Read from terminal and send to WebSocket"""
+        # Chunks can split multi-byte characters; decode across them
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
         while session.running:
             try:
                 data = await session.read()
-                if data:
-                    await websocket.send_text(data.decode('utf-8', errors='ignore'))
-                await asyncio.sleep(0.01)  # Small delay to prevent busy loop
+                if not data:
+                    break
+                text = decoder.decode(data)
+                if text:
+                    await websocket.send_text(text)
             except Exception as e:
                 logger.error(f"Error reading from terminal: {e}")
                 break
@@ -5,7 +5,6 @@ import logging
 import asyncio
 from typing import Dict, Any, List, Optional
 import uuid
-from services.workspace.docker_sandbox import DockerSandboxService
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +13,15 @@ class MobileEmulatorService:
     
     def __init__(self):
         self.active_emulators: Dict[str, Dict[str, Any]] = {}
-        self.sandbox = DockerSandboxService()
+        self._sandbox = None
+
+    @property
+    def sandbox(self):
+        """Created on first use: this service is instantiated at import time"""
+        if self._sandbox is None:
+            from services.workspace.docker_sandbox import DockerSandboxService
+            self._sandbox = DockerSandboxService()
+        return self._sandbox
 
     async def start_emulator(self, project_id: str, device_profile: str = "Pixel_7_Pro") -> Dict[str, Any]:
         """Start a real mobile emulator instance via Docker"""
@@ -3,47 +3,56 @@ Real-time Registry Version Checker
 Fetches latest versions directly from package registries
 """
 import asyncio
-import aiohttp
 import json
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Dict, Callable, Awaitable, Iterable, Any
 import logging
 
+from services.registry.registry_client import RegistryClient, get_registry_client
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class LiveVersionChecker:
     """Check live versions from package registries"""
     
+    def __init__(self, client: Optional[RegistryClient] = None):
+        self.client = client or get_registry_client()
+    
+    async def _fetch_versions(
+        self,
+        fetch: Callable[..., Awaitable[Optional[str]]],
+        keys: Iterable[Any]
+    ) -> Dict[Any, Optional[str]]:
+        """Fetch versions for many packages concurrently (the client bounds per-host concurrency)"""
+        keys = list(keys)
+        versions = await asyncio.gather(
+            *(fetch(*key) if isinstance(key, tuple) else fetch(key) for key in keys),
+            return_exceptions=True
+        )
+        results = {}
+        for key, version in zip(keys, versions):
+            if isinstance(version, Exception):
+                logger.error(f"✗ Failed to fetch {key}: {version}")
+                version = None
+            results[key] = version
+        return results
+    
+    @staticmethod
+    def _logged(name: str, version: Optional[str]) -> Optional[str]:
+        if version:
+            logger.info(f"✓ {name}: {version}")
+        else:
+            logger.error(f"✗ Failed to fetch {name}")
+        return version
+    
     async def get_npm_version(self, package: str) -> Optional[str]:
         """Get latest npm package version"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://registry.npmjs.org/{package}/latest"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        version = data.get("version")
-                        logger.info(f"✓ {package}: {version}")
-                        return version
-        except Exception as e:
-            logger.error(f"✗ Failed to fetch {package}: {e}")
-        return None
+        return self._logged(package, await self.client.npm_version(package))
     
     async def get_pypi_version(self, package: str) -> Optional[str]:
         """Get latest PyPI package version"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://pypi.org/pypi/{package}/json"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        version = data.get("info", {}).get("version")
-                        logger.info(f"✓ {package}: {version}")
-                        return version
-        except Exception as e:
-            logger.error(f"✗ Failed to fetch {package}: {e}")
-        return None
+        return self._logged(package, await self.client.pypi_version(package))
     
     async def update_javascript_registry(self):
         """Update JavaScript registry with live versions"""
@@ -65,8 +74,9 @@ class LiveVersionChecker:
         }
         
         updates = {}
+        versions = await self._fetch_versions(self.get_npm_version, packages_to_check)
         for npm_package, framework_name in packages_to_check.items():
-            version = await self.get_npm_version(npm_package)
+            version = versions[npm_package]
             if version:
                 updates[framework_name] = version
         
@@ -90,14 +100,15 @@ class LiveVersionChecker:
             "prettier": "prettier"
         }
         
-        for pkg_key, npm_name in npm_packages.items():
-            if pkg_key in registry.get("packages", {}):
-                version = await self.get_npm_version(npm_name)
-                if version:
-                    old_version = registry["packages"][pkg_key]
-                    if old_version != version:
-                        registry["packages"][pkg_key] = version
-                        logger.info(f"  Updated package {pkg_key}: {old_version} → {version}")
+        wanted = {k: v for k, v in npm_packages.items() if k in registry.get("packages", {})}
+        versions = await self._fetch_versions(self.get_npm_version, wanted.values())
+        for pkg_key, npm_name in wanted.items():
+            version = versions[npm_name]
+            if version:
+                old_version = registry["packages"][pkg_key]
+                if old_version != version:
+                    registry["packages"][pkg_key] = version
+                    logger.info(f"  Updated package {pkg_key}: {old_version} → {version}")
         
         # Save updated registry
         with open(registry_path, 'w') as f:
@@ -123,8 +134,9 @@ class LiveVersionChecker:
         }
         
         updates = {}
+        versions = await self._fetch_versions(self.get_pypi_version, pypi_packages)
         for pypi_package, framework_name in pypi_packages.items():
-            version = await self.get_pypi_version(pypi_package)
+            version = versions[pypi_package]
             if version:
                 updates[framework_name] = version
         
@@ -147,14 +159,15 @@ class LiveVersionChecker:
             "requests": "requests"
         }
         
-        for pkg_key, pypi_name in package_mapping.items():
-            if pkg_key in registry.get("packages", {}):
-                version = await self.get_pypi_version(pypi_name)
-                if version:
-                    old_version = registry["packages"][pkg_key]
-                    if old_version != version:
-                        registry["packages"][pkg_key] = version
-                        logger.info(f"  Updated package {pkg_key}: {old_version} → {version}")
+        wanted = {k: v for k, v in package_mapping.items() if k in registry.get("packages", {})}
+        versions = await self._fetch_versions(self.get_pypi_version, wanted.values())
+        for pkg_key, pypi_name in wanted.items():
+            version = versions[pypi_name]
+            if version:
+                old_version = registry["packages"][pkg_key]
+                if old_version != version:
+                    registry["packages"][pkg_key] = version
+                    logger.info(f"  Updated package {pkg_key}: {old_version} → {version}")
         
         # Save updated registry
         with open(registry_path, 'w') as f:
@@ -171,8 +184,9 @@ class LiveVersionChecker:
             registry = json.load(f)
         
         packages = {"@nestjs/core": "NestJS", "next": "Next.js", "prisma": "Prisma", "typescript": "TypeScript"}
+        versions = await self._fetch_versions(self.get_npm_version, packages)
         for npm_pkg, fw_name in packages.items():
-            version = await self.get_npm_version(npm_pkg)
+            version = versions[npm_pkg]
             if version:
                 for framework in registry.get("frameworks", []):
                     if framework["name"] == fw_name:
@@ -193,8 +207,9 @@ class LiveVersionChecker:
             registry = json.load(f)
         
         crates = {"actix-web": "Actix-web", "rocket": "Rocket", "axum": "Axum", "tokio": "Tokio", "diesel": "Diesel", "sea-orm": "SeaORM"}
+        versions = await self._fetch_versions(self.get_cargo_version, crates)
         for crate, fw_name in crates.items():
-            version = await self.get_cargo_version(crate)
+            version = versions[crate]
             if version:
                 for framework in registry.get("frameworks", []):
                     if framework["name"] == fw_name:
@@ -209,18 +224,7 @@ class LiveVersionChecker:
     
     async def get_cargo_version(self, crate: str) -> Optional[str]:
         """Get latest Rust crate version"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://crates.io/api/v1/crates/{crate}"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        version = data.get("crate", {}).get("max_version")
-                        logger.info(f"✓ {crate}: {version}")
-                        return version
-        except Exception as e:
-            logger.error(f"✗ Failed to fetch {crate}: {e}")
-        return None
+        return self._logged(crate, await self.client.cargo_version(crate))
     
     async def update_dart_registry(self):
         """Update Dart/Flutter registry"""
@@ -231,8 +235,9 @@ class LiveVersionChecker:
         
         # Update Flutter framework version (check pub.dev for flutter package)
         packages = {"riverpod": "Riverpod", "bloc": "Bloc", "get": "GetX"}
+        versions = await self._fetch_versions(self.get_pub_version, packages)
         for pkg, fw_name in packages.items():
-            version = await self.get_pub_version(pkg)
+            version = versions[pkg]
             if version:
                 for framework in registry.get("frameworks", []):
                     if framework["name"] == fw_name:
@@ -247,104 +252,27 @@ class LiveVersionChecker:
     
     async def get_pub_version(self, package: str) -> Optional[str]:
         """Get latest Dart package version from pub.dev"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://pub.dev/api/packages/{package}"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        version = data.get("latest", {}).get("version")
-                        logger.info(f"✓ {package}: {version}")
-                        return version
-        except Exception as e:
-            logger.error(f"✗ Failed to fetch {package}: {e}")
-        return None
+        return self._logged(package, await self.client.pub_version(package))
     
     async def get_nuget_version(self, package: str) -> Optional[str]:
         """Get latest NuGet package version"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://api.nuget.org/v3-flatcontainer/{package.lower()}/index.json"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        versions = data.get("versions", [])
-                        if versions:
-                            # Get latest stable version (not preview/rc)
-                            stable = [v for v in versions if not any(x in v.lower() for x in ['alpha', 'beta', 'rc', 'preview'])]
-                            version = stable[-1] if stable else versions[-1]
-                            logger.info(f"✓ {package}: {version}")
-                            return version
-        except Exception as e:
-            logger.error(f"✗ Failed to fetch {package}: {e}")
-        return None
+        return self._logged(package, await self.client.nuget_version(package))
     
     async def get_maven_version(self, group_id: str, artifact_id: str) -> Optional[str]:
         """Get latest Maven package version"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://search.maven.org/solrsearch/select?q=g:{group_id}+AND+a:{artifact_id}&rows=1&wt=json"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        docs = data.get("response", {}).get("docs", [])
-                        if docs:
-                            version = docs[0].get("latestVersion")
-                            logger.info(f"✓ {group_id}:{artifact_id}: {version}")
-                            return version
-        except Exception as e:
-            logger.error(f"✗ Failed to fetch {group_id}:{artifact_id}: {e}")
-        return None
+        return self._logged(f"{group_id}:{artifact_id}", await self.client.maven_version(group_id, artifact_id))
     
     async def get_go_module_version(self, module_path: str) -> Optional[str]:
         """Get latest Go module version"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://proxy.golang.org/{module_path}/@latest"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        version = data.get("Version", "").replace("v", "")
-                        logger.info(f"✓ {module_path}: {version}")
-                        return version
-        except Exception as e:
-            logger.error(f"✗ Failed to fetch {module_path}: {e}")
-        return None
+        return self._logged(module_path, await self.client.go_version(module_path))
     
     async def get_rubygems_version(self, gem: str) -> Optional[str]:
         """Get latest RubyGems version"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://rubygems.org/api/v1/gems/{gem}.json"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        version = data.get("version")
-                        logger.info(f"✓ {gem}: {version}")
-                        return version
-        except Exception as e:
-            logger.error(f"✗ Failed to fetch {gem}: {e}")
-        return None
+        return self._logged(gem, await self.client.rubygems_version(gem))
     
     async def get_packagist_version(self, package: str) -> Optional[str]:
         """Get latest Packagist (PHP) version"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://repo.packagist.org/p2/{package}.json"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        packages = data.get("packages", {}).get(package, [])
-                        if packages:
-                            # Get latest stable version
-                            versions = [p["version"] for p in packages if "dev" not in p["version"].lower()]
-                            if versions:
-                                version = versions[0]
-                                logger.info(f"✓ {package}: {version}")
-                                return version
-        except Exception as e:
-            logger.error(f"✗ Failed to fetch {package}: {e}")
-        return None
+        return self._logged(package, await self.client.packagist_version(package))
     
     async def update_dotnet_registry(self):
         """Update .NET registry from NuGet"""
@@ -361,8 +289,9 @@ class LiveVersionChecker:
             "Dapper": "Dapper"
         }
         
+        versions = await self._fetch_versions(self.get_nuget_version, packages)
         for nuget_pkg, name in packages.items():
-            version = await self.get_nuget_version(nuget_pkg)
+            version = versions[nuget_pkg]
             if version:
                 # Update in packages section
                 if name in registry.get("packages", {}):
@@ -388,8 +317,9 @@ class LiveVersionChecker:
             ("org.hibernate.orm", "hibernate-core"): "Hibernate"
         }
         
+        versions = await self._fetch_versions(self.get_maven_version, maven_packages)
         for (group_id, artifact_id), fw_name in maven_packages.items():
-            version = await self.get_maven_version(group_id, artifact_id)
+            version = versions[(group_id, artifact_id)]
             if version:
                 for framework in registry.get("frameworks", []):
                     if framework["name"] == fw_name:
@@ -416,8 +346,9 @@ class LiveVersionChecker:
             "gorm.io/gorm": "GORM"
         }
         
+        versions = await self._fetch_versions(self.get_go_module_version, modules)
         for module_path, fw_name in modules.items():
-            version = await self.get_go_module_version(module_path)
+            version = versions[module_path]
             if version:
                 for framework in registry.get("frameworks", []):
                     if framework["name"] == fw_name:
@@ -439,8 +370,9 @@ class LiveVersionChecker:
         
         gems = {"rails": "Rails", "sinatra": "Sinatra", "hanami": "Hanami"}
         
+        versions = await self._fetch_versions(self.get_rubygems_version, gems)
         for gem, fw_name in gems.items():
-            version = await self.get_rubygems_version(gem)
+            version = versions[gem]
             if version:
                 for framework in registry.get("frameworks", []):
                     if framework["name"] == fw_name:
@@ -466,8 +398,9 @@ class LiveVersionChecker:
             "codeigniter4/framework": "CodeIgniter"
         }
         
+        versions = await self._fetch_versions(self.get_packagist_version, packages)
         for package, fw_name in packages.items():
-            version = await self.get_packagist_version(package)
+            version = versions[package]
             if version:
                 for framework in registry.get("frameworks", []):
                     if framework["name"] == fw_name:
@@ -486,17 +419,24 @@ class LiveVersionChecker:
         logger.info("LIVE VERSION UPDATE - ALL LANGUAGES")
         logger.info("="*60 + "\n")
         
-        # Update all registries
-        await self.update_javascript_registry()
-        await self.update_typescript_registry()
-        await self.update_python_registry()
-        await self.update_rust_registry()
-        await self.update_dart_registry()
-        await self.update_dotnet_registry()
-        await self.update_java_registry()
-        await self.update_go_registry()
-        await self.update_ruby_registry()
-        await self.update_php_registry()
+        # Registries live in separate files, so they can refresh concurrently
+        results = await asyncio.gather(
+            self.update_javascript_registry(),
+            self.update_typescript_registry(),
+            self.update_python_registry(),
+            self.update_rust_registry(),
+            self.update_dart_registry(),
+            self.update_dotnet_registry(),
+            self.update_java_registry(),
+            self.update_go_registry(),
+            self.update_ruby_registry(),
+            self.update_php_registry(),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Registry update failed: {result}")
+        await self.client.save_cache()
         
         logger.info("="*60)
         logger.info("✓ ALL 10 REGISTRIES UPDATED WITH LIVE VERSIONS!")
@@ -504,7 +444,10 @@ class LiveVersionChecker:
 
 async def main():
     checker = LiveVersionChecker()
-    await checker.update_all_registries()
+    try:
+        await checker.update_all_registries()
+    finally:
+        await checker.client.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
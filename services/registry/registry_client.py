@@ -0,0 +1,282 @@
+"""
+Registry HTTP Client
+Shared, pooled client for package registries (npm, PyPI, Maven, NuGet, crates.io,
+Go proxy, RubyGems, Packagist, pub.dev) with per-host concurrency limits,
+conditional requests backed by a persistent cache of the extracted values, and
+jittered retries.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Upstream base URLs; each can be overridden with REGISTRY_<NAME>_URL (e.g. to a local stub server)
+DEFAULT_UPSTREAMS = {
+    "npm": "https://registry.npmjs.org",
+    "pypi": "https://pypi.org",
+    "maven": "https://search.maven.org",
+    "nuget": "https://api.nuget.org",
+    "cargo": "https://crates.io",
+    "go": "https://proxy.golang.org",
+    "rubygems": "https://rubygems.org",
+    "packagist": "https://repo.packagist.org",
+    "pub": "https://pub.dev",
+}
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Longest wait between retries, whatever Retry-After asks for
+MAX_BACKOFF_SECONDS = 30.0
+PRERELEASE_MARKERS = ('alpha', 'beta', 'rc', 'preview')
+
+
+class RegistryClient:
+    """Pooled registry client: one session per upstream host, bounded concurrency per host"""
+
+    def __init__(
+        self,
+        upstreams: Optional[Dict[str, str]] = None,
+        cache_path: Optional[str] = "storage/registry_http_cache.json",
+        max_per_host: int = 8,
+        timeout: float = 10.0,
+        retries: int = 3,
+        backoff_base: float = 0.5,
+        max_backoff: float = MAX_BACKOFF_SECONDS
+    ):
+        self.upstreams = {
+            name: os.getenv(f"REGISTRY_{name.upper()}_URL", url).rstrip("/")
+            for name, url in DEFAULT_UPSTREAMS.items()
+        }
+        self.upstreams.update({k: v.rstrip("/") for k, v in (upstreams or {}).items()})
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.max_per_host = max_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cache: Dict[str, Dict[str, Any]] = self._load_cache()
+        self._cache_dirty = False
+        self.stats = {"requests": 0, "not_modified": 0, "fetched": 0, "retries": 0, "errors": 0}
+
+    # --- Cache persistence ---
+
+    def _load_cache(self) -> Dict[str, Dict[str, Any]]:
+        if not self.cache_path or not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path, 'r') as f:
+                entries = json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable registry cache {self.cache_path}: {e}")
+            return {}
+        # Entries from older versions stored whole response bodies; refetch those
+        return {url: entry for url, entry in entries.items() if "value" in entry}
+
+    async def save_cache(self):
+        """Persist validators and extracted values so the next run can revalidate with 304s"""
+        if not self.cache_path or not self._cache_dirty:
+            return
+        # Entries are replaced, never mutated, so a shallow copy is a stable snapshot
+        snapshot = dict(self._cache)
+        self._cache_dirty = False
+        await asyncio.to_thread(self._write_cache, snapshot)
+
+    def _write_cache(self, entries: Dict[str, Dict[str, Any]]):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.cache_path)
+
+    # --- Sessions ---
+
+    async def _session_for(self, host: str) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Sessions and semaphores are bound to the loop that created them
+            for stale in self._sessions.values():
+                await self._discard_session(stale, self._loop)
+            self._sessions, self._semaphores, self._loop = {}, {}, loop
+        session = self._sessions.get(host)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.max_per_host, ttl_dns_cache=300)
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._sessions[host] = session
+            self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return session
+
+    @staticmethod
+    async def _discard_session(session: aiohttp.ClientSession, old_loop: Optional[asyncio.AbstractEventLoop]):
+        """Close a session that belongs to an event loop other than the running one"""
+        if session.closed:
+            return
+        if old_loop is not None and old_loop.is_running():
+            # Still alive on another thread: let it close the session itself
+            asyncio.run_coroutine_threadsafe(session.close(), old_loop)
+            return
+        try:
+            # Marks the session and connector closed; transports still open on a
+            # stopped loop are closed there, and their close waiters cannot be awaited here
+            await session.close()
+        except RuntimeError as e:
+            logger.debug(f"Stale registry session closed without waiting for its transports: {e}")
+
+    async def close(self):
+        """Close pooled sessions and flush the response cache"""
+        sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+        await self.save_cache()
+
+    # --- Requests ---
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        # Full jitter keeps concurrent retries from synchronizing
+        return random.uniform(0, min(self.max_backoff, self.backoff_base * (2 ** attempt)))
+
+    async def get_json(self, url: str, extract: Callable[[Any], Any]) -> Optional[Any]:
+        """
+        GET a JSON document and return ``extract(body)``. Only the extracted value is
+        cached, with the response validators; If-None-Match / If-Modified-Since are
+        sent when a cached value exists and it is served on 304. Returns None on
+        failure or when the body does not have the expected shape.
+        """
+        host = urlsplit(url).netloc
+        session = await self._session_for(host)
+        cached = self._cache.get(url)
+        headers = {"Accept": "application/json"}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphores[host]:
+                    self.stats["requests"] += 1
+                    async with session.get(url, headers=headers) as response:
+                        if response.status == 304 and cached:
+                            self.stats["not_modified"] += 1
+                            return cached["value"]
+                        if response.status == 200:
+                            value = extract(await response.json(content_type=None))
+                            self.stats["fetched"] += 1
+                            if response.headers.get("ETag") or response.headers.get("Last-Modified"):
+                                self._cache[url] = {
+                                    "etag": response.headers.get("ETag"),
+                                    "last_modified": response.headers.get("Last-Modified"),
+                                    "value": value,
+                                    "fetched_at": time.time()
+                                }
+                                self._cache_dirty = True
+                            return value
+                        if response.status not in RETRYABLE_STATUSES or attempt >= self.retries:
+                            logger.debug(f"Registry request {url} returned {response.status}")
+                            self.stats["errors"] += 1
+                            return None
+                        delay = self._backoff(attempt, response.headers.get("Retry-After"))
+            except (ValueError, TypeError, AttributeError, KeyError, IndexError) as e:
+                # Malformed or unexpectedly shaped body (JSONDecodeError is a ValueError):
+                # retrying will not help
+                logger.debug(f"Registry request {url} returned an unreadable body: {e}")
+                self.stats["errors"] += 1
+                return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    logger.debug(f"Registry request {url} failed: {e}")
+                    self.stats["errors"] += 1
+                    return None
+                delay = self._backoff(attempt)
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+        return None
+
+    # --- Ecosystem helpers ---
+    # Each passes an extractor so the cache keeps the version, not the whole document
+
+    async def npm_version(self, package: str) -> Optional[str]:
+        return await self.get_json(f"{self.upstreams['npm']}/{package}/latest", lambda data: data.get("version"))
+
+    async def pypi_version(self, package: str) -> Optional[str]:
+        return await self.get_json(
+            f"{self.upstreams['pypi']}/pypi/{package}/json", lambda data: data.get("info", {}).get("version")
+        )
+
+    async def maven_version(self, group_id: str, artifact_id: str) -> Optional[str]:
+        def latest(data):
+            docs = data.get("response", {}).get("docs", [])
+            return docs[0].get("latestVersion") if docs else None
+
+        return await self.get_json(
+            f"{self.upstreams['maven']}/solrsearch/select?q=g:{group_id}+AND+a:{artifact_id}&rows=1&wt=json",
+            latest
+        )
+
+    async def nuget_version(self, package: str) -> Optional[str]:
+        def latest(data):
+            versions = data.get("versions", [])
+            if not versions:
+                return None
+            # Latest stable version (not preview/rc)
+            stable = [v for v in versions if not any(x in v.lower() for x in PRERELEASE_MARKERS)]
+            return stable[-1] if stable else versions[-1]
+
+        return await self.get_json(f"{self.upstreams['nuget']}/v3-flatcontainer/{package.lower()}/index.json", latest)
+
+    async def cargo_version(self, crate: str) -> Optional[str]:
+        return await self.get_json(
+            f"{self.upstreams['cargo']}/api/v1/crates/{crate}", lambda data: data.get("crate", {}).get("max_version")
+        )
+
+    async def go_version(self, module_path: str) -> Optional[str]:
+        return await self.get_json(
+            f"{self.upstreams['go']}/{module_path}/@latest", lambda data: data.get("Version", "").replace("v", "") or None
+        )
+
+    async def rubygems_version(self, gem: str) -> Optional[str]:
+        return await self.get_json(
+            f"{self.upstreams['rubygems']}/api/v1/versions/{gem}/latest.json", lambda data: data.get("version")
+        )
+
+    async def packagist_version(self, package: str) -> Optional[str]:
+        def latest(data):
+            # p2 metadata lists releases newest first
+            for release in data.get("packages", {}).get(package, []):
+                version = release.get("version", "")
+                if "dev" not in version.lower():
+                    return version
+            return None
+
+        return await self.get_json(f"{self.upstreams['packagist']}/p2/{package}.json", latest)
+
+    async def pub_version(self, package: str) -> Optional[str]:
+        return await self.get_json(
+            f"{self.upstreams['pub']}/api/packages/{package}", lambda data: data.get("latest", {}).get("version")
+        )
+
+
+_shared_client: Optional[RegistryClient] = None
+
+
+def get_registry_client() -> RegistryClient:
+    """Process-wide registry client shared by the updaters"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = RegistryClient()
+    return _shared_client
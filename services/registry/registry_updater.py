@@ -5,135 +5,75 @@ Automatically checks for new versions of frameworks and packages
 import asyncio
 import logging
 import json
-import aiohttp
 from typing import Dict, Any, Optional
 from pathlib import Path
 from datetime import datetime
 
+from services.registry.registry_client import RegistryClient, get_registry_client
+
 logger = logging.getLogger(__name__)
 
 class RegistryUpdater:
     """Automatically updates language registries with latest versions"""
     
-    def __init__(self, registry_path: str = "services/registry/registries"):
+    def __init__(self, registry_path: str = "services/registry/registries", client: Optional[RegistryClient] = None):
         self.registry_path = Path(registry_path)
         self.update_log_path = Path("storage/registry_update_log.json")
+        self.client = client or get_registry_client()
         
     async def check_npm_package(self, package_name: str) -> Optional[str]:
         """Check latest version of npm package"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://registry.npmjs.org/{package_name}/latest"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("version")
-        except Exception as e:
-            logger.debug(f"Failed to check npm package {package_name}: {e}")
-        return None
+        return await self.client.npm_version(package_name)
     
     async def check_pypi_package(self, package_name: str) -> Optional[str]:
         """Check latest version of PyPI package"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://pypi.org/pypi/{package_name}/json"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("info", {}).get("version")
-        except Exception as e:
-            logger.debug(f"Failed to check PyPI package {package_name}: {e}")
-        return None
+        return await self.client.pypi_version(package_name)
     
     async def check_maven_package(self, group_id: str, artifact_id: str) -> Optional[str]:
         """Check latest version of Maven package"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                # Use Maven Central API
-                url = f"https://search.maven.org/solrsearch/select?q=g:{group_id}+AND+a:{artifact_id}&rows=1&wt=json"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        docs = data.get("response", {}).get("docs", [])
-                        if docs:
-                            return docs[0].get("latestVersion")
-        except Exception as e:
-            logger.debug(f"Failed to check Maven package {group_id}:{artifact_id}: {e}")
-        return None
+        return await self.client.maven_version(group_id, artifact_id)
     
     async def check_nuget_package(self, package_name: str) -> Optional[str]:
         """Check latest version of NuGet package"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://api.nuget.org/v3-flatcontainer/{package_name.lower()}/index.json"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        versions = data.get("versions", [])
-                        if versions:
-                            # Return latest non-preview version
-                            stable_versions = [v for v in versions if not any(x in v.lower() for x in ['alpha', 'beta', 'rc', 'preview'])]
-                            return stable_versions[-1] if stable_versions else versions[-1]
-        except Exception as e:
-            logger.debug(f"Failed to check NuGet package {package_name}: {e}")
-        return None
+        return await self.client.nuget_version(package_name)
     
     async def check_cargo_crate(self, crate_name: str) -> Optional[str]:
         """Check latest version of Rust crate"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://crates.io/api/v1/crates/{crate_name}"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("crate", {}).get("max_version")
-        except Exception as e:
-            logger.debug(f"Failed to check Cargo crate {crate_name}: {e}")
-        return None
+        return await self.client.cargo_version(crate_name)
     
     async def check_go_module(self, module_path: str) -> Optional[str]:
         """Check latest version of Go module"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://proxy.golang.org/{module_path}/@latest"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("Version", "").replace("v", "")
-        except Exception as e:
-            logger.debug(f"Failed to check Go module {module_path}: {e}")
-        return None
+        return await self.client.go_version(module_path)
 
     async def check_rubygems_package(self, package_name: str) -> Optional[str]:
         """Check latest version of RubyGems package"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://rubygems.org/api/v1/versions/{package_name}/latest.json"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("version")
-        except Exception as e:
-            logger.debug(f"Failed to check RubyGems package {package_name}: {e}")
-        return None
+        return await self.client.rubygems_version(package_name)
 
     async def check_packagist_package(self, package_name: str) -> Optional[str]:
         """Check latest version of Packagist (PHP) package"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://packagist.org/packages/{package_name}.json"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # Get latest version from versions dict (it's usually sorted or has a latest field but API vary)
-                        versions = data.get("package", {}).get("versions", {})
-                        if versions:
-                            # Return the first version that doesn't look like a branch or dev
-                            for v in versions.keys():
-                                if not v.endswith("-dev") and "dev-" not in v:
-                                    return v
-        except Exception as e:
-            logger.debug(f"Failed to check Packagist package {package_name}: {e}")
+        return await self.client.packagist_version(package_name)
+    
+    async def _check_package(self, language: str, package_name: str) -> Optional[str]:
+        """Dispatch to the checker for the language's package ecosystem"""
+        if language in ["javascript", "typescript"]:
+            return await self.check_npm_package(package_name)
+        elif language == "python":
+            return await self.check_pypi_package(package_name)
+        elif language == "java" or language == "scala":
+            # simplistic mapping for group/artifact
+            if ":" in package_name:
+                gid, aid = package_name.split(":")
+                return await self.check_maven_package(gid, aid)
+        elif language == "csharp":
+            return await self.check_nuget_package(package_name)
+        elif language == "rust":
+            return await self.check_cargo_crate(package_name)
+        elif language == "go":
+            return await self.check_go_module(package_name)
+        elif language == "ruby":
+            return await self.check_rubygems_package(package_name)
+        elif language == "php":
+            return await self.check_packagist_package(package_name)
         return None
     
     async def update_registry(self, language: str) -> Dict[str, Any]:
@@ -175,32 +115,16 @@ class RegistryUpdater:
         
         # Check first 5 packages for all languages (limited for efficiency)
         check_packages = list(packages.keys())[:5]
+        latest_versions = await asyncio.gather(
+            *(self._check_package(language, package_name) for package_name in check_packages),
+            return_exceptions=True
+        )
         
-        for package_name in check_packages:
+        for package_name, latest_version in zip(check_packages, latest_versions):
+            if isinstance(latest_version, Exception):
+                logger.error(f"Error checking {language} package {package_name}: {latest_version}")
+                continue
             current_version = packages[package_name]
-            latest_version = None
-            
-            # Determine which checker to use
-            if language in ["javascript", "typescript"]:
-                latest_version = await self.check_npm_package(package_name)
-            elif language == "python":
-                latest_version = await self.check_pypi_package(package_name)
-            elif language == "java" or language == "scala":
-                # simplistic mapping for group/artifact
-                if ":" in package_name:
-                    gid, aid = package_name.split(":")
-                    latest_version = await self.check_maven_package(gid, aid)
-            elif language == "csharp":
-                latest_version = await self.check_nuget_package(package_name)
-            elif language == "rust":
-                latest_version = await self.check_cargo_crate(package_name)
-            elif language == "go":
-                latest_version = await self.check_go_module(package_name)
-            elif language == "ruby":
-                latest_version = await self.check_rubygems_package(package_name)
-            elif language == "php":
-                latest_version = await self.check_packagist_package(package_name)
-            
             if latest_version and latest_version != current_version:
                 updates[package_name] = {
                     "old": current_version,
@@ -226,13 +150,16 @@ class RegistryUpdater:
             "elixir", "c", "cpp"
         ]
         
-        for lang in languages:
-            try:
-                lang_updates = await self.update_registry(lang)
-                if lang_updates:
-                    all_updates[lang] = lang_updates
-            except Exception as e:
-                logger.error(f"Failed to update {lang} registry: {e}")
+        results = await asyncio.gather(
+            *(self.update_registry(lang) for lang in languages),
+            return_exceptions=True
+        )
+        for lang, lang_updates in zip(languages, results):
+            if isinstance(lang_updates, Exception):
+                logger.error(f"Failed to update {lang} registry: {lang_updates}")
+            elif lang_updates:
+                all_updates[lang] = lang_updates
+        await self.client.save_cache()
             
         # Update Framework Registry (DB Persisted)
         from services.registry.framework_registry import framework_registry
@@ -289,7 +216,10 @@ class RegistryUpdater:
 async def update_registries():
     """Run registry update once"""
     updater = RegistryUpdater()
-    return await updater.update_all_registries()
+    try:
+        return await updater.update_all_registries()
+    finally:
+        await updater.client.close()
 
 
 if __name__ == "__main__":
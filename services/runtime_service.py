@@ -13,9 +13,16 @@ class RuntimeService:
     
     def __init__(self):
         self.active_processes: Dict[str, Dict[str, Any]] = {}
-        from services.workspace.docker_sandbox import DockerSandboxService
-        self.sandbox_service = DockerSandboxService()
+        self._sandbox_service = None
         self.active_sandboxes: Dict[str, Dict[str, Any]] = {}
+    
+    @property
+    def sandbox_service(self):
+        """Created on first use: connecting to the Docker daemon can take seconds"""
+        if self._sandbox_service is None:
+            from services.workspace.docker_sandbox import DockerSandboxService
+            self._sandbox_service = DockerSandboxService()
+        return self._sandbox_service
         
     async def start_project(
         self,
@@ -1,81 +1,269 @@
 """
 Security Vulnerability Scanner
+Bandit results are cached per file content hash and safety results per
+requirements hash, so re-scans only pay for what changed. Each scan keeps its
+own cache file per project, so code and dependency scans never overwrite each other.
 """
-import logging
-import subprocess
+import asyncio
+import hashlib
 import json
-from typing import Dict, Any
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from core.utils.subprocess import run_command_async
 
 logger = logging.getLogger(__name__)
 
+# Bump when the cached entry format or the scan invocation changes
+CACHE_VERSION = 1
+# Same directories `bandit -r` excludes by default (plus *.egg), so no finding it reported is lost
+SKIP_DIRS = {'.svn', 'CVS', '.bzr', '.hg', '.git', '__pycache__', '.tox', '.eggs'}
+# Files per bandit process, and bandit processes run at once
+BANDIT_BATCH_SIZE = 100
+BANDIT_CONCURRENCY = 4
+BANDIT_TIMEOUT = 300
+# Advisories change even when the lockfile doesn't
+SAFETY_CACHE_TTL = int(os.getenv("SAFETY_CACHE_TTL", "86400"))
+# Remediation requests in flight to the LLM
+REMEDIATION_CONCURRENCY = 4
+
+
 class VulnerabilityScanner:
     """Scans code for issues and provides AI-powered remediation"""
-    
-    def __init__(self, orchestrator=None):
+
+    def __init__(self, orchestrator=None, cache_dir: Optional[str] = "storage/security_scan_cache"):
         self.orchestrator = orchestrator
+        self.cache_dir = Path(cache_dir) if cache_dir else None
 
     async def scan_code(self, project_path: str, language: str) -> Dict[str, Any]:
         """Run SAST and provide AI remediation code"""
         logger.info(f"🚀 AI Power-Up: Scanning {language} code at {project_path}")
-        
+
         # 1. Run raw tools (Legacy)
         raw_results = {"issues": []}
+        cache = None
         if language.lower() == "python":
-            raw_results = await self._scan_python_bandit(project_path)
-            
+            cache = await asyncio.to_thread(self._load_cache, project_path, "code")
+            raw_results = await self._scan_python_bandit(project_path, cache)
+
         if not self.orchestrator or not raw_results.get("results"):
+            if cache is not None:
+                await asyncio.to_thread(self._save_cache, project_path, "code", cache)
             return raw_results
 
-        # 2. AI Remediation Pass
-        task = "Analyze these security vulnerabilities and provide specific remediation code."
-        context = {
-            "type": "security_remediation",
-            "language": language,
-            "vulnerabilities": raw_results.get("results", []),
-            "requirements": "For each issue, explain the risk and provide a safe code snippet to fix it."
-        }
+        # 2. AI Remediation Pass, one request per affected file
+        by_file = await self._remediate_by_file(language, raw_results["results"], cache)
+        raw_results["ai_remediation_by_file"] = by_file
+        raw_results["ai_remediation"] = "\n\n".join(
+            f"## {filename}\n{solution}" for filename, solution in by_file.items()
+        ) or "No remediation generated."
+        await asyncio.to_thread(self._save_cache, project_path, "code", cache)
+        return raw_results
 
-        try:
-            result = await self.orchestrator.universal_agent.act(task, context)
-            raw_results["ai_remediation"] = result.get("solution", "No remediation generated.")
-            return raw_results
-        except Exception as e:
-            logger.error(f"AI Security remediation failed: {e}")
-            return raw_results
+    async def _remediate_by_file(
+        self,
+        language: str,
+        findings: List[Dict[str, Any]],
+        cache: Optional[Dict[str, Any]]
+    ) -> Dict[str, str]:
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for finding in findings:
+            grouped.setdefault(finding.get("filename", "unknown"), []).append(finding)
+
+        files = (cache or {}).get("files", {})
+        slots = asyncio.Semaphore(REMEDIATION_CONCURRENCY)
+
+        async def remediate(filename: str, vulnerabilities: List[Dict[str, Any]]) -> Optional[str]:
+            entry = files.get(filename)
+            # Unchanged file, unchanged findings: reuse the earlier answer
+            if entry and entry.get("remediation"):
+                return entry["remediation"]
+            task = f"Analyze these security vulnerabilities in {filename} and provide specific remediation code."
+            context = {
+                "type": "security_remediation",
+                "language": language,
+                "file": filename,
+                "vulnerabilities": vulnerabilities,
+                "requirements": "For each issue, explain the risk and provide a safe code snippet to fix it."
+            }
+            async with slots:
+                try:
+                    result = await self.orchestrator.universal_agent.act(task, context)
+                except Exception as e:
+                    logger.error(f"AI Security remediation failed for {filename}: {e}")
+                    return None
+            solution = result.get("solution")
+            if solution and entry is not None:
+                entry["remediation"] = solution
+            return solution
+
+        names = list(grouped)
+        solutions = await asyncio.gather(*(remediate(name, grouped[name]) for name in names))
+        return {name: solution for name, solution in zip(names, solutions) if solution}
 
     async def scan_dependencies(self, project_path: str, language: str) -> Dict[str, Any]:
         """Run SCA with AI vulnerability analysis"""
         raw_results = {"vulnerabilities": []}
         if language.lower() == "python":
-            raw_results = await self._scan_python_safety(project_path)
-            
+            cache = await asyncio.to_thread(self._load_cache, project_path, "dependencies")
+            raw_results = await self._scan_python_safety(project_path, cache)
+            await asyncio.to_thread(self._save_cache, project_path, "dependencies", cache)
+
         if not self.orchestrator or not raw_results:
             return raw_results
-            
+
         task = f"Analyze these dependency vulnerabilities for {language}."
         result = await self.orchestrator.universal_agent.act(task, {"vulnerabilities": raw_results})
         raw_results["ai_analysis"] = result.get("solution")
         return raw_results
 
-    async def _scan_python_bandit(self, path: str) -> Dict[str, Any]:
-        """Run bandit on python code (Legacy logic)"""
+    async def _scan_python_bandit(self, path: str, cache: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run bandit on the python files whose content changed since the last scan"""
+        cache = cache if cache is not None else {"version": CACHE_VERSION, "files": {}}
         try:
-            cmd = ["bandit", "-r", path, "-f", "json"]
-            # ... execution logic ...
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.stdout.strip():
-                return json.loads(result.stdout)
-            return {"results": []}
-        except Exception:
+            hashes = await asyncio.to_thread(self._hash_python_files, path)
+            previous = cache.get("files", {})
+            files = {name: previous[name] for name in hashes if name in previous and previous[name]["hash"] == hashes[name]}
+            changed = [name for name in hashes if name not in files]
+
+            errors: List[Dict[str, Any]] = []
+            if changed:
+                slots = asyncio.Semaphore(BANDIT_CONCURRENCY)
+                batches = [changed[i:i + BANDIT_BATCH_SIZE] for i in range(0, len(changed), BANDIT_BATCH_SIZE)]
+
+                async def run(batch: List[str]) -> Dict[str, Any]:
+                    async with slots:
+                        return await self._run_bandit(batch)
+
+                for output in await asyncio.gather(*(run(batch) for batch in batches)):
+                    errors.extend(output.get("errors", []))
+                    failed = {error.get("filename") for error in output.get("errors", [])}
+                    metrics = output.get("metrics", {})
+                    results: Dict[str, List[Dict[str, Any]]] = {}
+                    for finding in output.get("results", []):
+                        results.setdefault(finding.get("filename"), []).append(finding)
+                    for name in output.get("scanned", []):
+                        # Files bandit could not parse are retried next time
+                        if name not in failed:
+                            files[name] = {
+                                "hash": hashes[name],
+                                "results": results.get(name, []),
+                                "metrics": metrics.get(name, {})
+                            }
+
+            cache["files"] = files
+            logger.info(f"Bandit scanned {len(changed)} changed file(s), {len(hashes) - len(changed)} cached")
+            return {
+                "results": [finding for name in sorted(files) for finding in files[name]["results"]],
+                "errors": errors,
+                "metrics": {name: files[name]["metrics"] for name in sorted(files)},
+                "scan_stats": {"files": len(hashes), "scanned": len(changed), "cached": len(hashes) - len(changed)}
+            }
+        except Exception as e:
+            logger.error(f"Bandit execution failed: {e}")
             return {"results": [], "error": "Bandit execution failed"}
 
-    async def _scan_python_safety(self, path: str) -> Dict[str, Any]:
-        """Run safety on requirements.txt (Legacy logic)"""
+    async def _run_bandit(self, filenames: List[str]) -> Dict[str, Any]:
+        """One bandit process over a batch of files; bandit exits 1 when it reports issues"""
+        code, stdout, stderr = await run_command_async(
+            ["bandit", "-f", "json", "-q", *filenames], timeout=BANDIT_TIMEOUT
+        )
+        if not stdout:
+            raise RuntimeError(stderr or f"bandit exited with {code}")
+        output = json.loads(stdout)
+        output["scanned"] = filenames
+        return output
+
+    @staticmethod
+    def _hash_python_files(path: str) -> Dict[str, str]:
+        """Bandit filename (path joined onto the scan root, as with ``bandit -r``) -> content hash"""
+        hashes = {}
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.endswith('.egg')]
+            for name in files:
+                if name.endswith('.py'):
+                    file_path = os.path.join(root, name)
+                    try:
+                        with open(file_path, 'rb') as f:
+                            hashes[file_path] = hashlib.sha256(f.read()).hexdigest()
+                    except OSError:
+                        continue
+        return hashes
+
+    async def _scan_python_safety(self, path: str, cache: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run safety on requirements.txt, reusing the last report while the file is unchanged"""
+        cache = cache if cache is not None else {}
+        requirements = os.path.join(path, "requirements.txt")
         try:
-            cmd = ["safety", "check", "-r", f"{path}/requirements.txt", "--json"]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.stdout.strip():
-                return json.loads(result.stdout)
-            return {"vulnerabilities": []}
-        except Exception:
+            lock_hash = await asyncio.to_thread(self._file_hash, requirements)
+            cached = cache.get("safety")
+            if (
+                cached and lock_hash and cached.get("hash") == lock_hash
+                and time.time() - cached.get("checked_at", 0) < SAFETY_CACHE_TTL
+            ):
+                return cached["result"]
+
+            cmd = ["safety", "check", "-r", requirements, "--json"]
+            code, stdout, stderr = await run_command_async(cmd, timeout=BANDIT_TIMEOUT)
+            if not stdout:
+                if code != 0:
+                    raise RuntimeError(stderr or f"safety exited with {code}")
+                result = {"vulnerabilities": []}
+            else:
+                result = json.loads(stdout)
+            if lock_hash:
+                cache["safety"] = {"hash": lock_hash, "checked_at": time.time(), "result": result}
+            return result
+        except Exception as e:
+            logger.error(f"Safety execution failed: {e}")
             return {"vulnerabilities": [], "error": "Safety execution failed"}
+
+    @staticmethod
+    def _file_hash(file_path: str) -> Optional[str]:
+        try:
+            with open(file_path, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+
+    # --- Cache persistence ---
+
+    def _cache_file(self, project_path: str, section: str) -> Optional[Path]:
+        if not self.cache_dir:
+            return None
+        key = hashlib.sha1(os.path.abspath(project_path).encode()).hexdigest()[:16]
+        return self.cache_dir / f"{key}.{section}.json"
+
+    def _load_cache(self, project_path: str, section: str) -> Dict[str, Any]:
+        empty = {"version": CACHE_VERSION, "files": {}}
+        cache_file = self._cache_file(project_path, section)
+        if not cache_file or not cache_file.exists():
+            return empty
+        try:
+            with open(cache_file, 'r') as f:
+                cache = json.load(f)
+            return cache if cache.get("version") == CACHE_VERSION else empty
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable scan cache {cache_file}: {e}")
+            return empty
+
+    def _save_cache(self, project_path: str, section: str, cache: Dict[str, Any]):
+        cache_file = self._cache_file(project_path, section)
+        if not cache_file:
+            return
+        tmp_path = None
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            # Unique per writer: concurrent scans in one process must not share a temp file
+            tmp_path = cache_file.with_suffix(f".{os.getpid()}.{uuid.uuid4().hex}.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, cache_file)
+        except Exception as e:
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+            logger.warning(f"Failed to save scan cache {cache_file}: {e}")
@@ -2,15 +2,83 @@
 Template Code Processor
 Handles downloading, analyzing, and customizing purchased code templates
 """
+import asyncio
 import logging
+import os
+import re
+import shutil
+import tarfile
+import tempfile
 import zipfile
-import requests
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import shutil
+from typing import Dict, Any, Optional, Pattern
+
+import aiohttp
 
 logger = logging.getLogger(__name__)
 
+# File extensions to process
+TEXT_EXTENSIONS = {'.html', '.js', '.css', '.json', '.php', '.py', '.java', '.cs', '.xml', '.yml', '.yaml', '.md', '.txt'}
+# A NUL byte in the first block marks a binary file, whatever its extension
+BINARY_SNIFF_BYTES = 8192
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Chunks buffered between the download and the extraction thread
+DOWNLOAD_QUEUE_CHUNKS = 32
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_template_executor() -> ThreadPoolExecutor:
+    """Bounded pool for template file I/O, shared by downloads and customization"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("TEMPLATE_WORKERS", "8")),
+            thread_name_prefix="template-io"
+        )
+    return _executor
+
+
+class _StreamReader:
+    """
+    Blocking file-like view of chunks the event loop pushes into an
+    asyncio.Queue (None marks EOF), read from the extraction thread
+    """
+
+    def __init__(self, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+        self._queue = queue
+        self._loop = loop
+        self._buffer = b""
+        self._eof = False
+        # Set by the consumer when it gives up, so the producer can stop early
+        self.failed = False
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = asyncio.run_coroutine_threadsafe(self._queue.get(), self._loop).result()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def peek(self, size: int) -> bytes:
+        """Return up to ``size`` upcoming bytes without consuming them"""
+        data = self.read(size)
+        self._buffer = data + self._buffer
+        return data
+
+    def drain(self):
+        """Consume the rest so the downloader is never left blocked on a full queue"""
+        while self.read(DOWNLOAD_CHUNK_SIZE):
+            pass
+
+
 class TemplateProcessor:
     """Processes and customizes code templates"""
     
@@ -20,33 +88,99 @@ class TemplateProcessor:
     
     async def download_template(self, url: str, template_name: str) -> Optional[Path]:
         """Download template from URL"""
+        template_path = self.temp_dir / f"{template_name}.zip"
         try:
             logger.info(f"Downloading template from {url}")
-            response = requests.get(url, stream=True, timeout=60)
-            response.raise_for_status()
-            
-            # Save to temp directory
-            template_path = self.temp_dir / f"{template_name}.zip"
+            loop = asyncio.get_running_loop()
             with open(template_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+                async for chunk in self._iter_download(url):
+                    await loop.run_in_executor(get_template_executor(), f.write, chunk)
             
             logger.info(f"Template downloaded to {template_path}")
             return template_path
             
         except Exception as e:
             logger.error(f"Failed to download template: {e}")
+            template_path.unlink(missing_ok=True)
             return None
     
+    async def _iter_download(self, url: str):
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    yield chunk
+    
+    async def fetch_template(self, url: str, template_name: str) -> Optional[Path]:
+        """
+        Download and extract in one pass: tar archives are unpacked while the
+        response streams in, ZIPs (whose index is at the end) are spooled by the
+        same thread and extracted as soon as the last chunk lands
+        """
+        extract_dir = self.temp_dir / template_name
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=DOWNLOAD_QUEUE_CHUNKS)
+        reader = _StreamReader(queue, loop)
+        extraction = loop.run_in_executor(get_template_executor(), self._extract_stream, reader, extract_dir)
+        try:
+            logger.info(f"Downloading template from {url}")
+            try:
+                async for chunk in self._iter_download(url):
+                    if reader.failed:
+                        # Not an archive we can read; stop downloading
+                        break
+                    await queue.put(chunk)
+            finally:
+                # Also releases the extractor when the download fails midway
+                await queue.put(None)
+            await extraction
+            logger.info(f"Template extracted to {extract_dir}")
+            return extract_dir
+            
+        except Exception as e:
+            logger.error(f"Failed to fetch template: {e}")
+            try:
+                await extraction
+            except Exception:
+                pass
+            shutil.rmtree(extract_dir, ignore_errors=True)
+            return None
+    
+    def _extract_stream(self, reader: _StreamReader, extract_dir: Path):
+        """Runs on the template pool"""
+        try:
+            extract_dir.mkdir(parents=True, exist_ok=True)
+            if reader.peek(2) == b"PK":
+                with tempfile.TemporaryFile(dir=self.temp_dir) as spool:
+                    shutil.copyfileobj(reader, spool, DOWNLOAD_CHUNK_SIZE)
+                    spool.seek(0)
+                    with zipfile.ZipFile(spool, 'r') as zip_ref:
+                        zip_ref.extractall(extract_dir)
+            else:
+                # gzip/bz2/xz/plain tar, read strictly sequentially
+                with tarfile.open(fileobj=reader, mode="r|*") as tar_ref:
+                    if hasattr(tarfile, "data_filter"):
+                        tar_ref.extractall(extract_dir, filter="data")
+                    else:
+                        tar_ref.extractall(extract_dir)
+        except Exception:
+            reader.failed = True
+            raise
+        finally:
+            reader.drain()
+    
     async def extract_template(self, zip_path: Path) -> Optional[Path]:
         """Extract template ZIP file"""
         try:
             extract_dir = self.temp_dir / zip_path.stem
             extract_dir.mkdir(parents=True, exist_ok=True)
             
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
+            def extract():
+                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                    zip_ref.extractall(extract_dir)
             
+            await asyncio.get_running_loop().run_in_executor(get_template_executor(), extract)
             logger.info(f"Template extracted to {extract_dir}")
             return extract_dir
             
@@ -106,37 +240,71 @@ class TemplateProcessor:
     async def customize_template(self, template_dir: Path, variables: Dict[str, str]) -> bool:
         """Replace variables in template files"""
         try:
-            # File extensions to process
-            text_extensions = ['.html', '.js', '.css', '.json', '.php', '.py', '.java', '.cs', '.xml', '.yml', '.yaml', '.md', '.txt']
-            
-            for file_path in template_dir.rglob('*'):
-                if file_path.is_file() and file_path.suffix in text_extensions:
-                    try:
-                        content = file_path.read_text(encoding='utf-8')
-                        
-                        # Replace variables (format: {{VARIABLE_NAME}})
-                        modified = False
-                        for var_name, var_value in variables.items():
-                            placeholder = f"{{{{{var_name}}}}}"
-                            if placeholder in content:
-                                content = content.replace(placeholder, var_value)
-                                modified = True
-                        
-                        if modified:
-                            file_path.write_text(content, encoding='utf-8')
-                            logger.debug(f"Customized {file_path.relative_to(template_dir)}")
-                    
-                    except (UnicodeDecodeError, PermissionError):
-                        # Skip binary files or files we can't read
-                        continue
-            
-            logger.info("Template customization complete")
+            # Replace variables (format: {{VARIABLE_NAME}}) in a single pass per file
+            if not variables:
+                logger.info("Template customization complete")
+                return True
+            pattern = re.compile(
+                r"\{\{(" + "|".join(re.escape(name) for name in variables) + r")\}\}"
+            )
+            
+            loop = asyncio.get_running_loop()
+            executor = get_template_executor()
+            # Bound the files in flight so huge templates don't queue every path at once
+            slots = asyncio.Semaphore(executor._max_workers * 2)
+            pending = set()
+            customized = 0
+            
+            def on_done(future: asyncio.Future):
+                nonlocal customized
+                slots.release()
+                pending.discard(future)
+                if not future.cancelled() and future.exception() is None and future.result():
+                    customized += 1
+            
+            for file_path in await loop.run_in_executor(executor, self._text_files, template_dir):
+                await slots.acquire()
+                future = loop.run_in_executor(executor, self._customize_file, file_path, pattern, variables)
+                pending.add(future)
+                future.add_done_callback(on_done)
+            if pending:
+                await asyncio.gather(*pending)
+            
+            logger.info(f"Template customization complete: {customized} file(s) changed")
             return True
             
         except Exception as e:
             logger.error(f"Template customization failed: {e}")
             return False
     
+    @staticmethod
+    def _text_files(template_dir: Path):
+        paths = []
+        for root, _, files in os.walk(template_dir):
+            for name in files:
+                if os.path.splitext(name)[1] in TEXT_EXTENSIONS:
+                    paths.append(Path(root) / name)
+        return paths
+    
+    @staticmethod
+    def _customize_file(file_path: Path, pattern: Pattern, variables: Dict[str, str]) -> bool:
+        """Runs on the template pool. Returns whether the file was rewritten."""
+        try:
+            data = file_path.read_bytes()
+            # Binary files and files without placeholders are left untouched
+            if b"\0" in data[:BINARY_SNIFF_BYTES] or b"{{" not in data:
+                return False
+            content = data.decode('utf-8')
+            customized = pattern.sub(lambda match: variables[match.group(1)], content)
+            if customized == content:
+                return False
+            file_path.write_bytes(customized.encode('utf-8'))
+            logger.debug(f"Customized {file_path}")
+            return True
+        except (UnicodeDecodeError, PermissionError, OSError):
+            # Skip binary files or files we can't read
+            return False
+    
     async def merge_with_generated_code(self, template_dir: Path, generated_code: Dict[str, str], output_dir: Path) -> bool:
         """Merge template with generated code"""
         try:
@@ -173,13 +341,8 @@ class TemplateProcessor:
     async def process_template(self, url: str, template_name: str, variables: Dict[str, str], generated_code: Dict[str, str], output_dir: Path) -> bool:
         """Complete template processing workflow"""
         try:
-            # Download
-            zip_path = await self.download_template(url, template_name)
-            if not zip_path:
-                return False
-            
-            # Extract
-            template_dir = await self.extract_template(zip_path)
+            # Download and extract
+            template_dir = await self.fetch_template(url, template_name)
             if not template_dir:
                 return False
             
@@ -196,7 +359,6 @@ class TemplateProcessor:
                 return False
             
             # Cleanup
-            zip_path.unlink()
             shutil.rmtree(template_dir)
             
             return True
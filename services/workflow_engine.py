@@ -1,115 +1,507 @@
 """
 Workflow Engine
-Orchestrates multi-step project tasks
+Orchestrates multi-step project tasks as a dependency graph. Independent steps
+run in parallel, and workflow state plus step outputs are checkpointed to SQLite
+so an interrupted workflow resumes after its last completed step. Workers sharing
+the store lease the workflows they run, so each is resumed by exactly one of them.
 """
+import json
 import logging
 import asyncio
-from typing import List, Dict, Any, Optional
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Union
 from datetime import datetime
 import uuid
 
 logger = logging.getLogger(__name__)
 
+# Default data dependencies between the built-in steps
+DEFAULT_DEPENDENCIES: Dict[str, List[str]] = {
+    "sync": [],
+    "update": ["sync"],
+    "push": ["update"],
+    "build": ["update"],
+    "run": ["build"],
+}
+
+# Ordering-only edges, applied when both steps are in the workflow: build waits
+# for push so the two never touch the working tree at the same time, but steps
+# that merely follow build are not held back when push is absent. Declare
+# explicit depends_on to run them side by side.
+DEFAULT_ORDERING: Dict[str, List[str]] = {
+    "build": ["push"],
+}
+
+# A worker must renew its lease on a running workflow within this many seconds,
+# or another worker sharing the store may resume it
+WORKFLOW_LEASE_SECONDS = float(os.getenv("WORKFLOW_LEASE_SECONDS", "60"))
+
+# Workflow config keys the steps read; only these are checkpointed for resume
+RESUME_CONFIG_KEYS = ("update_prompt", "context", "branch", "commit_message", "build_config", "run_config")
+
+STEP_TYPES = set(DEFAULT_DEPENDENCIES)
+ACTIVE_STATUSES = ("pending", "in_progress")
+
 
 class WorkflowEngine:
-    """Orchestrates workflows like sync -> update -> build -> run"""
-    
-    def __init__(self, services: Dict[str, Any]):
+    """Orchestrates workflows like sync -> update -> push -> build -> run"""
+
+    def __init__(self, services: Dict[str, Any], db_path: Optional[str] = "storage/workflows.db"):
         self.services = services
         self.active_workflows: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        # Identifies this worker in the lease columns of the shared store
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = WORKFLOW_LEASE_SECONDS
+        if db_path:
+            self._open(db_path)
+
+    # --- Persistence ---
+
+    @staticmethod
+    def _resumable_config(config: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop everything the steps never read so the request body is not stored verbatim"""
+        return {key: config[key] for key in RESUME_CONFIG_KEYS if key in config}
+
+    def _open(self, db_path: str):
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS workflows (
+                    id TEXT PRIMARY KEY,
+                    project_id TEXT NOT NULL,
+                    user_id TEXT,
+                    status TEXT NOT NULL,
+                    config TEXT NOT NULL,
+                    logs TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    completed_at TEXT,
+                    owner TEXT,
+                    lease_until REAL
+                );
+                CREATE TABLE IF NOT EXISTS workflow_steps (
+                    workflow_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    depends_on TEXT NOT NULL,
+                    config TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    output TEXT,
+                    error TEXT,
+                    started_at TEXT,
+                    completed_at TEXT,
+                    PRIMARY KEY (workflow_id, name)
+                );
+                CREATE INDEX IF NOT EXISTS idx_workflows_status ON workflows(status);
+            """)
+            # Stores created before workflows were leased lack the lease columns
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(workflows)")}
+            for column, column_type in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    self._db.execute(f"ALTER TABLE workflows ADD COLUMN {column} {column_type}")
+            self._db.commit()
+        except Exception as e:
+            logger.error(f"Workflow checkpoint store unavailable, state is in-memory only: {e}")
+            self._db = None
+
+    def _checkpoint_workflow(self, workflow: Dict[str, Any], config: Optional[Dict[str, Any]] = None):
+        if not self._db:
+            return
+        try:
+            if config is not None:
+                # The creating worker holds the lease from the start
+                self._db.execute(
+                    "INSERT OR REPLACE INTO workflows "
+                    "(id, project_id, user_id, status, config, logs, started_at, completed_at, owner, lease_until) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (workflow["id"], workflow["project_id"], workflow["user_id"], workflow["status"],
+                     json.dumps(self._resumable_config(config), default=str), json.dumps(workflow["logs"]),
+                     workflow["started_at"], workflow.get("completed_at"),
+                     self.owner_id, time.time() + self.lease_seconds)
+                )
+            else:
+                self._db.execute(
+                    "UPDATE workflows SET status = ?, logs = ?, completed_at = ? WHERE id = ?",
+                    (workflow["status"], json.dumps(workflow["logs"]), workflow.get("completed_at"), workflow["id"])
+                )
+            self._db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to checkpoint workflow {workflow['id']}: {e}")
+
+    def _checkpoint_step(self, workflow: Dict[str, Any], step: Dict[str, Any]):
+        if not self._db:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO workflow_steps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (workflow["id"], step["position"], step["name"], step["type"], json.dumps(step["depends_on"]),
+                 json.dumps(self._resumable_config(step["config"]), default=str), step["status"],
+                 json.dumps(workflow["outputs"].get(step["name"]), default=str), step.get("error"),
+                 step.get("started_at"), step.get("completed_at"))
+            )
+            # Step and workflow logs move together so a resume sees a consistent picture
+            self._db.execute("UPDATE workflows SET logs = ? WHERE id = ?", (json.dumps(workflow["logs"]), workflow["id"]))
+            self._db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to checkpoint step {step['name']} of workflow {workflow['id']}: {e}")
+
+    def _claim(self, workflow_id: str) -> bool:
+        """Atomically take (or renew) the lease on a workflow; False if another worker holds it"""
+        if not self._db:
+            return True
+        now = time.time()
+        try:
+            cursor = self._db.execute(
+                "UPDATE workflows SET owner = ?, lease_until = ? WHERE id = ? AND status = 'in_progress' "
+                "AND (owner IS NULL OR owner = ? OR lease_until IS NULL OR lease_until < ?)",
+                (self.owner_id, now + self.lease_seconds, workflow_id, self.owner_id, now)
+            )
+            self._db.commit()
+            return cursor.rowcount == 1
+        except Exception as e:
+            logger.warning(f"Failed to lease workflow {workflow_id}: {e}")
+            return False
+
+    def _release(self, workflow_ids: List[str]):
+        """Give up leases on shutdown so another worker can resume these workflows right away"""
+        if not self._db or not workflow_ids:
+            return
+        try:
+            self._db.executemany(
+                "UPDATE workflows SET owner = NULL, lease_until = NULL WHERE id = ? AND owner = ?",
+                [(workflow_id, self.owner_id) for workflow_id in workflow_ids]
+            )
+            self._db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to release workflow leases: {e}")
+
+    def _load_workflow(self, workflow_id: str) -> Optional[tuple]:
+        """Rebuild a workflow (and its config) from the checkpoint store"""
+        if not self._db:
+            return None
+        row = self._db.execute(
+            "SELECT id, project_id, user_id, status, config, logs, started_at, completed_at FROM workflows WHERE id = ?",
+            (workflow_id,)
+        ).fetchone()
+        if not row:
+            return None
+        workflow = {
+            "id": row[0],
+            "project_id": row[1],
+            "user_id": row[2],
+            "status": row[3],
+            "started_at": row[6],
+            "completed_at": row[7],
+            "logs": json.loads(row[5]),
+            "steps": [],
+            "outputs": {}
+        }
+        for name, step_type, depends_on, step_config, status, output, error, started_at, completed_at in self._db.execute(
+            "SELECT name, type, depends_on, config, status, output, error, started_at, completed_at "
+            "FROM workflow_steps WHERE workflow_id = ? ORDER BY position",
+            (workflow_id,)
+        ):
+            workflow["steps"].append({
+                "name": name,
+                "type": step_type,
+                "depends_on": json.loads(depends_on),
+                "config": json.loads(step_config),
+                "status": status,
+                "error": error,
+                "started_at": started_at,
+                "completed_at": completed_at,
+                "position": len(workflow["steps"])
+            })
+            if output is not None and status == "completed":
+                workflow["outputs"][name] = json.loads(output)
+        return workflow, json.loads(row[4])
+
+    # --- Workflow definition ---
+
+    @staticmethod
+    def _build_steps(steps: List[Union[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Normalize step declarations. Plain names use the built-in dependencies
+        (restricted to the requested steps, following the chain through omitted
+        ones); dicts may set ``name``, ``type``, ``depends_on`` and ``config``.
+        """
+        declared = []
+        for item in steps:
+            if isinstance(item, str):
+                item = {"name": item}
+            name = item.get("name") or item.get("type")
+            step_type = item.get("type", name)
+            if step_type not in STEP_TYPES:
+                raise ValueError(f"Unknown workflow step type: {step_type}")
+            declared.append({
+                "name": name,
+                "type": step_type,
+                "depends_on": item.get("depends_on"),
+                "config": item.get("config", {})
+            })
+
+        names = [step["name"] for step in declared]
+        if len(set(names)) != len(names):
+            raise ValueError("Workflow step names must be unique")
+        types_present = {step["type"]: step["name"] for step in declared}
+
+        def implicit_dependencies(step_type: str) -> List[str]:
+            found, stack, seen = [], list(DEFAULT_DEPENDENCIES[step_type]), set()
+            while stack:
+                dep = stack.pop()
+                if dep in seen:
+                    continue
+                seen.add(dep)
+                if dep in types_present:
+                    found.append(types_present[dep])
+                else:
+                    stack.extend(DEFAULT_DEPENDENCIES[dep])
+            # Ordering edges only bind steps that are actually declared
+            found.extend(
+                types_present[before] for before in DEFAULT_ORDERING.get(step_type, [])
+                if before in types_present and types_present[before] not in found
+            )
+            return found
+
+        for position, step in enumerate(declared):
+            if step["depends_on"] is None:
+                step["depends_on"] = implicit_dependencies(step["type"])
+            unknown = [dep for dep in step["depends_on"] if dep not in names]
+            if unknown:
+                raise ValueError(f"Step {step['name']} depends on unknown steps: {unknown}")
+            step.update({"status": "pending", "error": None, "started_at": None, "completed_at": None, "position": position})
+
+        # Reject cycles up front (Kahn's algorithm)
+        remaining = {step["name"]: set(step["depends_on"]) for step in declared}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Workflow steps form a dependency cycle: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return declared
+
+    # --- Execution ---
 
     async def execute_workflow(
         self,
         project_id: str,
         user_id: str,
-        steps: List[str],
+        steps: List[Union[str, Dict[str, Any]]],
         config: Dict[str, Any]
     ) -> str:
-        """Execute a series of steps as a single workflow"""
+        """Execute a set of steps as a single workflow graph"""
         workflow_id = str(uuid.uuid4())
-        
+
         workflow = {
             "id": workflow_id,
             "project_id": project_id,
             "user_id": user_id,
-            "steps": [{"name": s, "status": "pending"} for s in steps],
+            "steps": self._build_steps(steps),
             "status": "in_progress",
             "started_at": datetime.utcnow().isoformat(),
-            "logs": []
+            "logs": [],
+            "outputs": {}
         }
-        
+
         self.active_workflows[workflow_id] = workflow
-        
+        self._checkpoint_workflow(workflow, config)
+        for step in workflow["steps"]:
+            self._checkpoint_step(workflow, step)
+
         # Start execution in background
-        asyncio.create_task(self._run_workflow_daemon(workflow_id, config))
-        
+        self._start(workflow_id, config)
+
         return workflow_id
 
+    async def resume_incomplete(self) -> List[str]:
+        """Restart workflows interrupted by a crash or restart, skipping completed steps"""
+        if not self._db:
+            return []
+        resumed = []
+        rows = self._db.execute(
+            "SELECT id FROM workflows WHERE status = 'in_progress' "
+            "AND (owner IS NULL OR lease_until IS NULL OR lease_until < ?)",
+            (time.time(),)
+        ).fetchall()
+        for (workflow_id,) in rows:
+            # Another worker may have claimed it since the SELECT
+            if workflow_id in self._tasks or not self._claim(workflow_id):
+                continue
+            loaded = self._load_workflow(workflow_id)
+            if not loaded:
+                continue
+            workflow, config = loaded
+            for step in workflow["steps"]:
+                # Work in flight at the time of the crash is redone; finished work is not
+                if step["status"] == "in_progress":
+                    step["status"] = "pending"
+                    step["started_at"] = None
+            done = sum(1 for step in workflow["steps"] if step["status"] == "completed")
+            workflow["logs"].append(f"Resumed after restart ({done}/{len(workflow['steps'])} steps already completed).")
+            self.active_workflows[workflow_id] = workflow
+            self._start(workflow_id, config)
+            resumed.append(workflow_id)
+        if resumed:
+            logger.info(f"Resumed {len(resumed)} interrupted workflow(s)")
+        return resumed
+
+    def _start(self, workflow_id: str, config: Dict[str, Any]):
+        task = asyncio.create_task(self._run_workflow_daemon(workflow_id, config))
+        self._tasks[workflow_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(workflow_id, None))
+
     async def _run_workflow_daemon(self, workflow_id: str, config: Dict[str, Any]):
-        """Background daemon for workflow execution"""
+        """Background daemon: start every step whose dependencies are done, as they become ready"""
         workflow = self.active_workflows.get(workflow_id)
         if not workflow:
             return
 
         project_id = workflow["project_id"]
-        project = self.services["project_manager"].get_project(project_id)
-        
+        project = await self.services["project_manager"].get_project(project_id)
+
         if not project:
             workflow["status"] = "failed"
+            workflow["completed_at"] = datetime.utcnow().isoformat()
             workflow["logs"].append("Project not found")
+            self._checkpoint_workflow(workflow)
             return
 
         local_path = project["local_path"]
-        
+        steps = {step["name"]: step for step in workflow["steps"]}
+        running: Dict[asyncio.Task, Dict[str, Any]] = {}
+        failed = False
+        renew_interval = self.lease_seconds / 3
+        renew_at = time.monotonic() + renew_interval
+
         try:
-            for i, step_info in enumerate(workflow["steps"]):
-                step_name = step_info["name"]
-                step_info["status"] = "in_progress"
-                
-                logger.info(f"Workflow {workflow_id}: Executing step {step_name}")
-                workflow["logs"].append(f"Starting {step_name}...")
-                
-                success = False
-                result = {}
-                
-                if step_name == "sync":
-                    result = await self.services["git_sync"].pull_latest(local_path)
-                    success = result.get("success", False)
-                elif step_name == "update":
-                    result = await self.services["ai_update"].apply_chat_update(
-                        project_id, local_path, config.get("update_prompt", ""), config.get("context")
-                    )
-                    success = result.get("success", False)
-                elif step_name == "push":
-                    result = await self.services["git_sync"].push_changes(
-                        local_path, config.get("commit_message", "Updated by AI Orchestrator")
-                    )
-                    success = result.get("success", False)
-                elif step_name == "build":
-                    result = await self.services["build"].build_project(local_path, config.get("build_config"))
-                    success = result.get("success", False)
-                elif step_name == "run":
-                    result = await self.services["runtime"].run_project(project_id, local_path, config.get("run_config"))
-                    success = result.get("success", False)
-                
-                if success:
-                    step_info["status"] = "completed"
-                    workflow["logs"].append(f"Completed {step_name} successfully.")
-                else:
-                    step_info["status"] = "failed"
-                    workflow["status"] = "failed"
-                    workflow["logs"].append(f"Failed {step_name}: {result.get('error', 'Unknown error')}")
+            while True:
+                if time.monotonic() >= renew_at:
+                    if not self._claim(workflow_id):
+                        # Another worker took over after our lease lapsed; leave the workflow to it
+                        logger.warning(f"Workflow {workflow_id}: lease lost, stopping here")
+                        for task in running:
+                            task.cancel()
+                        self.active_workflows.pop(workflow_id, None)
+                        return
+                    renew_at = time.monotonic() + renew_interval
+
+                if not failed:
+                    for step in workflow["steps"]:
+                        if step["status"] == "pending" and all(steps[dep]["status"] == "completed" for dep in step["depends_on"]):
+                            step["status"] = "in_progress"
+                            step["started_at"] = datetime.utcnow().isoformat()
+                            logger.info(f"Workflow {workflow_id}: Executing step {step['name']}")
+                            workflow["logs"].append(f"Starting {step['name']}...")
+                            self._checkpoint_step(workflow, step)
+                            task = asyncio.create_task(self._execute_step(step, workflow, project_id, local_path, config))
+                            running[task] = step
+
+                if not running:
                     break
-            
-            if workflow["status"] != "failed":
+
+                done, _ = await asyncio.wait(
+                    running, timeout=max(0.0, renew_at - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    step = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        result = {"success": False, "error": str(e)}
+
+                    step["completed_at"] = datetime.utcnow().isoformat()
+                    if result.get("success", False):
+                        step["status"] = "completed"
+                        workflow["outputs"][step["name"]] = result
+                        workflow["logs"].append(f"Completed {step['name']} successfully.")
+                    else:
+                        # Let running branches finish, but start nothing new
+                        step["status"] = "failed"
+                        step["error"] = result.get("error", "Unknown error")
+                        failed = True
+                        workflow["logs"].append(f"Failed {step['name']}: {step['error']}")
+                    self._checkpoint_step(workflow, step)
+
+            if failed:
+                workflow["status"] = "failed"
+                for step in workflow["steps"]:
+                    if step["status"] == "pending":
+                        step["status"] = "skipped"
+                        self._checkpoint_step(workflow, step)
+            else:
                 workflow["status"] = "completed"
-                workflow["completed_at"] = datetime.utcnow().isoformat()
-                
+            workflow["completed_at"] = datetime.utcnow().isoformat()
+            self._checkpoint_workflow(workflow)
+
+        except asyncio.CancelledError:
+            # Shutdown: leave the workflow in_progress so it resumes on the next start
+            for task in running:
+                task.cancel()
+            raise
         except Exception as e:
             workflow["status"] = "failed"
+            workflow["completed_at"] = datetime.utcnow().isoformat()
             workflow["logs"].append(f"Workflow error: {str(e)}")
             logger.error(f"Workflow execution failed: {e}")
+            self._checkpoint_workflow(workflow)
+
+    async def _execute_step(
+        self,
+        step: Dict[str, Any],
+        workflow: Dict[str, Any],
+        project_id: str,
+        local_path: str,
+        config: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Run one step; per-step ``config`` overrides the workflow-level config"""
+        step_config = {**config, **step["config"]}
+        step_type = step["type"]
+
+        if step_type == "sync":
+            return await self.services["git_sync"].pull_latest(local_path)
+        elif step_type == "update":
+            return await self.services["ai_update"].apply_chat_update(
+                project_id, local_path, step_config.get("update_prompt", ""), step_config.get("context")
+            )
+        elif step_type == "push":
+            return await self.services["git_sync"].push_changes(
+                local_path,
+                branch=step_config.get("branch", "main"),
+                commit_message=step_config.get("commit_message", "Updated by AI Orchestrator")
+            )
+        elif step_type == "build":
+            return await self.services["build"].build_project(local_path, step_config.get("build_config"))
+        elif step_type == "run":
+            return await self.services["runtime"].run_project(project_id, local_path, step_config.get("run_config"))
+        return {"success": False, "error": f"Unknown step type {step_type}"}
+
+    async def shutdown(self):
+        """Stop running workflows; they stay checkpointed as in_progress and resume on restart"""
+        workflow_ids, tasks = list(self._tasks), list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._release(workflow_ids)
+        if self._db:
+            self._db.close()
+            self._db = None
 
     def get_workflow_status(self, workflow_id: str) -> Optional[Dict[str, Any]]:
         """Get the status of a workflow"""
-        return self.active_workflows.get(workflow_id)
+        workflow = self.active_workflows.get(workflow_id)
+        if workflow is None:
+            loaded = self._load_workflow(workflow_id)
+            workflow = loaded[0] if loaded else None
+        return workflow
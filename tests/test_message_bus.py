@@ -0,0 +1,201 @@
+"""Behaviour of MessageBus queues: backpressure policies, metrics and lifecycle"""
+import asyncio
+
+import pytest
+
+from core.messaging.backends import InMemoryBackend
+from core.messaging.bus import BackpressureError, BackpressurePolicy, MessageBus
+
+
+@pytest.fixture
+def bus():
+    MessageBus._instance = None
+    bus = MessageBus(backend=InMemoryBackend())
+    yield bus
+    MessageBus._instance = None
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_delivers_to_every_subscriber_and_counts(bus):
+    async def scenario():
+        received = []
+
+        async def first(data):
+            received.append(("first", data["n"]))
+
+        async def second(data):
+            received.append(("second", data["n"]))
+
+        bus.subscribe("events", first)
+        bus.subscribe("events", second)
+        await bus.start()
+        for n in range(3):
+            await bus.publish("events", {"n": n})
+        for subscription in bus.subscribers["events"]:
+            await subscription.queue.join()
+        await bus.stop()
+        return received
+
+    received = run(scenario())
+    assert sorted(received) == [("first", 0), ("first", 1), ("first", 2), ("second", 0), ("second", 1), ("second", 2)]
+    metrics = bus.get_metrics()["topics"]["events"]
+    assert [(m["enqueued"], m["delivered"], m["lag"]) for m in metrics] == [(3, 3, 0), (3, 3, 0)]
+
+
+def test_block_waits_for_room(bus):
+    async def scenario():
+        release = asyncio.Event()
+        handled = []
+
+        async def slow(data):
+            await release.wait()
+            handled.append(data["n"])
+
+        subscription = bus.subscribe("slow", slow, max_queue_size=1, policy=BackpressurePolicy.BLOCK)
+        await bus.start()
+        await bus.publish("slow", {"n": 0})  # taken by the worker
+        await asyncio.sleep(0)
+        await bus.publish("slow", {"n": 1})  # fills the queue
+        blocked = asyncio.create_task(bus.publish("slow", {"n": 2}))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+        release.set()
+        await asyncio.wait_for(blocked, timeout=1)
+        await subscription.queue.join()
+        await bus.stop()
+        return handled, subscription.metrics
+
+    handled, metrics = run(scenario())
+    assert handled == [0, 1, 2]
+    assert metrics.rejected == 0 and metrics.dropped == 0
+
+
+def test_block_with_timeout_rejects(bus):
+    async def scenario():
+        release = asyncio.Event()
+
+        async def stuck(data):
+            await release.wait()
+
+        bus.configure_topic("stuck", max_queue_size=1, policy=BackpressurePolicy.BLOCK, block_timeout=0.05)
+        subscription = bus.subscribe("stuck", stuck)
+        await bus.start()
+        await bus.publish("stuck", {"n": 0})
+        await asyncio.sleep(0)
+        await bus.publish("stuck", {"n": 1})
+        with pytest.raises(BackpressureError):
+            await bus.publish("stuck", {"n": 2})
+        release.set()
+        await bus.stop()
+        return subscription.metrics
+
+    assert run(scenario()).rejected == 1
+
+
+def test_drop_oldest_evicts_and_acks(bus):
+    async def scenario():
+        release = asyncio.Event()
+        handled, acked = [], []
+
+        async def stuck(data):
+            await release.wait()
+            handled.append(data["n"])
+
+        def ack_for(n):
+            async def ack():
+                acked.append(n)
+            return ack
+
+        subscription = bus.subscribe("lossy", stuck, max_queue_size=2, policy=BackpressurePolicy.DROP_OLDEST)
+        await bus.start()
+        assert await bus.deliver(subscription, {"n": 0}, ack_for(0))  # taken by the worker
+        await asyncio.sleep(0)
+        for n in range(1, 5):
+            assert await bus.deliver(subscription, {"n": n}, ack_for(n))
+        release.set()
+        await subscription.queue.join()
+        await bus.stop()
+        return handled, sorted(acked), subscription.metrics
+
+    handled, acked, metrics = run(scenario())
+    # 1 and 2 were evicted by 3 and 4; evicted messages are still acknowledged
+    assert handled == [0, 3, 4]
+    assert acked == [0, 1, 2, 3, 4]
+    assert metrics.dropped == 2 and metrics.enqueued == 5
+
+
+def test_reject_refuses_when_full(bus):
+    async def scenario():
+        release = asyncio.Event()
+
+        async def stuck(data):
+            await release.wait()
+
+        subscription = bus.subscribe("strict", stuck, max_queue_size=1, policy=BackpressurePolicy.REJECT)
+        await bus.start()
+        await bus.publish("strict", {"n": 0})
+        await asyncio.sleep(0)
+        await bus.publish("strict", {"n": 1})
+        with pytest.raises(BackpressureError):
+            await bus.publish("strict", {"n": 2})
+        assert not await bus.deliver(subscription, {"n": 3})
+        release.set()
+        await bus.stop()
+        return subscription.metrics
+
+    metrics = run(scenario())
+    assert metrics.rejected == 2 and metrics.enqueued == 2
+
+
+def test_failed_handler_is_counted_and_worker_survives(bus):
+    async def scenario():
+        async def flaky(data):
+            if data["n"] == 0:
+                raise ValueError("boom")
+
+        subscription = bus.subscribe("flaky", flaky)
+        await bus.start()
+        await bus.publish("flaky", {"n": 0})
+        await bus.publish("flaky", {"n": 1})
+        await subscription.queue.join()
+        await bus.stop()
+        return subscription.metrics
+
+    metrics = run(scenario())
+    assert metrics.failed == 1 and metrics.delivered == 1
+
+
+def test_publish_after_stop_does_not_restart_workers(bus):
+    async def scenario():
+        async def handler(data):
+            pass
+
+        subscription = bus.subscribe("late", handler, workers=2)
+        await bus.start()
+        await bus.stop()
+        await bus.publish("late", {"n": 1})
+        return subscription
+
+    subscription = run(scenario())
+    assert subscription.tasks == []
+    assert subscription.queue.qsize() == 1
+
+
+def test_publish_before_start_is_handled(bus):
+    async def scenario():
+        received = []
+
+        async def handler(data):
+            received.append(data["n"])
+
+        subscription = bus.subscribe("early", handler)
+        await bus.publish("early", {"n": 1})
+        await subscription.queue.join()
+        await bus.start()
+        await bus.stop()
+        return received
+
+    assert run(scenario()) == [1]
@@ -0,0 +1,148 @@
+"""RedisStreamsBackend against fakeredis: consumer groups, reclaiming and dead-lettering"""
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from core.messaging.backends import RedisStreamsBackend
+from core.messaging.bus import MessageBus
+
+
+def make_bus(server, consumer, **options):
+    """A separate bus (the class is a singleton) on a shared fake Redis server"""
+    MessageBus._instance = None
+    client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    backend = RedisStreamsBackend(client=client, consumer_name=consumer, block_ms=20, linger_ms=0, **options)
+    bus = MessageBus(backend=backend)
+    MessageBus._instance = None
+    return bus
+
+
+async def wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not reached")
+        await asyncio.sleep(0.01)
+
+
+def test_publish_before_start_connects_lazily(monkeypatch):
+    import redis.asyncio as redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis, "from_url", lambda url, **kwargs: fakeredis.aioredis.FakeRedis(server=server, **kwargs)
+    )
+
+    async def scenario():
+        MessageBus._instance = None
+        bus = MessageBus(backend=RedisStreamsBackend(consumer_name="a", block_ms=20, linger_ms=0))
+        MessageBus._instance = None
+        received = []
+
+        async def handler(data):
+            received.append(data["n"])
+
+        bus.subscribe("early", handler, group="early-handler")
+        # The group starts at "$", so create it first as a running process would have
+        await bus.backend._connect().xgroup_create(
+            bus.backend.stream_key("early"), "early-handler", id="$", mkstream=True
+        )
+        await bus.publish("early", {"n": 1})
+        await bus.start()
+        await wait_for(lambda: received == [1])
+        await bus.stop()
+
+    asyncio.run(scenario())
+
+
+def test_shared_group_splits_work_and_broadcast_sees_everything():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        first, second = make_bus(server, "a"), make_bus(server, "b")
+        shared = {"a": [], "b": []}
+        broadcast = {"a": [], "b": []}
+        for name, bus in (("a", first), ("b", second)):
+            async def work(data, name=name):
+                shared[name].append(data["n"])
+
+            async def everyone(data, name=name):
+                broadcast[name].append(data["n"])
+
+            bus.subscribe("jobs", work, group="workers")
+            bus.subscribe("jobs", everyone, broadcast=True)
+            await bus.start()
+
+        for n in range(20):
+            await first.publish("jobs", {"n": n})
+        await wait_for(lambda: len(shared["a"]) + len(shared["b"]) == 20)
+        await wait_for(lambda: len(broadcast["a"]) == 20 and len(broadcast["b"]) == 20)
+        await first.stop()
+        await second.stop()
+        return shared, broadcast
+
+    shared, broadcast = asyncio.run(scenario())
+    # Each job handled exactly once across the group
+    assert sorted(shared["a"] + shared["b"]) == list(range(20))
+    assert sorted(broadcast["a"]) == sorted(broadcast["b"]) == list(range(20))
+
+
+def test_entries_left_pending_are_reclaimed_and_acked():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        raw = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        bus = make_bus(server, "survivor", claim_idle_ms=0, max_deliveries=5)
+        key = bus.backend.stream_key("orders")
+        await raw.xgroup_create(key, "orders-handler", id="$", mkstream=True)
+        await raw.xadd(key, {"data": '{"n": 7}'})
+        # A consumer that crashed after reading, without acknowledging
+        await raw.xreadgroup("orders-handler", "crashed", {key: ">"}, count=10)
+
+        received = []
+
+        async def handler(data):
+            received.append(data["n"])
+
+        bus.subscribe("orders", handler, group="orders-handler")
+        await bus.start()
+        await wait_for(lambda: received == [7])
+        await wait_for(lambda: bus.backend.metrics["acked"] == 1)
+        await bus.stop()
+        pending = await raw.xpending(key, "orders-handler")
+        return bus.backend.metrics, pending
+
+    metrics, pending = asyncio.run(scenario())
+    assert metrics["reclaimed"] == 1
+    assert pending["pending"] == 0
+
+
+def test_poison_entries_are_dead_lettered():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        raw = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        bus = make_bus(server, "survivor", claim_idle_ms=0, max_deliveries=2)
+        key = bus.backend.stream_key("orders")
+        await raw.xgroup_create(key, "orders-handler", id="$", mkstream=True)
+        await raw.xadd(key, {"data": '{"n": 1}'})
+        for _ in range(2):
+            # Delivered twice and never acknowledged
+            await raw.xreadgroup("orders-handler", "crashed", {key: "0" if _ else ">"}, count=10)
+
+        received = []
+
+        async def handler(data):
+            received.append(data["n"])
+
+        bus.subscribe("orders", handler, group="orders-handler")
+        await bus.start()
+        await wait_for(lambda: bus.backend.metrics["dead_lettered"] == 1)
+        await bus.stop()
+        dead = await raw.xrange(f"{key}:dead")
+        pending = await raw.xpending(key, "orders-handler")
+        return received, dead, pending
+
+    received, dead, pending = asyncio.run(scenario())
+    assert received == []
+    assert [fields for _, fields in dead] == [{"data": '{"n": 1}'}]
+    assert pending["pending"] == 0